@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+#
+#   aos-tools.py
+#
+#   各スクリプトをサブコマンドとして実行する共通エントリポイント
+#   - サブコマンド名はスクリプトのファイル名から .py を除いたもの (ap-monitor-list, radar-stats など)
+#   - サブコマンドのスクリプトは実行時に読み込むため、起動時に pandas, openpyxl などは import しない
+#   - '+' で区切って複数のサブコマンドを 1 回で実行できる. 同じファイルのパース結果はプロセス内で共有し、
+#     2 つ目以降のサブコマンドでは再パースしない (aos_cache.share_results())
+#
+#       python aos-tools.py list
+#       python aos-tools.py ap-monitor-list tech-support.log --summary
+#       python aos-tools.py radio-summary-toputil tech-support.log + phycap-distrib tech-support.log
+#
+
+import os
+import sys
+import runpy
+import argparse
+import mylogger as log
+from aos_cache import share_results
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SEPARATOR = '+'     # サブコマンドの区切り
+
+# サブコマンドとして登録しないファイル (モジュール、このスクリプト)
+EXCLUDE = ('aos-tools', 'utils', 'mylogger')
+
+
+def find_tools(tools_dir=TOOLS_DIR):
+    '''
+    サブコマンドとして実行できるスクリプトを探す (ファイル名のみ参照し、import はしない)
+    :return: サブコマンド名 -> スクリプトのパス の dict
+    '''
+    tools = {}
+    for fn in sorted(os.listdir(tools_dir)):
+        name, ext = os.path.splitext(fn)
+        if ext != '.py' or name in EXCLUDE or name.startswith(('aos_', '_')):
+            continue
+        tools[name] = os.path.join(tools_dir, fn)
+    return tools
+
+
+def description(path):
+    '''
+    スクリプトの先頭のコメントから説明 (最初の説明の行) を取り出す
+    '''
+    lines = []
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.startswith('#'):
+                    break
+                lines.append(line.lstrip('#').strip())
+    except OSError:
+        return ''
+    # 空行, shebang, ファイル名の行は除く
+    return next((s for s in lines if s and not s.startswith(('!', '/')) and not s.endswith('.py')), '')
+
+
+def split_commands(argv):
+    '''
+    引数を SEPARATOR で区切り、(サブコマンド名, 引数のリスト) のリストにする
+    '''
+    cmds = []
+    cur = []
+    for arg in argv + [SEPARATOR]:
+        if arg != SEPARATOR:
+            cur.append(arg)
+            continue
+        if cur:
+            cmds.append((cur[0], cur[1:]))
+        cur = []
+    return cmds
+
+
+def run_tool(path, args):
+    '''
+    スクリプトを __main__ として実行する
+    :param path: スクリプトのパス
+    :param args: コマンドライン引数 (sys.argv[1:])
+    :return: 終了コード
+    '''
+    argv = sys.argv
+    sys.argv = [path] + list(args)
+    try:
+        runpy.run_path(path, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    finally:
+        sys.argv = argv
+    return 0
+
+
+def print_tools(tools):
+    w = max(len(name) for name in tools)
+    for name, path in tools.items():
+        print(f"{name:{w}}  {description(path)}")
+
+
+#
+#   main
+#
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="Run aos-tools scripts as subcommands",
+        epilog=f"Multiple subcommands can be run at once by separating them with '{SEPARATOR}'. "
+               "Parse results of the same file are shared between them.")
+    parser.add_argument('command', help="Subcommand ('list' to show all)", type=str, nargs='?')
+    parser.add_argument('args', help='Arguments for the subcommand', nargs=argparse.REMAINDER)
+    parser.add_argument('--no-share', help='Do not share parse results between subcommands', action='store_true')
+    parser.add_argument('--keep-going', '-k', help='Continue even if a subcommand fails', action='store_true')
+    args = parser.parse_args()
+
+    log.setloglevel(log.LOG_INFO)
+
+    tools = find_tools()
+    if args.command is None or args.command == 'list':
+        print_tools(tools)
+        sys.exit(0)
+
+    cmds = split_commands([args.command] + args.args)
+    for name, _ in cmds:
+        if name not in tools:
+            log.err(f"Unknown subcommand: {name}")
+            sys.exit(2)
+
+    if len(cmds) > 1 and not args.no_share:
+        share_results()
+
+    rc = 0
+    for name, cmd_args in cmds:
+        log.debug(f"Running {name} {' '.join(cmd_args)}")
+        r = run_tool(tools[name], cmd_args)
+        if r != 0:
+            log.err(f"{name} exited with status {r}")
+            rc = r
+            if not args.keep_going:
+                break
+    sys.exit(rc)
@@ -0,0 +1,216 @@
+#
+#   aos_appclass.py
+#
+#   datapath session をルールでアプリの種類 (Teams Audio, Zoom, VDI など) に分類する (dp-ses-* で使用)
+#   - ルール (dict) の条件
+#       proto       プロトコル番号 (int またはリスト)
+#       ports       ポート番号 (int または (開始, 終了) の範囲) のリスト
+#       side        ports を判定する側 'src', 'dst', 'any' (既定 'any')
+#       apps        AppID のアプリ名のリスト (大文字・小文字は区別しない)
+#       nets        CIDR のリスト
+#       net_side    nets を判定する側 (既定 'any')
+#     指定した条件をすべて満たすセッションを name に分類する (先に書いたルールを優先).
+#     同じ name のルールを複数書くと、いずれかを満たす場合になる. group は mask() でまとめて指定する名前
+#   - ルールは AppClassifier の作成時に、プロトコル (256) ・ポート番号 (65536) ・AppID ・IP アドレスごとの
+#     ルールのビットマスク (uint64) の表にコンパイルする. 分類はセッションごとに表を参照して AND を取り、
+#     最下位のビット (最初に一致したルール) を求めるだけで、ルールの数によらず 1 回の配列演算で行う
+#   - ルールは 64 個まで
+#   numpy が必要
+#
+#       clf = AppClassifier()
+#       cls = clf.classify(ses)                     # clf.names のコード (0 は分類なし)
+#       m = clf.mask(ses, 'Teams')                  # group または name
+#       clf.summary(ses, ses.bitrate, m)            # [(name, セッション数, 合計), ...]
+#
+
+import numpy as np
+
+APP_RULES = [
+    # Microsoft Teams (メディアの種類ごとのサーバー側の UDP ポート)
+    {'name': 'Teams Audio', 'group': 'Teams', 'proto': 17, 'ports': [3479]},
+    {'name': 'Teams Video', 'group': 'Teams', 'proto': 17, 'ports': [3480]},
+    {'name': 'Teams Share', 'group': 'Teams', 'proto': 17, 'ports': [3481]},
+    # Zoom
+    {'name': 'Zoom', 'proto': [6, 17], 'ports': [(8801, 8810)]},
+    {'name': 'Zoom', 'apps': ['zoom']},
+    # Teams のリレー (3478) とクライアント側のポート. 相手側が Zoom などのポートの場合はそちらを優先する
+    {'name': 'Teams', 'group': 'Teams', 'proto': 17, 'ports': [3478, (50000, 50059)]},
+    {'name': 'Teams', 'group': 'Teams', 'apps': ['teams']},
+    # Webex
+    {'name': 'Webex', 'proto': 17, 'ports': [9000]},
+    {'name': 'Webex', 'apps': ['webex']},
+    # VDI (VMware Blast, PCoIP, Citrix ICA/CGP, RDP)
+    {'name': 'VDI Blast', 'group': 'VDI', 'proto': [6, 17], 'ports': [22443]},
+    {'name': 'VDI PCoIP', 'group': 'VDI', 'proto': [6, 17], 'ports': [4172]},
+    {'name': 'VDI Citrix', 'group': 'VDI', 'proto': 6, 'ports': [1494, 2598]},
+    {'name': 'VDI RDP', 'group': 'VDI', 'proto': [6, 17], 'ports': [3389]},
+    # その他
+    {'name': 'DNS', 'proto': [6, 17], 'ports': [53]},
+    {'name': 'GRE', 'proto': 47},
+]
+
+_RULE_KEYS = {'name', 'group', 'proto', 'ports', 'side', 'apps', 'nets', 'net_side'}
+_SIDES = ('src', 'dst', 'any')
+
+
+def _as_list(v):
+    return [v] if isinstance(v, (int, str, tuple)) else list(v)
+
+
+def _app_name(v):
+    '''
+    AppID の値 ("zoom [3]" または "zoom") をアプリ名にする
+    '''
+    return v.split(' ')[0].lower() if v else ''
+
+
+class AppClassifier:
+    '''
+    ルールをビットマスクの表にコンパイルしたアプリ分類器
+    '''
+    def __init__(self, rules=APP_RULES):
+        '''
+        :param rules: ルール (dict) のリスト. 先に書いたルールを優先する
+        :raise ValueError: ルールが 64 個を超える場合, 不明なキー・side の場合
+        '''
+        if len(rules) > 64:
+            raise ValueError(f"Too many rules: {len(rules)} (max 64)")
+        self.rules = rules
+        self.names = ['']                   # 分類のコード -> 名前 (0 は分類なし)
+        self.groups = {}                    # group -> 名前の集合
+        self.rule_class = np.zeros(len(rules) + 1, dtype=np.int16)     # ルールの番号 -> 分類のコード
+        all_bits = np.uint64((1 << len(rules)) - 1) if rules else np.uint64(0)
+        self.proto_bits = np.full(256, all_bits, dtype=np.uint64)
+        self.sport_bits = np.zeros(65536, dtype=np.uint64)     # side が src / any のルール
+        self.dport_bits = np.zeros(65536, dtype=np.uint64)     # side が dst / any のルール
+        self.app_rules = []                 # (ビット, アプリ名の集合)
+        self.net_rules = []                 # (ビット, CIDR のリスト, side)
+
+        for i, rule in enumerate(rules):
+            unknown = set(rule) - _RULE_KEYS
+            if unknown or 'name' not in rule:
+                raise ValueError(f"Invalid rule #{i+1}: {rule}")
+            bit = np.uint64(1 << i)
+            name = rule['name']
+            if name not in self.names:
+                self.names.append(name)
+            self.rule_class[i] = self.names.index(name)
+            self.groups.setdefault(rule.get('group', name), set()).add(name)
+
+            if 'proto' in rule:
+                self.proto_bits &= ~bit
+                self.proto_bits[[p & 0xff for p in _as_list(rule['proto'])]] |= bit
+
+            side = rule.get('side', 'any')
+            if side not in _SIDES:
+                raise ValueError(f"Invalid side in rule #{i+1}: {side}")
+            if 'ports' in rule:
+                sel = np.zeros(65536, dtype=bool)
+                for p in _as_list(rule['ports']):
+                    lo, hi = p if isinstance(p, tuple) else (p, p)
+                    sel[lo:hi + 1] = True
+            else:
+                sel = np.ones(65536, dtype=bool)
+            if side != 'dst':
+                self.sport_bits[sel] |= bit
+            if side != 'src':
+                self.dport_bits[sel] |= bit
+
+            if 'apps' in rule:
+                self.app_rules.append((bit, {a.lower() for a in _as_list(rule['apps'])}))
+            if 'nets' in rule:
+                net_side = rule.get('net_side', 'any')
+                if net_side not in _SIDES:
+                    raise ValueError(f"Invalid net_side in rule #{i+1}: {net_side}")
+                self.net_rules.append((bit, _as_list(rule['nets']), net_side))
+        self.rule_class[len(rules)] = 0     # 一致するルールがない場合
+        self.all_bits = all_bits
+
+    def _app_bits(self, ses):
+        '''
+        AppID のコード -> ルールのビットマスク
+        '''
+        bits = np.full(max(len(ses.app_values), 1), self.all_bits, dtype=np.uint64)
+        names = [_app_name(v) for v in ses.app_values]
+        for bit, apps in self.app_rules:
+            bits &= ~bit
+            bits[[j for j, a in enumerate(names) if a in apps]] |= bit
+        return bits
+
+    def _net_bits(self, ses):
+        '''
+        セッションごとの nets の条件のビットマスク
+        '''
+        if not self.net_rules:
+            return self.all_bits
+        src = np.full(max(len(ses.ips), 1), self.all_bits, dtype=np.uint64)
+        dst = src.copy()
+        for bit, nets, side in self.net_rules:
+            t = ses.ipa.in_cidr(nets)
+            src[:len(t)] &= ~bit
+            dst[:len(t)] &= ~bit
+            if side != 'dst':
+                src[:len(t)][t] |= bit
+            if side != 'src':
+                dst[:len(t)][t] |= bit
+        return src[ses.sip] | dst[ses.dip]
+
+    def classify(self, ses):
+        '''
+        セッションを分類する
+        :param ses: SessionTable
+        :return: 分類のコード (self.names の番号. 0 は分類なし) の np.int16 配列
+        '''
+        bits = self.proto_bits[ses.proto & 0xff]
+        bits &= self.sport_bits[ses.sport & 0xffff] | self.dport_bits[ses.dport & 0xffff]
+        bits &= self._app_bits(ses)[ses.app]
+        bits &= self._net_bits(ses)
+        low = bits & (~bits + np.uint64(1))         # 最下位のビット (最初に一致したルール)
+        pos = np.where(low != 0, np.log2(np.maximum(low, np.uint64(1)).astype(np.float64)), len(self.rules))
+        return self.rule_class[pos.astype(np.int64)]
+
+    def codes(self, names):
+        '''
+        名前 (name または group) のリストを分類のコードのリストにする
+        '''
+        codes = set()
+        for n in _as_list(names):
+            for name in self.groups.get(n, {n}):
+                if name in self.names:
+                    codes.add(self.names.index(name))
+        return sorted(codes)
+
+    def mask(self, ses, names, cls=None):
+        '''
+        name または group が names に含まれるセッション
+        :param cls: classify() の結果 (省略した場合は分類する)
+        '''
+        cls = self.classify(ses) if cls is None else cls
+        return np.isin(cls, self.codes(names))
+
+    def ports(self, names):
+        '''
+        name または group のルールのポート番号
+        :return: ポート番号のリスト (port_mask() に指定する)
+        '''
+        sel = {self.names[c] for c in self.codes(names)}
+        ports = []
+        for rule in self.rules:
+            if rule['name'] in sel:
+                for p in _as_list(rule.get('ports', [])):
+                    ports += range(p[0], p[1] + 1) if isinstance(p, tuple) else [p]
+        return ports
+
+    def summary(self, ses, weights=None, mask=None, cls=None):
+        '''
+        分類ごとのセッション数と合計
+        :param weights: 値の配列 (bitrate など)
+        :return: [(名前, セッション数, 合計), ...] 分類のコードの順 (分類なしは '')
+        '''
+        cls = self.classify(ses) if cls is None else cls
+        if mask is not None:
+            cls, weights = cls[mask], (None if weights is None else weights[mask])
+        counts = np.bincount(cls, minlength=len(self.names))
+        sums = counts if weights is None else np.bincount(cls, weights=weights, minlength=len(self.names))
+        conv = int if weights is None else float
+        return [(name, int(counts[c]), conv(sums[c])) for c, name in enumerate(self.names) if counts[c]]
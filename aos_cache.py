@@ -0,0 +1,272 @@
+#
+#   aos_cache.py
+#
+#   AOSParser のパース結果をディスクにキャッシュする
+#   - キー: (パーサバージョン, ファイルサイズ, mtime, 内容のハッシュ, コマンド, オプション)
+#   - 値:   ファイル 1 つ・コマンド 1 つ分のテーブルの配列 (pickle)
+#   - 合計サイズ、最終アクセスからの経過時間でエントリを削除
+#
+#   環境変数 AOS_PARSER_CACHE にディレクトリを指定すると、全スクリプトでキャッシュが有効になる
+#
+#   share_results() を呼ぶと、以降の AOSParser (cache=None) はプロセス内のメモリキャッシュ (MemoryCache) を
+#   共有する. aos-tools.py で複数のサブコマンドを 1 回で実行する場合に、同じファイルを再パースしないために使用
+#
+
+import os
+import time
+import pickle
+import hashlib
+import mylogger as log
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "aos-tools")
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3        # 2GB
+DEFAULT_MAX_AGE = 30 * 24 * 3600        # 30 days
+
+_SUFFIX = ".pkl"
+
+
+def file_digest(fn, bufsize=1024*1024):
+    '''
+    ファイル内容のハッシュ値 (blake2b, 128bit) を計算する
+    :param fn: ファイル名
+    :return: 16進文字列
+    '''
+    h = hashlib.blake2b(digest_size=16)
+    with open(fn, 'rb') as f:
+        while chunk := f.read(bufsize):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _set_filename(tables, fn):
+    '''
+    別パスの同一ファイルのキャッシュを使用する場合に、filename 列を書き換える
+    '''
+    for tbl in tables:
+        if tbl[0][-1] != "filename":
+            continue
+        if hasattr(tbl, 'set_column'):      # ColumnTable
+            tbl.set_column(-1, fn)
+        else:
+            for row in tbl[1:]:
+                row[-1] = fn
+
+
+class ParseCache:
+    """
+    パース結果のディスクキャッシュ
+    """
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE, max_age=DEFAULT_MAX_AGE):
+        '''
+        :param cache_dir: キャッシュディレクトリ (None の場合は ~/.cache/aos-tools)
+        :param max_size: キャッシュの合計サイズの上限 (bytes)
+        :param max_age: 最終アクセスからこの秒数が経過したエントリは削除
+        '''
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_size = max_size
+        self.max_age = max_age
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _digest(self, fn, st):
+        '''
+        ファイル内容のハッシュ値を返す。
+        同じパス・サイズ・mtime のファイルについては前回計算した値を再利用する
+        '''
+        path = os.path.realpath(fn)
+        memo = os.path.join(self.cache_dir, "digest-" + hashlib.sha1(path.encode('utf-8')).hexdigest() + ".txt")
+        stamp = f"{st.st_size} {st.st_mtime_ns}"
+        try:
+            with open(memo) as f:
+                s, digest = f.read().rsplit(" ", 1)
+            if s == stamp:
+                os.utime(memo)
+                return digest
+        except (OSError, ValueError):
+            pass
+
+        digest = file_digest(fn)
+        with open(memo, "w") as f:
+            f.write(f"{stamp} {digest}")
+        return digest
+
+    def key(self, fn, cmd, opts=()):
+        '''
+        キャッシュのキーを計算する
+        :param fn: ファイル名
+        :param cmd: コマンド
+        :param opts: パース結果に影響するオプションのタプル (パーサバージョンを含む)
+        :return: キー文字列
+        '''
+        st = os.stat(fn)
+        k = "\0".join(map(str, (st.st_size, st.st_mtime_ns, self._digest(fn, st), cmd) + tuple(opts)))
+        return hashlib.blake2b(k.encode('utf-8'), digest_size=20).hexdigest()
+
+    def load(self, fn, cmd, opts=()):
+        '''
+        キャッシュからテーブルの配列を取得する
+        :return: テーブルの配列. キャッシュにない場合は None
+        '''
+        path = os.path.join(self.cache_dir, self.key(fn, cmd, opts) + _SUFFIX)
+        try:
+            with open(path, 'rb') as f:
+                filename, tables = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError) as e:
+            log.warn(f"Broken cache entry {path}: {e}")
+            return None
+
+        os.utime(path)      # 最終アクセス時刻を更新 (LRU)
+        if filename != fn:
+            _set_filename(tables, fn)
+        return tables
+
+    def store(self, fn, cmd, tables, opts=()):
+        '''
+        テーブルの配列をキャッシュに保存する
+        '''
+        path = os.path.join(self.cache_dir, self.key(fn, cmd, opts) + _SUFFIX)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump((fn, tables), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def evict(self):
+        '''
+        期限切れのエントリを削除し、合計サイズが上限を超える場合は古い順に削除する
+        :return: 削除したエントリ数
+        '''
+        now = time.time()
+        entries = []
+        for de in os.scandir(self.cache_dir):
+            st = de.stat()
+            if de.name.endswith(_SUFFIX):
+                entries.append((st.st_mtime, st.st_size, de.path))
+            elif de.name.startswith("digest-") and now - st.st_mtime > self.max_age:
+                os.remove(de.path)
+
+        removed = 0
+        total = sum(e[1] for e in entries)
+        for mtime, size, path in sorted(entries):
+            if now - mtime <= self.max_age and total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        if removed:
+            log.debug(f"{removed} cache entries evicted.")
+        return removed
+
+
+def _copy_tables(tables):
+    '''
+    テーブルの配列をコピーする. 呼び出し側でテーブルを変更 (列の変換、列名の変更など) しても
+    キャッシュの内容に影響しないよう、行の配列とヘッダをコピーする (値は共有)
+    '''
+    return [tbl.take(range(len(tbl) - 1)) if hasattr(tbl, 'take') else [list(row) for row in tbl] for tbl in tables]
+
+
+class MemoryCache:
+    """
+    パース結果のプロセス内キャッシュ. ParseCache と同じインターフェース
+    """
+
+    def __init__(self, backing=None):
+        '''
+        :param backing: メモリにない場合に参照するキャッシュ (ParseCache または None)
+        '''
+        self.backing = backing
+        self.entries = {}       # キー -> (ファイル名, テーブルの配列)
+
+    def key(self, fn, cmd, opts=()):
+        st = os.stat(fn)
+        return (os.path.realpath(fn), st.st_size, st.st_mtime_ns, cmd) + tuple(opts)
+
+    def get(self, fn, cmd, opts=()):
+        '''
+        メモリ上のテーブルの配列のコピーを返す (backing は参照しない)
+        :return: テーブルの配列. ない場合は None
+        '''
+        entry = self.entries.get(self.key(fn, cmd, opts))
+        if entry is None:
+            return None
+        tables = _copy_tables(entry[1])
+        if entry[0] != fn:
+            _set_filename(tables, fn)
+        return tables
+
+    def put(self, fn, cmd, tables, opts=()):
+        '''
+        テーブルの配列のコピーをメモリに保存する (backing には保存しない)
+        '''
+        self.entries[self.key(fn, cmd, opts)] = (fn, _copy_tables(tables))
+
+    def load(self, fn, cmd, opts=()):
+        '''
+        キャッシュからテーブルの配列を取得する. メモリにない場合は backing から読み込む
+        :return: テーブルの配列. キャッシュにない場合は None
+        '''
+        tables = self.get(fn, cmd, opts)
+        if tables is None and self.backing is not None:
+            tables = self.backing.load(fn, cmd, opts)
+            if tables is not None:
+                self.put(fn, cmd, tables, opts)
+        return tables
+
+    def store(self, fn, cmd, tables, opts=()):
+        '''
+        テーブルの配列をメモリと backing に保存する
+        '''
+        self.put(fn, cmd, tables, opts)
+        if self.backing is not None:
+            self.backing.store(fn, cmd, tables, opts)
+
+    def evict(self):
+        if self.backing is not None:
+            return self.backing.evict()
+        return 0
+
+    def clear(self):
+        self.entries.clear()
+
+
+_shared = None      # share_results() で有効にした MemoryCache
+
+
+def share_results(enable=True):
+    '''
+    以降の AOSParser (cache=None) でパース結果をプロセス内で共有する.
+    環境変数 AOS_PARSER_CACHE が設定されている場合はディスクキャッシュも併用する
+    :param enable: False の場合は共有を止め、メモリ上の結果を破棄する
+    :return: MemoryCache または None
+    '''
+    global _shared
+    _shared = None
+    if enable:
+        _shared = MemoryCache(get_cache(None))
+    return _shared
+
+
+def get_cache(cache):
+    '''
+    AOSParser の cache 引数から ParseCache オブジェクトを得る
+    :param cache: None (share_results() の設定、環境変数 AOS_PARSER_CACHE の順に従う), False, True,
+                  ディレクトリ名 または ParseCache
+    :return: ParseCache, MemoryCache または None
+    '''
+    if cache is None:
+        if _shared is not None:
+            return _shared
+        cache = os.environ.get("AOS_PARSER_CACHE") or False
+    if cache is False:
+        return None
+    if cache is True:
+        return ParseCache()
+    if isinstance(cache, str):
+        return ParseCache(cache)
+    return cache
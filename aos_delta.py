@@ -0,0 +1,323 @@
+#
+#   aos_delta.py
+#
+#   show datapath session dpi を繰り返し取得した結果 (スナップショット) の差分から、
+#   セッション・クライアント・アプリごとの転送量 (bytes / packets) とレート (bps) を求める (toptalker.py で使用)
+#   - 各スナップショットは SessionTable (aos_session) に変換し、セッションを 5-tuple を詰めた 2 つの整数
+#       ip      送信元 IP のコード << 32 | 宛先 IP のコード     (IP のコードは全スナップショットで共通)
+#       port    Prot << 32 | SPort << 16 | DPort
+#     をキーとして識別する. 全スナップショットのキーを np.unique でまとめてソートし (NumPy にはハッシュ結合がないためソートで結合)、
+#     行ごとの辞書参照なしにスナップショット間のセッションを対応付ける
+#   - 区間 (スナップショット i-1 -> i) ごとの差分
+#       前のスナップショットにあるセッション      Bytes の増分
+#       新しいセッション / TAge または Bytes が減少したセッション (同じ 5-tuple で作り直された)
+#                                                   Bytes の値 (全量)
+#       前のスナップショットにのみあるセッション  0 (終了したセッション)
+#   - 区間の長さ (秒) は取得時刻 times を指定しない場合、両方のスナップショットにあるセッションの
+#     TAge の増分の中央値から求める (tech-support などで取得時刻が分からない場合)
+#   - 取得の方法
+#       ライブ      SSH などで取得した出力の文字列を add() で追加 (取得時刻を指定)
+#       ファイル    同じファイル内の繰り返しの出力を AOSParser(merge=False).get_tables() で取得し、順に add()
+#   numpy が必要
+#
+#       sd = SessionDelta()
+#       for tbl in aos.get_tables(DATAPATH_SESSION_DPI):
+#           sd.add(tbl)
+#       clients = sd.cidr_table("192.168.1.0/24")
+#       m = sd.ip_mask(clients) & ~sd.ip_mask({controller_ip})
+#       for ip, byte, pkts, nses, bps in sd.by_client(clients, m).top(10):
+#           print(ip, byte, bps)
+#
+
+import numpy as np
+import mylogger as log
+from aos_session import SessionTable, MIN_TAGE, _factorize
+from aos_ip import IPArray
+
+DEFAULT_INTERVAL = 10.0     # 区間の長さが求められない場合の秒数
+
+
+class GroupDelta:
+    '''
+    グループ (クライアント, アプリ, セッション) ごとの区間ごとの転送量
+    '''
+    def __init__(self, names, nbytes, packets, sessions, total_sessions, dt, first):
+        '''
+        :param names: グループの名前のリスト
+        :param nbytes: 区間ごとの bytes (区間数 x グループ数 の np 配列)
+        :param packets: 区間ごとの packets (同上)
+        :param sessions: 区間ごとの通信のあったセッション数 (同上)
+        :param total_sessions: 全区間で通信のあったセッション数 (グループ数)
+        :param dt: 区間の長さ (秒) の配列
+        :param first: グループが最初に現れた位置 (値が同じ場合の順)
+        '''
+        self.names = names
+        self.bytes = nbytes
+        self.packets = packets
+        self.sessions = sessions
+        self.total_sessions = total_sessions
+        self.dt = dt
+        self.first = first
+
+    def __len__(self):
+        return len(self.names)
+
+    def totals(self, interval=None):
+        '''
+        :param interval: 区間の番号 (0 起点). None の場合は全区間の合計
+        :return: (bytes, packets, セッション数, bps) の np 配列
+        '''
+        if interval is None:
+            dt = self.dt.sum()
+            nbytes, packets = self.bytes.sum(axis=0), self.packets.sum(axis=0)
+            sessions = self.total_sessions
+        else:
+            dt = self.dt[interval]
+            nbytes, packets = self.bytes[interval], self.packets[interval]
+            sessions = self.sessions[interval]
+        bps = nbytes * 8 / dt if dt > 0 else np.zeros(len(nbytes))
+        return nbytes, packets, sessions, bps
+
+    def top(self, n=10, interval=None, by='bytes'):
+        '''
+        上位 n 件 (転送量が 0 のグループは除く)
+        :param by: 'bytes' または 'packets'
+        :return: [(名前, bytes, packets, セッション数, bps), ...] 降順 (同じ場合は最初に現れた順)
+        '''
+        nbytes, packets, sessions, bps = self.totals(interval)
+        v = nbytes if by == 'bytes' else packets
+        idx = np.flatnonzero(v != 0)
+        idx = idx[np.lexsort((self.first[idx], -v[idx]))][:n]
+        return [(self.names[i], int(nbytes[i]), int(packets[i]), int(sessions[i]), float(bps[i])) for i in idx]
+
+    def series(self, name):
+        '''
+        グループの区間ごとのレート
+        :return: bps の np 配列 (区間数)
+        '''
+        j = self.names.index(name)
+        return np.where(self.dt > 0, self.bytes[:, j] * 8 / np.maximum(self.dt, 1e-9), 0.0)
+
+
+class SessionDelta:
+    '''
+    datapath session のスナップショットを対応付け、区間ごとの差分を求める
+    '''
+    def __init__(self, snapshots=(), times=None, min_tage=MIN_TAGE):
+        '''
+        :param snapshots: テーブル または SessionTable のリスト (取得順)
+        :param times: 各スナップショットの取得時刻 (秒). None の場合は TAge から区間の長さを推定する
+        '''
+        self.min_tage = min_tage
+        self.snaps = []
+        self.times = []
+        self.built = False
+        for i, s in enumerate(snapshots):
+            self.add(s, times[i] if times is not None else None)
+
+    def add(self, snap, t=None):
+        '''
+        スナップショットを追加する
+        :param snap: show datapath session dpi のテーブル (ヘッダ行を含む) または SessionTable
+        :param t: 取得時刻 (秒. time.time() など)
+        '''
+        if not isinstance(snap, SessionTable):
+            snap = SessionTable(snap, min_tage=self.min_tage)
+        self.snaps.append(snap)
+        self.times.append(t)
+        self.built = False
+
+    def __len__(self):
+        return len(self.snaps)
+
+    def build(self):
+        '''
+        全スナップショットのセッションを対応付け、区間ごとの差分を計算する (add() の後、最初の参照時に自動で呼ばれる)
+        '''
+        if self.built:
+            return
+        if len(self.snaps) < 2:
+            raise ValueError("At least 2 snapshots are required")
+
+        #   IP と AppID のコードを全スナップショットで共通にし、5-tuple のキーを作る
+        ip_lookup, app_lookup = {}, {}
+        keys, sips, dips, apps = [], [], [], []
+        for s in self.snaps:
+            remap, ip_lookup = _factorize(s.ips, ip_lookup)
+            sip, dip = remap[s.sip], remap[s.dip]
+            remap, app_lookup = _factorize(s.app_values, app_lookup)
+            ipk = (sip.astype(np.uint64) << np.uint64(32)) | dip.astype(np.uint64)
+            portk = ((s.proto.astype(np.uint64) & np.uint64(0xffff)) << np.uint64(32)) \
+                | ((s.sport.astype(np.uint64) & np.uint64(0xffff)) << np.uint64(16)) \
+                | (s.dport.astype(np.uint64) & np.uint64(0xffff))
+            keys.append((ipk, portk))
+            sips.append(sip)
+            dips.append(dip)
+            apps.append(remap[s.app])
+        self.ips = list(ip_lookup)
+        self._ipa = None
+        self.app_values = list(app_lookup)
+
+        #   スナップショット間の対応付け: 全キーをソートして一意なセッション番号 (sid) にする
+        sizes = [s.n for s in self.snaps]
+        #   (ip, port) の 2 つのキーはそれぞれの一意な値の番号にして 1 つの int64 に詰め直す
+        _, ip_inv = np.unique(np.concatenate([k[0] for k in keys]), return_inverse=True)
+        ports, port_inv = np.unique(np.concatenate([k[1] for k in keys]), return_inverse=True)
+        uniq, inv = np.unique(ip_inv.ravel().astype(np.int64) * len(ports) + port_inv.ravel(), return_inverse=True)
+        inv = inv.ravel()
+        self.n = n = len(uniq)
+        self.sids = np.split(inv, np.cumsum(sizes)[:-1])
+        nsnap = len(self.snaps)
+        port = ports[uniq % len(ports)]
+        self.proto = (port >> np.uint64(32)).astype(np.int64)
+        self.sport = ((port >> np.uint64(16)) & np.uint64(0xffff)).astype(np.int64)
+        self.dport = (port & np.uint64(0xffff)).astype(np.int64)
+
+        #   スナップショット x セッション の値 (-1: スナップショットにないセッション)
+        nbytes = np.full((nsnap, n), -1, dtype=np.int64)
+        packets = np.full((nsnap, n), -1, dtype=np.int64)
+        tage = np.full((nsnap, n), -1, dtype=np.int64)
+        self.sip = np.zeros(n, dtype=np.int32)
+        self.dip = np.zeros(n, dtype=np.int32)
+        self.app = np.zeros(n, dtype=np.int32)
+        self.last = np.zeros(n, dtype=np.int64)     # 最後に現れたスナップショットでの行の位置
+        for i in range(nsnap - 1, -1, -1):          # 属性は最初に現れたスナップショットの値
+            s, sid = self.snaps[i], self.sids[i]
+            nbytes[i, sid] = s.bytes
+            packets[i, sid] = s.packets
+            tage[i, sid] = s.tage
+            self.sip[sid] = sips[i]
+            self.dip[sid] = dips[i]
+            self.app[sid] = apps[i]
+        for i, sid in enumerate(self.sids):
+            self.last[sid] = np.arange(len(sid)) + i * max(sizes)
+
+        #   区間ごとの差分
+        self.dbytes = np.zeros((nsnap - 1, n), dtype=np.int64)
+        self.dpackets = np.zeros((nsnap - 1, n), dtype=np.int64)
+        self.dt = np.zeros(nsnap - 1)
+        for i in range(1, nsnap):
+            cur, prev = nbytes[i], nbytes[i - 1]
+            present = cur >= 0
+            cont = present & (prev >= 0)
+            reset = cont & ((cur < prev) | (tage[i] < tage[i - 1]) | (packets[i] < packets[i - 1]))
+            if np.any(reset):
+                log.debug(f"Snapshot #{i+1}: {np.count_nonzero(reset)} sessions restarted.")
+            cont &= ~reset
+            self.dbytes[i - 1] = np.where(cont, cur - prev, np.where(present, cur, 0))
+            self.dpackets[i - 1] = np.where(cont, packets[i] - packets[i - 1], np.where(present, packets[i], 0))
+            self.dt[i - 1] = self._interval(i, tage[i][cont] - tage[i - 1][cont])
+        self.built = True
+
+    def _interval(self, i, dtage):
+        '''
+        区間 (スナップショット i-1 -> i) の長さ (秒)
+        :param dtage: 両方のスナップショットにあるセッションの TAge の増分
+        '''
+        t0, t1 = self.times[i - 1], self.times[i]
+        if t0 is not None and t1 is not None:
+            return float(t1 - t0)
+        if len(dtage) > 0:
+            return float(np.median(dtage))
+        log.warn(f"Snapshot #{i+1}: can't estimate the interval. Assuming {DEFAULT_INTERVAL} seconds.")
+        return DEFAULT_INTERVAL
+
+    #
+    #   フィルタ (セッション番号の bool 配列. & | ~ で組み合わせる)
+    #
+    def _ip_table(self, ips):
+        '''
+        IP アドレスのコード -> ips に含まれるか の bool 配列
+        :param ips: IP アドレスの集合, IP アドレスを引数とする関数, または cidr_table() の結果
+        '''
+        self.build()
+        if isinstance(ips, np.ndarray):
+            return ips
+        func = ips if callable(ips) else ips.__contains__
+        return np.array([bool(func(ip)) for ip in self.ips] or [False])
+
+    def cidr_table(self, nets):
+        '''
+        IP アドレスのコード -> CIDR nets (文字列 またはそのリスト) に含まれるか の bool 配列
+        (ip_mask(), by_client() の ips に指定する)
+        '''
+        self.build()
+        if self._ipa is None:
+            self._ipa = IPArray.from_values(self.ips)
+        return self._ipa.in_cidr(nets)
+
+    def ip_mask(self, ips, side='any'):
+        '''
+        IP アドレスが ips に含まれるセッション
+        :param ips: IP アドレスの集合, IP アドレスを引数とする関数, または cidr_table() の結果
+        :param side: 'src', 'dst', 'any', 'both'
+        '''
+        t = self._ip_table(ips)
+        return SessionTable._sides(lambda: t[self.sip], lambda: t[self.dip], side)
+
+    def port_mask(self, ports, side='any'):
+        '''
+        ポート番号が ports に含まれるセッション
+        '''
+        self.build()
+        ports = np.asarray(list(ports), dtype=np.int64)
+        return SessionTable._sides(lambda: np.isin(self.sport, ports), lambda: np.isin(self.dport, ports), side)
+
+    #
+    #   集計
+    #
+    def _group(self, keys, names, mask=None):
+        '''
+        キーごとの区間ごとの合計
+        :param keys: セッション番号 -> キーのコード の配列のタプル (負のコードは集計しない)
+        '''
+        k = np.stack(keys, axis=1).ravel()
+        sel = k >= 0
+        if mask is not None:
+            sel &= np.repeat(mask, len(keys))
+        pos = np.flatnonzero(sel)
+        k = k[pos]
+        sid = pos // len(keys)
+        g = len(names)
+
+        def sums(values):
+            return np.stack([np.bincount(k, weights=v[sid], minlength=g) for v in values]).astype(np.int64)
+
+        first = np.full(g, np.iinfo(np.int64).max)
+        np.minimum.at(first, k, self.last[sid] * len(keys) + pos % len(keys))
+        total = self.dbytes.sum(axis=0)
+        return GroupDelta(names, sums(self.dbytes), sums(self.dpackets), sums(self.dbytes != 0),
+                          np.bincount(k, weights=(total != 0)[sid], minlength=g).astype(np.int64), self.dt, first)
+
+    def by_client(self, ips=None, mask=None):
+        '''
+        クライアント (IP アドレス) ごとの転送量. 送信元・宛先の両方を集計する
+        :param ips: 集計する IP アドレス (ip_mask() の ips. None の場合は全て)
+        :param mask: 対象のセッション
+        :return: GroupDelta
+        '''
+        self.build()
+        if ips is None:
+            keys = (self.sip, self.dip)
+        else:
+            t = self._ip_table(ips)
+            keys = (np.where(t[self.sip], self.sip, -1), np.where(t[self.dip], self.dip, -1))
+        return self._group(keys, self.ips, mask)
+
+    def by_app(self, mask=None):
+        '''
+        アプリ (AppID) ごとの転送量
+        :return: GroupDelta
+        '''
+        self.build()
+        return self._group((self.app,), self.app_values, mask)
+
+    def by_session(self, mask=None):
+        '''
+        セッションごとの転送量. 名前は (送信元 IP, 宛先 IP, Prot, SPort, DPort)
+        :return: GroupDelta
+        '''
+        self.build()
+        names = [(self.ips[s], self.ips[d], p, sp, dp) for s, d, p, sp, dp in
+                 zip(self.sip.tolist(), self.dip.tolist(), self.proto.tolist(), self.sport.tolist(), self.dport.tolist())]
+        return self._group((np.arange(self.n),), names, mask)
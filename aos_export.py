@@ -0,0 +1,212 @@
+#
+#   aos_export.py
+#
+#   パース結果のテーブルを Parquet / Feather (Arrow IPC) で書き出す (AOSParser.export() で使用)
+#   - pyarrow が必要 (書き出し時に import する. パースのみの場合は不要)
+#   - 列の型
+#       typed=True で変換した列        int64 / float64 (欠損値は null)
+#       整数のみの列 (infer=True)       int64 (空欄は null)
+#       ColumnTable の辞書エンコード列  dictionary<string>
+#       その他                          string
+#   - 同じコマンドの複数のテーブル (ファイルごと、merge=False) は 1 つのファイルに結合する.
+#     filename 列 (ファイル入力の場合) で元のファイルを区別できる. ヘッダが異なるテーブルは別ファイル
+#   - スキーマのメタデータ 'aos.command' にコマンドを記録する
+#
+#       aos.export("out/")                                  # out/show_ap_active.parquet, ...
+#       aos.export("sessions.feather", DATAPATH_SESSION_DPI)
+#       cmd, tbl = read_export("out/show_ap_active.parquet")
+#
+
+import os
+import re
+import mylogger as log
+
+EXPORT_FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+_EXTENSIONS = {'.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+_INT_PAT = re.compile(r'-?(?:0|[1-9][0-9]{0,17})\Z')     # int64 に収まる正規形の整数
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required to export tables (pip install pyarrow)")
+    return pyarrow
+
+
+def export_format(fn, fmt=None):
+    '''
+    出力形式を決める
+    :param fn: ファイル名
+    :param fmt: 'parquet' / 'feather'. None の場合は拡張子から判定 (不明な場合は parquet)
+    :raise ValueError: 未対応の形式
+    '''
+    if fmt is None:
+        fmt = _EXTENSIONS.get(os.path.splitext(fn)[1].lower(), 'parquet')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return fmt
+
+
+def cmd_filename(cmd):
+    '''
+    コマンド (正規表現を含む場合あり) からファイル名に使える文字列を作る
+    '''
+    return re.sub(r'[^0-9A-Za-z]+', '_', cmd).strip('_') or 'table'
+
+
+def _unique_names(header):
+    '''
+    重複した列名に _2, _3, ... を付ける
+    '''
+    seen = {}
+    names = []
+    for col in header:
+        col = str(col)
+        n = seen.get(col, 0) + 1
+        seen[col] = n
+        names.append(col if n == 1 else f"{col}_{n}")
+    return names
+
+
+def _values_array(pa, values, infer):
+    '''
+    Python の値の配列から Arrow 配列を作る
+    '''
+    kinds = {type(v) for v in values if v is not None and v != ''}
+    if kinds and kinds <= {int}:
+        return pa.array([v if v != '' else None for v in values], pa.int64())
+    if kinds and kinds <= {int, float}:
+        return pa.array([v if v != '' else None for v in values], pa.float64())
+    if kinds <= {str}:
+        if infer and kinds and all(v == '' or _INT_PAT.match(v) for v in values):
+            return pa.array([int(v) if v != '' else None for v in values], pa.int64())
+        return pa.array(values, pa.string())
+    return pa.array([v if v is None or isinstance(v, str) else str(v) for v in values], pa.string())
+
+
+def _column_array(pa, col, infer):
+    '''
+    ColumnTable の列から Arrow 配列を作る
+    '''
+    kind = col.kind
+    if kind == 'dict':
+        codes = pa.array(col.codes, pa.uint32())
+        return pa.DictionaryArray.from_arrays(codes, pa.array(col.values, pa.string()))
+    if kind == 'int':
+        if infer:
+            return pa.array(col.data, pa.int64())
+        return pa.array(list(col), pa.string())
+    if kind == 'num':
+        return pa.array(list(col), pa.int64() if col.data.typecode == 'q' else pa.float64())
+    return _values_array(pa, list(col), infer)
+
+
+def table2arrow(tbl, cmd=None, infer=True):
+    '''
+    テーブルを pyarrow.Table に変換する
+    :param tbl: テーブル (2次元配列 または ColumnTable. ヘッダ行を含む)
+    :param cmd: スキーマのメタデータに記録するコマンド
+    :param infer: 整数のみの文字列の列を int64 にする
+    :return: pyarrow.Table
+    '''
+    pa = _pyarrow()
+    names = _unique_names(tbl[0])
+    if hasattr(tbl, 'cols'):        # ColumnTable
+        arrays = [_column_array(pa, c, infer) for c in tbl.cols]
+    else:
+        rows = tbl[1:]
+        arrays = [_values_array(pa, [row[j] for row in rows], infer) for j in range(len(names))]
+    meta = {'aos.command': cmd} if cmd is not None else None
+    return pa.table(arrays, names=names, metadata=meta)
+
+
+def _concat(pa, tables):
+    '''
+    同じ列名の pyarrow.Table を結合する. 列の型がテーブルによって異なる場合は string に揃える
+    '''
+    if len(tables) == 1:
+        return tables[0]
+    arrays = []
+    for j in range(tables[0].num_columns):
+        cols = [t.column(j) for t in tables]
+        types = {c.type for c in cols}
+        if len(types) > 1:
+            cols = [c.cast(pa.string()) for c in cols]
+        arrays.append(pa.chunked_array([chunk for c in cols for chunk in c.chunks],
+                                       cols[0].type if len(types) == 1 else pa.string()))
+    return pa.table(arrays, names=tables[0].column_names, metadata=tables[0].schema.metadata)
+
+
+def write_tables(tables, fn, cmd=None, fmt=None, infer=True):
+    '''
+    同じコマンドのテーブルを 1 つのファイルに書き出す. ヘッダが異なるテーブルは fn に _2, _3, ... を付けた別ファイル
+    :param tables: テーブルの配列
+    :param fn: ファイル名
+    :param cmd: コマンド (メタデータ)
+    :param fmt: 'parquet' / 'feather'. None の場合は拡張子から判定
+    :param infer: 整数のみの文字列の列を int64 にする
+    :return: 書き出したファイル名のリスト
+    '''
+    fmt = export_format(fn, fmt)
+    pa = _pyarrow()
+    groups = {}     # ヘッダ -> テーブルの配列
+    for tbl in tables:
+        if len(tbl) > 1:
+            groups.setdefault(tuple(tbl[0]), []).append(tbl)
+
+    written = []
+    base, ext = os.path.splitext(fn)
+    for i, tbls in enumerate(groups.values(), 1):
+        out = fn if i == 1 else f"{base}_{i}{ext}"
+        at = _concat(pa, [table2arrow(tbl, cmd, infer) for tbl in tbls])
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(at, out)
+        else:
+            import pyarrow.feather as feather
+            # Arrow IPC ファイルはバッチごとに異なる辞書を持てないため、辞書を統一する
+            feather.write_feather(at.unify_dictionaries(), out)
+        log.info(f"{at.num_rows} records written to {out}.")
+        written.append(out)
+    if not written:
+        log.info(f"No data written to {fn}.")
+    return written
+
+
+def export_tables(tables, outdir, fmt='parquet', infer=True):
+    '''
+    全コマンドのテーブルをディレクトリに書き出す (コマンドごとに 1 ファイル)
+    :param tables: AOSParser.tables (コマンド -> テーブルの配列)
+    :param outdir: 出力先ディレクトリ (なければ作成)
+    :return: 書き出したファイル名のリスト
+    '''
+    fmt = export_format(outdir, fmt)
+    os.makedirs(outdir, exist_ok=True)
+    written = []
+    for cmd, tbls in tables.items():
+        fn = os.path.join(outdir, cmd_filename(cmd) + EXPORT_FORMATS[fmt])
+        written += write_tables(tbls, fn, cmd, fmt, infer)
+    return written
+
+
+def read_export(fn, fmt=None):
+    '''
+    export() で書き出したファイルを読み込む
+    :param fn: ファイル名
+    :param fmt: 'parquet' / 'feather'. None の場合は拡張子から判定
+    :return: (コマンド (メタデータがない場合は None), テーブル (ヘッダ行 + 行の 2次元配列))
+    '''
+    fmt = export_format(fn, fmt)
+    _pyarrow()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        at = pq.read_table(fn)
+    else:
+        import pyarrow.feather as feather
+        at = feather.read_table(fn)
+    meta = at.schema.metadata or {}
+    cmd = meta.get(b'aos.command')
+    cols = [c.to_pylist() for c in at.columns]
+    return (cmd.decode('utf-8') if cmd is not None else None), [at.column_names] + [list(r) for r in zip(*cols)]
@@ -0,0 +1,275 @@
+#
+#   aos_index.py
+#
+#   パース結果テーブルのハッシュインデックス (AOSParser.index() で使用)
+#   - キー列の値 -> 行番号の配列 を 1 回だけ構築し、以降の検索は O(1)
+#   - 複数列をキーにする場合、キーは値のタプル
+#   - 1 つのキーに複数の行がある場合は出現順に保持 (group-by として使用可能)
+#
+#       idx = aos.index(USER_TABLE, 'IP')
+#       row = idx.get('10.1.1.1')                   # 最初の行
+#       apn = idx.lookup('10.1.1.1', 'AP name')     # 列の値
+#       ip2apn = idx.mapping('AP name')             # キー -> 列の値 の dict
+#       idx = aos.index(AP_BSS_TABLE, 'ap name', 'band')
+#       rows = idx.rows(('AP-1F-01', '5GHz'))
+#
+#   キーによる重複排除 (dedup_table, dedup_rows) もここで行う. いずれもハッシュによる 1 パス (O(n))
+#       keep='first'    最初の行を残す
+#       keep='last'     最後の行を残す
+#       keep='max'      by 列の値が最大の行を残す (数値として比較. 数値でない値は最小とみなす)
+#       keep='fewest_blanks'  by 列 (省略時は全列) の空欄が最も少ない行を残す
+#     同点の場合は先に出現した行. 結果の行の順序はキーが最初に出現した順
+#
+
+from collections import defaultdict
+
+DEDUP_POLICIES = ('first', 'last', 'max', 'fewest_blanks')
+
+
+def iter_keys(tbl, kidx):
+    '''
+    テーブルの各データ行のキーを返すイテレータ. ColumnTable の場合は行を生成せずにキー列のみ読む
+    :param tbl: テーブル (ヘッダ行を含む)
+    :param kidx: キー列の番号の配列. 2 つ以上の場合、キーはタプル
+    '''
+    if hasattr(tbl, 'iter_cols'):      # ColumnTable
+        keys = tbl.iter_cols(*kidx)
+        if len(kidx) > 1:
+            keys = map(tuple, keys)
+        return keys
+    return _row_keys(tbl[1:], kidx)
+
+
+def _row_keys(rows, kidx):
+    if len(kidx) == 1:
+        k = kidx[0]
+        return (row[k] for row in rows)
+    return (tuple([row[k] for k in kidx]) for row in rows)
+
+
+def _num(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return float('-inf')
+
+
+def _scores(values, keep):
+    '''
+    keep='max' / 'fewest_blanks' で比較する値のイテレータ (大きい方を残す)
+    :param values: 比較に使う列の値のイテレータ (fewest_blanks の場合は各行の値のタプル)
+    '''
+    if keep == 'max':
+        return map(_num, values)
+    return (-sum(1 for x in vals if x == '' or x is None) for vals in values)
+
+
+def _dedup_pos(keys, keep='first', scores=None):
+    '''
+    重複排除の本体
+    :param keys: 各行のキーのイテレータ
+    :param keep: 残す行の選択方法 (DEDUP_POLICIES)
+    :param scores: keep='max' / 'fewest_blanks' の場合、各行の値のイテレータ (大きい方を残す)
+    :return: 残す行の位置 (0 起点) の配列
+    '''
+    if keep not in DEDUP_POLICIES:
+        raise ValueError(f"Unknown dedup policy: {keep}")
+    pos = {}        # キー -> kept 内の位置
+    kept = []
+    if keep == 'first':
+        for i, key in enumerate(keys):
+            if key not in pos:
+                pos[key] = len(kept)
+                kept.append(i)
+        return kept
+    if keep == 'last':
+        for i, key in enumerate(keys):
+            p = pos.get(key)
+            if p is None:
+                pos[key] = len(kept)
+                kept.append(i)
+            else:
+                kept[p] = i
+        return kept
+
+    best = []
+    for i, (key, score) in enumerate(zip(keys, scores)):
+        p = pos.get(key)
+        if p is None:
+            pos[key] = len(kept)
+            kept.append(i)
+            best.append(score)
+        elif score > best[p]:
+            kept[p] = i
+            best[p] = score
+    return kept
+
+
+def dedup_rows(rows, key=0, keep='first', by=None):
+    '''
+    行の配列をキー列で重複排除する (ヘッダのない配列用)
+    :param rows: 行の配列
+    :param key: キー列の番号. タプルで複数指定可能
+    :param keep: 残す行の選択方法 ('first', 'last', 'max', 'fewest_blanks')
+    :param by: keep='max' では比較する列の番号、'fewest_blanks' では空欄を数える列の番号の配列 (省略時は全列)
+    :return: 重複排除した行の配列
+    '''
+    rows = rows if isinstance(rows, list) else list(rows)
+    kidx = key if isinstance(key, (tuple, list)) else (key,)
+    scores = None
+    if keep == 'max':
+        scores = _scores((row[by] for row in rows), keep)
+    elif keep == 'fewest_blanks':
+        scores = _scores(rows if by is None else ([row[j] for j in by] for row in rows), keep)
+    return [rows[i] for i in _dedup_pos(_row_keys(rows, kidx), keep, scores)]
+
+
+def dedup_table(tbl, keycols, keep='first', by=None):
+    '''
+    テーブルをキー列で重複排除する
+    :param tbl: テーブル (2次元配列 または ColumnTable)
+    :param keycols: キー列名の配列
+    :param keep: 残す行の選択方法 ('first', 'last', 'max', 'fewest_blanks')
+    :param by: keep='max' では比較する列名、'fewest_blanks' では空欄を数える列名の配列 (省略時は全列)
+    :return: 新しいテーブル (ColumnTable の場合は ColumnTable)
+    :raise ValueError: 列が存在しない場合
+    '''
+    header = tbl[0]
+    kidx = [header.index(col) for col in keycols]
+    columnar = hasattr(tbl, 'iter_cols')
+
+    scores = None
+    if keep == 'max':
+        j = header.index(by)
+        scores = _scores(tbl.column(j) if columnar else (row[j] for row in tbl[1:]), keep)
+    elif keep == 'fewest_blanks':
+        idx = range(len(header)) if by is None else [header.index(col) for col in by]
+        if columnar:
+            values = zip(*[tbl.cols[j] for j in idx])
+        else:
+            values = ([row[j] for j in idx] for row in tbl[1:])
+        scores = _scores(values, keep)
+
+    kept = _dedup_pos(iter_keys(tbl, kidx), keep, scores)
+    if columnar:
+        return tbl.take(kept)
+    return [header] + [tbl[i + 1] for i in kept]
+
+
+class TableIndex:
+    """
+    テーブルのキー列によるハッシュインデックス
+    """
+
+    def __init__(self, tbl, *keycols):
+        '''
+        :param tbl: テーブル (2次元配列 または ColumnTable)
+        :param keycols: キーとする列名. 2 つ以上指定した場合、キーはタプル
+        :raise ValueError: 列が存在しない場合
+        '''
+        if len(keycols) == 0:
+            raise ValueError("No key column specified")
+        self.tbl = tbl
+        self.keycols = keycols
+        self.kidx = [tbl[0].index(col) for col in keycols]
+        self.nrows = len(tbl)
+        self.map = self.build()
+
+    def build(self):
+        '''
+        キー -> 行番号 (tbl[i] の i, 1 起点) の配列 の dict を作成する
+        '''
+        m = defaultdict(list)
+        for i, key in enumerate(iter_keys(self.tbl, self.kidx), 1):
+            m[key].append(i)
+        return dict(m)
+
+    def is_valid(self, tbl):
+        '''
+        インデックスが tbl に対して有効か (同一テーブルで、行数が変わっていないか)
+        '''
+        return self.tbl is tbl and self.nrows == len(tbl)
+
+    def __contains__(self, key):
+        return key in self.map
+
+    def __len__(self):
+        return len(self.map)
+
+    def keys(self):
+        return self.map.keys()
+
+    def count(self, key):
+        '''
+        キーに一致する行数
+        '''
+        return len(self.map.get(key, ()))
+
+    def rownums(self, key):
+        '''
+        キーに一致する行の行番号 (tbl[i] の i) の配列
+        '''
+        return self.map.get(key, [])
+
+    def rows(self, key):
+        '''
+        キーに一致する行の配列
+        '''
+        tbl = self.tbl
+        return [tbl[i] for i in self.map.get(key, ())]
+
+    def get(self, key, default=None, last=False):
+        '''
+        キーに一致する行を 1 つ返す
+        :param key: キー (複数列の場合はタプル)
+        :param default: 一致する行がない場合の戻り値
+        :param last: True の場合は最後の行、False の場合は最初の行
+        :return: 行
+        '''
+        nums = self.map.get(key)
+        if not nums:
+            return default
+        return self.tbl[nums[-1] if last else nums[0]]
+
+    def lookup(self, key, col, default=None, last=False):
+        '''
+        キーに一致する行の col 列の値を返す
+        :param col: 列名
+        :return: 列の値. 一致する行がない場合は default
+        '''
+        row = self.get(key, last=last)
+        if row is None:
+            return default
+        return row[self.tbl[0].index(col)]
+
+    def mapping(self, col, last=True):
+        '''
+        キー -> col 列の値 の dict を返す
+        :param col: 列名
+        :param last: 同じキーが複数ある場合、True なら最後の行 (ループで dict を作る場合と同じ)、
+                     False なら最初の行の値を使用
+        :return: dict
+        '''
+        tbl = self.tbl
+        j = tbl[0].index(col)
+        pos = -1 if last else 0
+        if hasattr(tbl, 'cols'):            # ColumnTable
+            c = tbl.cols[j]
+            return {key: c.get(nums[pos] - 1) for key, nums in self.map.items()}
+        return {key: tbl[nums[pos]][j] for key, nums in self.map.items()}
+
+    def groups(self, col=None):
+        '''
+        group-by. キー -> 行の配列 (col を指定した場合は col 列の値の配列) の dict を返す
+        '''
+        tbl = self.tbl
+        if col is None:
+            return {key: [tbl[i] for i in nums] for key, nums in self.map.items()}
+        j = tbl[0].index(col)
+        if hasattr(tbl, 'cols'):            # ColumnTable
+            c = tbl.cols[j]
+            return {key: [c.get(i - 1) for i in nums] for key, nums in self.map.items()}
+        return {key: [tbl[i][j] for i in nums] for key, nums in self.map.items()}
+
+    def __repr__(self):
+        return f"<TableIndex {self.keycols} {len(self.map)} keys>"
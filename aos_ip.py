@@ -0,0 +1,243 @@
+#
+#   aos_ip.py
+#
+#   IP アドレスの列を整数の配列 (IPArray) にして、文字列操作なしに判定・集計する
+#   - IPv4 / IPv6 を 2 つの uint64 (hi: 上位 64bit, lo: 下位 64bit) と version (4 / 6. 0 は IP アドレスでない値) で持つ.
+#     IPv4 は lo の下位 32bit
+#   - 文字列からの変換は一意な値ごとに 1 回だけ行う. ColumnTable の辞書エンコード列や SessionTable の ips は
+#     パース時のコードをそのまま使う
+#   - CIDR (in_cidr), 種類の判定 (is_multicast, is_broadcast, is_private, classify), サブネットごとの集計 (subnet_rollup)
+#   numpy が必要
+#
+#       ipa = ip_column(user_tbl, 'IP')
+#       m = ipa.in_cidr(['10.0.0.0/8', '192.168.1.0/24'])
+#       ipa.classify()                                  # IP_CLASSES のコード
+#       subnet_rollup(ipa, 24, weights=bitrate)         # [('10.1.2.0/24', 合計, 件数), ...]
+#
+
+import ipaddress
+import numpy as np
+
+IP_CLASSES = ('invalid', 'multicast', 'broadcast', 'loopback', 'link-local', 'private', 'public')
+
+_MASK64 = (1 << 64) - 1
+
+# 種類の判定に使うネットワーク
+_MULTICAST = ('224.0.0.0/4', 'ff00::/8')
+_LOOPBACK = ('127.0.0.0/8', '::1/128')
+_LINK_LOCAL = ('169.254.0.0/16', 'fe80::/10')
+_PRIVATE = ('10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', '100.64.0.0/10', 'fc00::/7')
+
+
+def parse_ip(s):
+    '''
+    IP アドレスの文字列を (version, hi, lo) にする
+    :return: IP アドレスでない場合 (MAC アドレス, 空欄など) は (0, 0, 0)
+    '''
+    if not isinstance(s, str):
+        return 0, 0, 0
+    parts = s.split('.')
+    if len(parts) == 4:         # IPv4 (大部分) は ipaddress を使わずに変換する
+        try:
+            a, b, c, d = (int(p) for p in parts)
+        except ValueError:
+            return 0, 0, 0
+        if 0 <= a < 256 and 0 <= b < 256 and 0 <= c < 256 and 0 <= d < 256:
+            return 4, 0, (a << 24) | (b << 16) | (c << 8) | d
+        return 0, 0, 0
+    if ':' not in s:
+        return 0, 0, 0
+    try:
+        a = ipaddress.ip_address(s.strip())
+    except ValueError:
+        return 0, 0, 0
+    n = int(a)
+    return a.version, n >> 64, n & _MASK64
+
+
+def _network(net):
+    '''
+    CIDR (文字列) を (version, hi, lo, mask hi, mask lo) にする
+    :raise ValueError: CIDR でない場合
+    '''
+    net = ipaddress.ip_network(net, strict=False)
+    bits = 32 if net.version == 4 else 128
+    mask = ((1 << net.prefixlen) - 1) << (bits - net.prefixlen)
+    n = int(net.network_address)
+    return net.version, n >> 64, n & _MASK64, mask >> 64, mask & _MASK64
+
+
+class IPArray:
+    '''
+    IP アドレスの配列 (hi, lo, version の np 配列)
+    '''
+    def __init__(self, version, hi, lo):
+        self.version = version
+        self.hi = hi
+        self.lo = lo
+
+    @classmethod
+    def from_strings(cls, values):
+        '''
+        IP アドレスの文字列の配列から作成する (同じ文字列は 1 回だけ変換する)
+        '''
+        conv = {}
+        codes = np.array([conv.setdefault(v, len(conv)) for v in values], dtype=np.int64)
+        return cls.from_values(list(conv)).take(codes)
+
+    @classmethod
+    def from_values(cls, values):
+        '''
+        一意な IP アドレスの文字列の配列から作成する (各値を変換する)
+        '''
+        parsed = [parse_ip(v) for v in values]
+        return cls(np.array([p[0] for p in parsed], dtype=np.int8),
+                   np.array([p[1] for p in parsed], dtype=np.uint64),
+                   np.array([p[2] for p in parsed], dtype=np.uint64))
+
+    def take(self, codes):
+        '''
+        コード (値の番号) の配列で参照した IPArray
+        '''
+        return IPArray(self.version[codes], self.hi[codes], self.lo[codes])
+
+    def __len__(self):
+        return len(self.version)
+
+    def __getitem__(self, i):
+        return self.to_string(i)
+
+    def to_string(self, i):
+        '''
+        i 番目の IP アドレスの文字列 (IP アドレスでない場合は '')
+        '''
+        v = int(self.version[i])
+        if v == 4:
+            return str(ipaddress.IPv4Address(int(self.lo[i])))
+        if v == 6:
+            return str(ipaddress.IPv6Address((int(self.hi[i]) << 64) | int(self.lo[i])))
+        return ''
+
+    def ipv4(self):
+        '''
+        IPv4 アドレスを uint32 の配列にする (IPv4 でない値は 0)
+        '''
+        return np.where(self.version == 4, self.lo, np.uint64(0)).astype(np.uint32)
+
+    #
+    #   判定 (bool の配列)
+    #
+    def in_cidr(self, nets):
+        '''
+        IP アドレスがいずれかのネットワークに含まれるか
+        :param nets: CIDR の文字列 ('10.0.0.0/8', '2001:db8::/32', 1 アドレスの場合はプレフィクス長を省略可) またはそのリスト
+        '''
+        nets = [nets] if isinstance(nets, str) else nets
+        m = np.zeros(len(self), dtype=bool)
+        for net in nets:
+            ver, hi, lo, mhi, mlo = _network(net)
+            m |= (self.version == ver) & ((self.hi & np.uint64(mhi)) == np.uint64(hi)) \
+                & ((self.lo & np.uint64(mlo)) == np.uint64(lo))
+        return m
+
+    def is_valid(self):
+        return self.version != 0
+
+    def is_multicast(self):
+        return self.in_cidr(_MULTICAST)
+
+    def is_broadcast(self):
+        '''
+        リミテッドブロードキャスト (255.255.255.255)
+        '''
+        return (self.version == 4) & (self.lo == np.uint64(0xffffffff))
+
+    def is_loopback(self):
+        return self.in_cidr(_LOOPBACK)
+
+    def is_link_local(self):
+        return self.in_cidr(_LINK_LOCAL)
+
+    def is_private(self):
+        '''
+        プライベートアドレス (RFC1918, CGNAT 100.64.0.0/10, IPv6 ULA)
+        '''
+        return self.in_cidr(_PRIVATE)
+
+    def classify(self):
+        '''
+        IP アドレスの種類
+        :return: IP_CLASSES の番号の np.int8 配列 (複数に該当する場合は IP_CLASSES の先の方)
+        '''
+        cls = np.full(len(self), IP_CLASSES.index('public'), dtype=np.int8)
+        checks = (('private', self.is_private), ('link-local', self.is_link_local), ('loopback', self.is_loopback),
+                  ('broadcast', self.is_broadcast), ('multicast', self.is_multicast))
+        for name, func in checks:
+            cls[func()] = IP_CLASSES.index(name)
+        cls[self.version == 0] = IP_CLASSES.index('invalid')
+        return cls
+
+    #
+    #   サブネット
+    #
+    def subnet(self, prefix4=24, prefix6=64):
+        '''
+        IP アドレスをネットワークアドレスにした IPArray
+        :param prefix4: IPv4 のプレフィクス長
+        :param prefix6: IPv6 のプレフィクス長
+        '''
+        m4 = ((1 << prefix4) - 1) << (32 - prefix4)
+        m6 = ((1 << prefix6) - 1) << (128 - prefix6)
+        v4 = self.version == 4
+        v6 = self.version == 6
+        hi = np.where(v6, self.hi & np.uint64(m6 >> 64), np.uint64(0))
+        lo = np.where(v4, self.lo & np.uint64(m4), np.where(v6, self.lo & np.uint64(m6 & _MASK64), np.uint64(0)))
+        return IPArray(self.version, hi, lo)
+
+
+def ip_column(tbl, col):
+    '''
+    テーブルの IP アドレスの列を IPArray にする. ColumnTable の辞書エンコード列はコードをそのまま使う
+    :param tbl: テーブル (2次元配列 または ColumnTable. ヘッダ行を含む)
+    :param col: 列名
+    :raise ValueError: 列が存在しない場合
+    '''
+    j = tbl[0].index(col)
+    c = tbl.cols[j] if hasattr(tbl, 'cols') else None
+    if c is not None and c.kind == 'dict':
+        return IPArray.from_values(c.values).take(np.frombuffer(c.codes, dtype=c.codes.typecode))
+    if c is not None:
+        return IPArray.from_strings(c)
+    return IPArray.from_strings([row[j] for row in tbl[1:]])
+
+
+def subnet_rollup(ipa, prefix4=24, prefix6=64, weights=None, mask=None, n=None):
+    '''
+    サブネットごとの合計 (IP アドレスでない値は除く)
+    :param ipa: IPArray
+    :param weights: 値の配列 (None の場合は件数)
+    :param mask: 対象の bool 配列
+    :param n: 上位 n 件 (None の場合は全て)
+    :return: [(サブネット 'a.b.c.d/n', 合計, 件数), ...] 合計の降順 (同じ場合は最初に出現した順)
+    '''
+    sel = ipa.version != 0
+    if mask is not None:
+        sel &= mask
+    idx = np.flatnonzero(sel)
+    if len(idx) == 0:
+        return []
+    net = ipa.take(idx).subnet(prefix4, prefix6)
+    if np.all(net.version == 4):
+        keys = net.lo           # IPv4 のみの場合は 1 つの整数で比較する
+    else:
+        keys = np.empty(len(idx), dtype=[('v', 'i1'), ('hi', '<u8'), ('lo', '<u8')])
+        keys['v'], keys['hi'], keys['lo'] = net.version, net.hi, net.lo
+    _, first, inv = np.unique(keys, return_index=True, return_inverse=True)
+    inv = inv.ravel()
+    counts = np.bincount(inv)
+    sums = counts if weights is None else np.bincount(inv, weights=np.asarray(weights)[idx])
+    order = np.lexsort((first, -sums))[:n]
+    nets = net.take(first)
+    conv = int if weights is None else float
+    return [(f"{nets.to_string(i)}/{prefix4 if nets.version[i] == 4 else prefix6}", conv(sums[i]), int(counts[i]))
+            for i in order]
@@ -0,0 +1,189 @@
+#
+#   aos_mac.py
+#
+#   MAC アドレスのユーティリティ
+#   - MAC アドレスの列を 48bit 整数にまとめて変換 (同じ MAC は 1 回だけ変換)
+#   - ビット演算による分類
+#       multicast           第 1 オクテットの bit0 (I/G bit)
+#       locally administered 第 1 オクテットの bit1 (U/L bit)
+#       random              locally administered かつ unicast (x2, x6, xA, xE. 端末のランダム MAC)
+#   - ベンダー (aos_oui) ごとの台数の集計
+#   numpy が import 済みの場合は numpy の配列演算で分類する
+#
+#       from aos_mac import mac_column, count_types, vendor_counts
+#       macs = mac_column(user_tbl, 'MAC')
+#       count_types(macs)                   # {'universal': 10, 'random': 5, 'multicast': 0, 'invalid': 0}
+#       vendor_counts(macs, width=10)       # {'Apple, Inc': 8, 'Intel Corp': 3, ...}
+#
+
+import sys
+
+MULTICAST_BIT = 1 << 40
+LOCAL_BIT = 1 << 41
+
+MAC_TYPES = ('universal', 'random', 'multicast', 'invalid')
+
+_MAC_DELETE = str.maketrans('', '', ':-. ')
+
+
+def mac2int(mac):
+    '''
+    MAC アドレス (aa:bb:cc:dd:ee:ff, aabb.ccdd.eeff, aa-bb-cc-dd-ee-ff など) を 48bit 整数に変換する.
+    12 桁に満たない場合 (OUI のみなど) は下位を 0 とみなす
+    :return: 整数. 変換できない場合は None
+    '''
+    if len(mac) == 17 and mac[2] == ':':        # aa:bb:cc:dd:ee:ff (大部分)
+        try:
+            return int(mac.replace(':', ''), 16)
+        except ValueError:
+            return None
+    s = mac.translate(_MAC_DELETE)
+    if not 0 < len(s) <= 12:
+        return None
+    try:
+        return int(s, 16) << (4 * (12 - len(s)))
+    except ValueError:
+        return None
+
+
+def int2mac(n):
+    '''
+    48bit 整数を aa:bb:cc:dd:ee:ff 形式の文字列に変換する
+    '''
+    h = f"{n:012x}"
+    return ':'.join(h[i:i + 2] for i in range(0, 12, 2))
+
+
+def macs2ints(macs):
+    '''
+    MAC アドレスの配列を 48bit 整数のリストに変換する. 同じ文字列は 1 回だけ変換する
+    :param macs: MAC アドレス文字列 (または整数) のイテレータ
+    :return: 整数のリスト. 変換できない値は None
+    '''
+    macs = macs if isinstance(macs, list) else list(macs)
+    conv = {m: m if isinstance(m, int) else mac2int(m) for m in set(macs)}
+    return [conv[m] for m in macs]
+
+
+def mac_column(tbl, col):
+    '''
+    テーブルの MAC アドレス列を 48bit 整数のリストに変換する
+    :param tbl: テーブル (2次元配列 または ColumnTable. ヘッダ行を含む)
+    :param col: 列名
+    :return: 整数のリスト (データ行の順. 変換できない値は None)
+    :raise ValueError: 列が存在しない場合
+    '''
+    j = tbl[0].index(col)
+    if hasattr(tbl, 'column'):      # ColumnTable
+        return macs2ints(tbl.column(j))
+    return macs2ints([row[j] for row in tbl[1:]])
+
+
+def is_multicast(n):
+    return bool(n & MULTICAST_BIT)
+
+
+def is_local(n):
+    return bool(n & LOCAL_BIT)
+
+
+def is_random(n):
+    '''
+    ランダム MAC (locally administered かつ unicast) か
+    '''
+    return n & (LOCAL_BIT | MULTICAST_BIT) == LOCAL_BIT
+
+
+def mac_type(n):
+    '''
+    MAC アドレスの種類 (MAC_TYPES のいずれか)
+    :param n: 48bit 整数 (None の場合は 'invalid')
+    '''
+    if n is None:
+        return 'invalid'
+    if n & MULTICAST_BIT:
+        return 'multicast'
+    if n & LOCAL_BIT:
+        return 'random'
+    return 'universal'
+
+
+def random_flags(macs):
+    '''
+    各 MAC アドレスがランダム MAC かどうかのリスト
+    :param macs: 48bit 整数 (None 可) または MAC アドレス文字列 のリスト
+    :return: bool のリスト
+    '''
+    ints = _ints(macs)
+    np = sys.modules.get('numpy')
+    if np is not None and len(ints) > 0:
+        a = np.array([-1 if n is None else n for n in ints], dtype=np.int64)
+        return ((a >= 0) & ((a & (LOCAL_BIT | MULTICAST_BIT)) == LOCAL_BIT)).tolist()
+    return [n is not None and n & (LOCAL_BIT | MULTICAST_BIT) == LOCAL_BIT for n in ints]
+
+
+def count_types(macs):
+    '''
+    MAC アドレスの種類ごとの数を数える
+    :param macs: 48bit 整数 (None 可) または MAC アドレス文字列 のリスト
+    :return: dict 種類 (MAC_TYPES) -> 数. locally administered の multicast は multicast に数える
+    '''
+    ints = _ints(macs)
+    counts = dict.fromkeys(MAC_TYPES, 0)
+    invalid = sum(1 for n in ints if n is None)
+    np = sys.modules.get('numpy')
+    if np is not None and len(ints) > invalid:
+        a = np.array([n for n in ints if n is not None], dtype=np.int64)
+        bits = (a >> 40) & 3        # bit0: multicast, bit1: locally administered
+        nb = np.bincount(bits, minlength=4).tolist()
+        counts['universal'] = nb[0]
+        counts['random'] = nb[2]
+        counts['multicast'] = nb[1] + nb[3]
+    else:
+        for n in ints:
+            if n is not None:
+                counts[mac_type(n)] += 1
+    counts['invalid'] = invalid
+    return counts
+
+
+def vendor_counts(macs, width=None, unknown='Unknown', random_label=None):
+    '''
+    ベンダーごとの台数を集計する (OUI の検索は aos_oui.lookup_many で一括して行う)
+    :param macs: 48bit 整数 (None 可) または MAC アドレス文字列 のリスト
+    :param width: ベンダー名をこの文字数で切り詰める (表示用)
+    :param unknown: OUI が見つからない MAC のベンダー名
+    :param random_label: ランダム MAC をこのベンダー名で集計する (None の場合はランダム MAC も OUI を検索する)
+    :return: dict ベンダー名 -> 台数 (最初に出現した順)
+    '''
+    from aos_oui import lookup_many
+    ints = _ints(macs)
+    if random_label is not None:
+        flags = random_flags(ints)
+        vendors = lookup_many([n for n, r in zip(ints, flags) if not r and n is not None])
+        it = iter(vendors)
+        names = [random_label if r else (next(it) if n is not None else None) for n, r in zip(ints, flags)]
+    else:
+        names = lookup_many([n for n in ints if n is not None])
+        if len(names) < len(ints):
+            it = iter(names)
+            names = [next(it) if n is not None else None for n in ints]
+
+    counts = {}
+    for v in names:
+        if v is None:
+            v = unknown
+        elif width:
+            v = v[:width]
+        counts[v] = counts.get(v, 0) + 1
+    return counts
+
+
+def _ints(macs):
+    '''
+    整数のリストはそのまま、文字列を含む場合は macs2ints() で変換する
+    '''
+    macs = macs if isinstance(macs, list) else list(macs)
+    if all(n is None or isinstance(n, int) for n in macs):
+        return macs
+    return macs2ints(macs)
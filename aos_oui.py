@@ -0,0 +1,442 @@
+#
+#   aos_oui.py
+#
+#   OUI (MAC アドレスのベンダー) データベース
+#   - oui.bin: プレフィックス長 (24/28/36 bit) ごとのソート済みプレフィックス配列 + ベンダー名の文字列テーブル
+#   - 最初の lookup() で mmap して使用する (ロードのコストはほぼ 0. 全エントリを dict に展開しない)
+#   - MA-L (24bit), MA-M (28bit), MA-S (36bit) に対応. 長いプレフィックスを優先する
+#   - lookup_many() は MAC アドレスの配列を一括で検索する (numpy があれば searchsorted を使用. import は初回使用時)
+#
+#       from aos_oui import lookup, lookup_many
+#       lookup('00:0b:86:12:34:56')                 # 'Aruba, a Hewlett Packard Enterprise Company'
+#       lookup_many(macs, default='Unknown')
+#
+#   oui.bin のフォーマット (リトルエンディアン)
+#       header      magic(8) n24(4) n28(4) n36(4) nvendors(4)
+#       24bit       prefix: uint32 x n24, vendor: uint32 x n24
+#       28bit       prefix: uint32 x n28, vendor: uint32 x n28
+#       36bit       prefix: uint64 x n36, vendor: uint32 x n36 (+ 8 byte 境界までパディング)
+#       vendors     offset: uint32 x (nvendors + 1), UTF-8 文字列を連結したもの
+#
+#   環境変数 AOS_OUI_DB でファイルを指定可能 (省略時はこのモジュールと同じディレクトリの oui.bin)
+#
+#   oui.bin は IEEE のレジストリファイル (oui.txt, oui.csv, mam.csv, oui36.csv, iab.csv) から
+#   update_db() で作成・更新する (oui-build.py). 既存の oui.bin とマージし、追加・変更されたエントリを返す
+#
+
+import os
+import re
+import sys
+import csv
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+import mylogger as log
+from aos_mac import mac2int
+
+_np = None      # numpy (lookup_many() で初めて必要になった時に import する). False: なし
+NP_MIN_KEYS = 10000     # lookup_many() で検索する OUI がこの数を超える場合は numpy を import して使用する
+
+
+def _numpy():
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np
+
+MAGIC = b'AOSOUI01'
+_HEADER = struct.Struct('<8sIIII')
+
+PREFIX_BITS = (36, 28, 24)      # 検索の優先順 (長いプレフィックスを優先)
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "oui.bin")
+
+_UNRESOLVED = object()      # lookup_many() で個別に検索する MAC
+
+
+def write_db(fn, entries):
+    '''
+    oui.bin を作成する
+    :param fn: ファイル名
+    :param entries: (プレフィックス長, プレフィックス, ベンダー名) のイテレータ.
+                    プレフィックスは上位 bits ビットの整数 (例: 24bit の 00:0B:86 は 0x000B86)
+    :return: エントリ数
+    '''
+    tables = {bits: {} for bits in PREFIX_BITS}
+    for bits, prefix, vendor in entries:
+        tables[bits][prefix] = vendor
+    # 入力の順序によらず同じ内容のファイルになるよう、ベンダー名はソートして番号を付ける
+    names = sorted({v for tbl in tables.values() for v in tbl.values()})
+    vendors = {v: i for i, v in enumerate(names)}
+    for tbl in tables.values():
+        for prefix, v in tbl.items():
+            tbl[prefix] = vendors[v]
+
+    blobs = [v.encode('utf-8') for v in names]
+    offsets = array('I', [0])
+    for b in blobs:
+        offsets.append(offsets[-1] + len(b))
+
+    def section(bits, code):
+        tbl = tables[bits]
+        keys = sorted(tbl)
+        prefixes = array(code, keys)
+        vidx = array('I', [tbl[k] for k in keys])
+        if sys.byteorder != 'little':
+            prefixes.byteswap()
+            vidx.byteswap()
+        return prefixes.tobytes() + vidx.tobytes()
+
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    sec36 = section(36, 'Q')
+    body = [section(24, 'I'), section(28, 'I'), sec36, b'\0' * (-len(sec36) % 8), offsets.tobytes()] + blobs
+
+    tmp = f"{fn}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(tables[24]), len(tables[28]), len(tables[36]), len(vendors)))
+        for b in body:
+            f.write(b)
+    os.replace(tmp, fn)
+    return sum(len(t) for t in tables.values())
+
+
+def prefix_str(bits, prefix):
+    '''
+    プレフィックスの文字列表現 (24bit: '00:0B:86', 28bit: '70:B3:D5:0', 36bit: '70:B3:D5:01:2')
+    '''
+    h = f"{prefix:0{bits // 4}X}"
+    return ':'.join(h[i:i + 2] for i in range(0, len(h), 2))
+
+
+_OUI_TXT_PAT = re.compile(r"([0-9A-F]{6}|[0-9A-F]{7}|[0-9A-F]{9})\s+\(base 16\)\s*(.*)")
+
+
+def parse_oui_txt(lines):
+    '''
+    IEEE の oui.txt 形式 ("000B86     (base 16)    Aruba ...") をパースする
+    :param lines: 行のイテレータ
+    :return: (プレフィックス長, プレフィックス, ベンダー名) のジェネレータ
+    '''
+    for line in lines:
+        m = _OUI_TXT_PAT.match(line)
+        if m and m.group(2).strip():
+            h = m.group(1)
+            yield len(h) * 4, int(h, 16), m.group(2).strip()
+
+
+def parse_registry_csv(lines):
+    '''
+    IEEE のレジストリ CSV (oui.csv, mam.csv, oui36.csv, iab.csv) をパースする.
+    列: Registry, Assignment, Organization Name, Organization Address.
+    プレフィックス長は Assignment の桁数 (6/7/9 桁 -> 24/28/36bit) で決める
+    :param lines: 行のイテレータ
+    :return: (プレフィックス長, プレフィックス, ベンダー名) のジェネレータ
+    :raise ValueError: 必要な列がない場合
+    '''
+    rd = csv.reader(lines)
+    header = [c.strip() for c in next(rd, [])]
+    try:
+        ia = header.index('Assignment')
+        io = header.index('Organization Name')
+    except ValueError:
+        raise ValueError(f"Not an IEEE registry CSV: {header}")
+    for row in rd:
+        if len(row) <= max(ia, io):
+            continue
+        h = row[ia].strip()
+        vendor = row[io].strip()
+        if len(h) * 4 not in PREFIX_BITS or not vendor:
+            continue
+        try:
+            yield len(h) * 4, int(h, 16), vendor
+        except ValueError:
+            log.debug(f"Invalid assignment: {h}")
+
+
+def read_registry(fn):
+    '''
+    IEEE のレジストリファイルを読み込む. CSV (先頭行が "Registry,...") か oui.txt 形式かは内容で判定する
+    :param fn: ファイル名
+    :return: (プレフィックス長, プレフィックス, ベンダー名) のリスト
+    '''
+    with open(fn, encoding='utf-8-sig', errors='replace', newline='') as f:
+        first = f.readline()
+        f.seek(0)
+        if first.startswith('Registry,'):
+            return list(parse_registry_csv(f))
+        return list(parse_oui_txt(f))
+
+
+def update_db(fn, entries, replace=False, dry_run=False):
+    '''
+    oui.bin をレジストリのエントリで更新する.
+    既存のエントリはそのまま残し (replace=True の場合は削除)、同じプレフィックスはベンダー名を置き換える
+    :param fn: oui.bin のファイル名 (存在しない場合は新規作成)
+    :param entries: (プレフィックス長, プレフィックス, ベンダー名) のイテレータ
+    :param replace: 既存のエントリを使わず、entries のみで作成する
+    :param dry_run: ファイルを更新しない
+    :return: 変更内容 {'added': [(bits, prefix, vendor)], 'changed': [(bits, prefix, 旧ベンダー名, 新ベンダー名)],
+                       'removed': [(bits, prefix, vendor)], 'total': 更新後のエントリ数}
+    '''
+    old = {}
+    if os.path.exists(fn):
+        db = OUIDB(fn)
+        old = {(bits, prefix): vendor for bits, prefix, vendor in db.items()}
+        db.close()
+
+    new = {} if replace else dict(old)
+    for bits, prefix, vendor in entries:
+        new[(bits, prefix)] = vendor
+
+    report = {'added': [], 'changed': [], 'removed': [], 'total': len(new)}
+    for key in sorted(new):
+        if key not in old:
+            report['added'].append(key + (new[key],))
+        elif old[key] != new[key]:
+            report['changed'].append(key + (old[key], new[key]))
+    for key in sorted(old.keys() - new.keys()):
+        report['removed'].append(key + (old[key],))
+
+    if not dry_run and (report['added'] or report['changed'] or report['removed'] or not old):
+        write_db(fn, ((bits, prefix, vendor) for (bits, prefix), vendor in new.items()))
+    return report
+
+
+class OUIDB:
+    """
+    oui.bin (mmap) による OUI 検索
+    """
+
+    def __init__(self, fn=DEFAULT_DB):
+        '''
+        :param fn: oui.bin のファイル名
+        :raise OSError: ファイルが開けない場合
+        :raise ValueError: oui.bin の形式でない場合
+        '''
+        self.fn = fn
+        with open(fn, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm.size() < _HEADER.size:
+            raise ValueError(f"{fn}: not an OUI database")
+        magic, n24, n28, n36, nven = _HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{fn}: not an OUI database")
+
+        self.counts = {24: n24, 28: n28, 36: n36}
+        self.nvendors = nven
+        self.prefixes = {}      # プレフィックス長 -> プレフィックスの配列 (ソート済み)
+        self.vidx = {}          # プレフィックス長 -> ベンダー名の番号の配列
+        pos = _HEADER.size
+        for bits, code, size in ((24, 'I', 4), (28, 'I', 4), (36, 'Q', 8)):
+            n = self.counts[bits]
+            self.prefixes[bits] = self._array(pos, n, code)
+            pos += n * size
+            self.vidx[bits] = self._array(pos, n, 'I')
+            pos += n * 4
+        pos += -pos % 8
+        self.offsets = self._array(pos, nven + 1, 'I')
+        self.blob_pos = pos + (nven + 1) * 4
+        self._names = {}        # ベンダー名の番号 -> 文字列 (デコード済み)
+        self._sub_ouis = None   # sub_ouis()
+
+    def _array(self, pos, n, code):
+        '''
+        mmap 上の配列. リトルエンディアンの環境ではコピーせずに memoryview で参照する
+        '''
+        mv = memoryview(self.mm)[pos:pos + n * struct.calcsize(code)]
+        if sys.byteorder == 'little':
+            return mv.cast(code)
+        a = array(code, mv)
+        a.byteswap()
+        return a
+
+    def vendor(self, i):
+        '''
+        ベンダー名の番号から文字列を得る
+        '''
+        name = self._names.get(i)
+        if name is None:
+            o = self.offsets
+            name = self.mm[self.blob_pos + o[i]:self.blob_pos + o[i + 1]].decode('utf-8')
+            self._names[i] = name
+        return name
+
+    def _find(self, bits, prefix, lo=0):
+        '''
+        :return: (ベンダー名の番号 または None, 次の検索の開始位置)
+        '''
+        pref = self.prefixes[bits]
+        i = bisect_left(pref, prefix, lo)
+        if i < len(pref) and pref[i] == prefix:
+            return self.vidx[bits][i], i
+        return None, i
+
+    def lookup_int(self, n, default=None):
+        '''
+        48bit 整数の MAC アドレスのベンダー名を返す
+        '''
+        for bits in PREFIX_BITS:
+            if self.counts[bits]:
+                v, _ = self._find(bits, n >> (48 - bits))
+                if v is not None:
+                    return self.vendor(v)
+        return default
+
+    def lookup(self, mac, default=None):
+        '''
+        MAC アドレスのベンダー名を返す
+        :param mac: MAC アドレス文字列 (OUI のみでも可) または 48bit 整数
+        :param default: 見つからない場合の戻り値
+        '''
+        n = mac if isinstance(mac, int) else mac2int(mac)
+        if n is None:
+            return default
+        return self.lookup_int(n, default)
+
+    def lookup_many(self, macs, default=None):
+        '''
+        MAC アドレスの配列のベンダー名を一括で検索する.
+        先頭の OUI 部分 ('aa:bb:cc') の重複を除き、ソートした OUI を 1 回の走査で検索する.
+        28/36bit のエントリがある OUI の MAC と、その他の形式の MAC は個別に検索する
+        :param macs: MAC アドレス文字列 または 48bit 整数 のイテレータ
+        :param default: 見つからない場合の値
+        :return: ベンダー名のリスト (macs と同じ順序)
+        '''
+        macs = macs if isinstance(macs, list) else list(macs)
+        try:
+            heads = {m[:8] for m in macs}
+        except TypeError:       # 整数の MAC を含む
+            return self._lookup_many_int(macs, default)
+
+        head2oui = {}
+        for h in heads:
+            if len(h) == 8 and h[2] == ':' and h[5] == ':':
+                n = mac2int(h)
+                if n is not None:
+                    head2oui[h] = n >> 24
+        ouis = sorted(set(head2oui.values()))
+        oui2name = {oui: self.vendor(v) for oui, v in zip(ouis, self._search(24, ouis)) if v is not None}
+        sub = self.sub_ouis()
+        head2name = {h: oui2name.get(oui, default) for h, oui in head2oui.items() if oui not in sub}
+
+        names = [head2name.get(m[:8], _UNRESOLVED) for m in macs]
+        if len(head2name) < len(heads):
+            for i, name in enumerate(names):
+                if name is _UNRESOLVED:
+                    names[i] = self.lookup(macs[i], default)
+        return names
+
+    def _lookup_many_int(self, macs, default=None):
+        '''
+        lookup_many() の整数の MAC アドレス用
+        '''
+        if not all(isinstance(m, int) for m in macs):
+            names = {m: self.lookup(m, default) for m in set(macs)}
+            return [names[m] for m in macs]
+        ouis = sorted({n >> 24 for n in set(macs)})
+        oui2name = {oui: self.vendor(v) for oui, v in zip(ouis, self._search(24, ouis)) if v is not None}
+        sub = self.sub_ouis()
+        return [self.lookup_int(n, default) if n >> 24 in sub else oui2name.get(n >> 24, default) for n in macs]
+
+    def sub_ouis(self):
+        '''
+        28/36bit のエントリ (MA-M, MA-S) を含む OUI の集合
+        '''
+        if self._sub_ouis is None:
+            self._sub_ouis = {p >> 4 for p in self.prefixes[28]} | {p >> 12 for p in self.prefixes[36]}
+        return self._sub_ouis
+
+    def _search(self, bits, keys):
+        '''
+        ソート済みのプレフィックスの配列を一括で検索する
+        :return: ベンダー名の番号 (見つからない場合は None) のリスト
+        '''
+        # numpy の import (約 0.1 秒) は、import 済みの場合か検索数が多い場合のみ
+        if ('numpy' in sys.modules or len(keys) > NP_MIN_KEYS) and _numpy():
+            return self._search_np(bits, keys)
+        vids = []
+        lo = 0
+        for k in keys:      # keys はソート済みなので、前回の位置から検索する
+            v, lo = self._find(bits, k, lo)
+            vids.append(v)
+        return vids
+
+    def _search_np(self, bits, keys):
+        '''
+        numpy.searchsorted による一括検索
+        :return: ベンダー名の番号 (見つからない場合は None) のリスト
+        '''
+        np = _numpy()
+        pref = np.asarray(self.prefixes[bits])
+        k = np.asarray(keys, dtype=pref.dtype)
+        i = np.searchsorted(pref, k)
+        i[i == len(pref)] = 0
+        hit = pref[i] == k
+        vidx = np.asarray(self.vidx[bits])[i]
+        return [int(v) if h else None for v, h in zip(vidx.tolist(), hit.tolist())]
+
+    def items(self):
+        '''
+        全エントリ (プレフィックス長, プレフィックス, ベンダー名) を返すイテレータ
+        '''
+        for bits in sorted(self.counts):
+            for prefix, v in zip(self.prefixes[bits], self.vidx[bits]):
+                yield bits, prefix, self.vendor(v)
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def close(self):
+        # memoryview を解放してから mmap を閉じる
+        self.prefixes = self.vidx = self.offsets = None
+        self.mm.close()
+
+
+_db = None      # lookup() で最初に開いた OUIDB
+_db_error = None    # 開けなかったファイル名 (エラーを繰り返し表示しないため)
+
+
+def get_db(fn=None):
+    '''
+    OUIDB を返す. 最初の呼び出しでファイルを開く
+    :param fn: ファイル名 (省略時は環境変数 AOS_OUI_DB または DEFAULT_DB)
+    :return: OUIDB. ファイルがない場合は None
+    '''
+    global _db, _db_error
+    if _db is None or (fn is not None and fn != _db.fn):
+        fn = fn or os.environ.get("AOS_OUI_DB") or DEFAULT_DB
+        if fn == _db_error:
+            return None
+        try:
+            _db = OUIDB(fn)
+        except (OSError, ValueError) as e:
+            log.err(f"Can't open OUI database: {e}")
+            _db_error = fn
+            return None
+    return _db
+
+
+def lookup(mac, default=None):
+    '''
+    MAC アドレスのベンダー名を返す (OUIDB.lookup)
+    '''
+    db = get_db()
+    if db is None:
+        return default
+    return db.lookup(mac, default)
+
+
+def lookup_many(macs, default=None):
+    '''
+    MAC アドレスの配列のベンダー名を一括で検索する (OUIDB.lookup_many)
+    '''
+    db = get_db()
+    if db is None:
+        return [default for _ in macs]
+    return db.lookup_many(macs, default)
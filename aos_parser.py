@@ -2,14 +2,45 @@
 #   Parse show commands and store the contents to 2-dimension lists
 #   - ヘッダの幅は、次の行のセパレータ '----' で判定
 #   - 複数回のコマンド出力が含まれている場合、別個に配列に保存
+#   - ファイル入力では事前に show プロンプト行のインデックスを作成し、対象コマンドの出力のみ読み込む
+#   - .gz / .zip / .tar(.gz) の入力は展開せずにストリームで読み込む (アーカイブ内の各ファイルを 1 ファイルとして扱う)
+#   - typed=True では COLUMN_SCHEMAS の列 (TAge, Bytes, curr-snr など) をパース時に数値に変換する
+#   - follow() で追記され続けるログファイルを tail -f のように読み、完了したテーブルを callback に渡す
+#   - profile=True (または set_profile(True)) でファイル・コマンド・フェーズごとの統計を self.stats に記録する
+#   - index(cmd, col, ...) でキー列のハッシュインデックスを作成し、キーによる検索・group-by を O(1) で行う
+#   - export() でテーブルを Parquet / Feather に型付きで書き出す (aos_export.py, pyarrow が必要)
 #   - コンストラクタオプション
 #       merge: 複数のコマンド出力をマージするかどうか (default: False)
 #       activeonly: ステータスが Up の AP 情報のみを含めるかどうか (default: True)
 #
 
 import re
-import fileinput
+import os
+import sys
+import mmap
+import time
+import pickle
+import atexit
+import gzip
+import tarfile
+import zipfile
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import Sequence
 import mylogger as log
+from aos_cache import get_cache, MemoryCache
+from aos_table import ColumnTable
+from aos_index import TableIndex, dedup_table
+from aos_stats import ParseStats
+
+try:
+    from chardet.universaldetector import UniversalDetector
+except ImportError:
+    UniversalDetector = None
+
+PARSER_VERSION = 1      # パース結果が変わる修正をした場合はインクリメント (キャッシュの無効化)
+
+FALLBACK_ENCODINGS = ('cp932', 'mac-roman')     # chardet で判定できない場合に順に試すエンコーディング
 
 AP_DATABASE_TABLE = "show ap database"
 AP_DATABASE_LONG_TABLE = "show ap database long"
@@ -23,6 +54,26 @@ DATAPATH_SESSION_INT = "show datapath session internal"
 DATAPATH_USER = "show datapath user table"
 DATAPATH_BRIDGE = "show datapath bridge table"
 DATAPATH_TUNNEL = "show datapath tunnel verbose"
+AP_MONITOR_AP_LIST = "show ap monitor ap-list"
+
+# 空行・MAC アドレスで始まる行をスキップし、数字で始まらない行で表が終わるコマンド
+DATAPATH_TABLES = (DATAPATH_SESSION_TABLE, DATAPATH_SESSION_DPI, DATAPATH_SESSION_INT, DATAPATH_USER, DATAPATH_TUNNEL)
+
+#
+#   型付き列のスキーマ (typed=True の場合に適用). コマンド -> {列名: 型}
+#       'int': 10進整数, 'hex': 16進整数, 'float': 実数
+#       'radio': "Radio N Band Ch/EIRP/MaxEIRP/Clients" 列を Band, Ch, EIRP, MaxEIRP, Clients の 5 列に分割
+#   数値に変換できない値 (空欄など) は None
+#
+_DP_SESSION_SCHEMA = {'TAge': 'hex', 'Packets': 'int', 'Bytes': 'int'}
+COLUMN_SCHEMAS = {
+    DATAPATH_SESSION_TABLE: _DP_SESSION_SCHEMA,
+    DATAPATH_SESSION_DPI: _DP_SESSION_SCHEMA,
+    DATAPATH_SESSION_INT: _DP_SESSION_SCHEMA,
+    AP_ACTIVE_TABLE: {f"Radio {n} Band Ch/EIRP/MaxEIRP/Clients": 'radio' for n in range(3)},
+    AP_MONITOR_AP_LIST: {'curr-snr': 'int', 'curr-rssi': 'int'},
+}
+RADIO_FIELDS = ('Band', 'Ch', 'EIRP', 'MaxEIRP', 'Clients')
 
 
 class Fore:
@@ -50,6 +101,11 @@ def _split_cols_by_utf8_bytes(text, idx):
     Split fixed-width columns by UTF-8 byte offsets.
     idx contains each column's start position in bytes.
     """
+    if text.isascii():      # byte offset == char offset. no need to encode/decode
+        row = [text[idx[i]:idx[i + 1]].rstrip() for i in range(len(idx) - 1)]
+        row.append(text[idx[-1]:].rstrip())
+        return row
+
     b = text.encode('utf-8')
     row = []
     for i, start in enumerate(idx):
@@ -58,6 +114,302 @@ def _split_cols_by_utf8_bytes(text, idx):
         row.append(col)
     return row
 
+def _normalize_appid(app):
+    '''
+    show datapath session dpi の AppID 列 ("office365 [123]" など) をアプリ名のみにする
+    '''
+    if app.startswith(" "):
+        return "unknown"
+    return app.split(" ")[0]
+
+
+def _to_int(v):
+    try:
+        return int(v)
+    except ValueError:
+        return None
+
+def _to_hex(v):
+    try:
+        return int(v, 16)
+    except ValueError:
+        return None
+
+def _to_float(v):
+    try:
+        return float(v)
+    except ValueError:
+        return None
+
+_RADIO_PAT = re.compile(r"(.*):([^:/]*)/([\d.]+)/([\d.]+)/(\d+)$")
+_MAC_PREFIX_B = re.compile(rb"[0-9A-Fa-f][0-9A-Fa-f]:")     # MAC アドレスで始まる行 (bytes)
+
+def _split_radio(v):
+    '''
+    "AP:5GHz-HE:36E/18.0/23.0/5" -> ['AP:5GHz-HE', '36E', 18.0, 23.0, 5]
+    '''
+    m = _RADIO_PAT.match(v)
+    if not m:
+        return [v, '', None, None, None]
+    return [m.group(1), m.group(2), float(m.group(3)), float(m.group(4)), int(m.group(5))]
+
+_CONVERTERS = {'int': _to_int, 'hex': _to_hex, 'float': _to_float}
+
+def column_schema(cmd):
+    '''
+    コマンドの列スキーマを得る. cmd が正規表現 ("show ap monitor ap-list.*" など) の場合は
+    マッチするコマンドのスキーマ
+    :return: {列名: 型} または None
+    '''
+    if cmd in COLUMN_SCHEMAS:
+        return COLUMN_SCHEMAS[cmd]
+    for name, schema in COLUMN_SCHEMAS.items():
+        if re.fullmatch(cmd, name):
+            return schema
+    return None
+
+
+class _RowConverter:
+    """
+    スキーマに従って行の値を変換する (typed=True)
+    """
+
+    def __init__(self, header, schema):
+        '''
+        :param header: 元のヘッダ行
+        :param schema: {列名: 型}
+        '''
+        self.header = []        # 変換後のヘッダ行
+        self.types = []         # 変換後の各列の型 ('int', 'float', None)
+        self.convs = []         # 元の各列の変換関数
+        for name in header:
+            t = schema.get(name)
+            if t == 'radio':
+                prefix = name.split(' Band ')[0]
+                self.header += [f"{prefix} {f}" for f in RADIO_FIELDS]
+                self.types += [None, None, 'float', 'float', 'int']
+                self.convs.append(_split_radio)
+            elif t is not None:
+                self.header.append(name)
+                self.types.append('float' if t == 'float' else 'int')
+                self.convs.append(_CONVERTERS[t])
+            else:
+                self.header.append(name)
+                self.types.append(None)
+                self.convs.append(None)
+
+    def convert(self, row):
+        out = []
+        for v, f in zip(row, self.convs):
+            if f is None:
+                out.append(v)
+            elif f is _split_radio:
+                out.extend(f(v))
+            else:
+                out.append(f(v))
+        return out
+
+
+class _RowLayout:
+    """
+    コンテンツセクション内の行で共有する列レイアウト
+    """
+    __slots__ = ('idx', 'tail', 'transforms')
+
+    def __init__(self, idx, tail=(), transforms=None):
+        self.idx = tuple(idx)               # 各列の開始位置 (bytes)
+        self.tail = tuple(tail)             # 行末に追加する列 (filename)
+        self.transforms = transforms or {}  # 列番号 -> デコード後に適用する関数
+
+
+class LazyRow(Sequence):
+    """
+    mmap 上の 1 行を参照する行オブジェクト (bytes モード)
+    列はアクセスされた時に初めてデコードする。list と同様にインデックス・スライスでアクセス可能
+    """
+    __slots__ = ('buf', 'start', 'end', 'layout', 'over')
+
+    def __init__(self, buf, start, end, layout):
+        self.buf = buf
+        self.start = start
+        self.end = end
+        self.layout = layout
+        self.over = None        # __setitem__ で書き換えられた列
+
+    def _col(self, i):
+        if self.over is not None and i in self.over:
+            return self.over[i]
+        lay = self.layout
+        n = len(lay.idx)
+        if i >= n:
+            return lay.tail[i - n]
+        end = self.end
+        a = min(self.start + lay.idx[i], end)
+        b = min(self.start + lay.idx[i + 1], end) if i + 1 < n else end
+        col = self.buf[a:b].decode('utf-8', errors='ignore').rstrip()
+        f = lay.transforms.get(i)
+        return f(col) if f else col
+
+    def __len__(self):
+        return len(self.layout.idx) + len(self.layout.tail)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._col(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("row index out of range")
+        return self._col(i)
+
+    def __setitem__(self, i, val):
+        if i < 0:
+            i += len(self)
+        if self.over is None:
+            self.over = {}
+        self.over[i] = val
+
+    def __iter__(self):
+        return (self._col(i) for i in range(len(self)))
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, LazyRow)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __reduce__(self):
+        return (list, (list(self),))     # pickle (キャッシュ・プロセス間転送) では list として扱う
+
+
+def detect_encoding(data):
+    '''
+    バイト列のエンコーディングを判定する (utfconv.py と同様に chardet を使用)
+    :param data: 判定に使用するサンプル
+    :return: エンコーディング名
+    '''
+    data = data[:data.rfind(b'\n') + 1] or data    # マルチバイト文字の途中で切れないよう行単位にする
+    if UniversalDetector is not None:
+        detector = UniversalDetector()
+        detector.feed(data)
+        detector.close()
+        enc = detector.result['encoding']
+        if enc and detector.result['confidence'] >= 0.5:
+            try:
+                data.decode(enc)
+                return enc
+            except (UnicodeDecodeError, LookupError):
+                pass
+
+    for enc in FALLBACK_ENCODINGS:
+        try:
+            data.decode(enc)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return FALLBACK_ENCODINGS[-1]
+
+
+class ArchiveMember(str):
+    """
+    zip アーカイブ内のファイル. 文字列としては "アーカイブ名:メンバー名" (filename 列に格納される)
+    """
+
+    def __new__(cls, archive, member):
+        self = super().__new__(cls, f"{archive}:{member}")
+        self.archive = archive
+        self.member = member
+        return self
+
+    def __reduce__(self):
+        return (ArchiveMember, (self.archive, self.member))
+
+
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def source_kind(fn):
+    '''
+    入力ファイルの種類を判定する
+    :return: 'stdin', 'file', 'gzip', 'zip', 'tar', 'member' のいずれか
+    '''
+    if fn == '-':
+        return 'stdin'
+    if isinstance(fn, ArchiveMember):
+        return 'member'
+    if fn.lower().endswith(TAR_SUFFIXES):
+        return 'tar'
+    with open(fn, 'rb') as f:
+        magic = f.read(4)
+    if magic[:2] == b'\x1f\x8b':
+        return 'gzip'
+    if magic == b'PK\x03\x04':
+        return 'zip'
+    return 'file'
+
+
+def expand_archives(files):
+    '''
+    ファイル名のリストのうち、zip アーカイブをメンバー (ArchiveMember) のリストに展開する。
+    tar アーカイブはストリームでしか効率よく読めないため、展開せずにそのまま返す
+    '''
+    ret = []
+    for fn in files:
+        if fn != '-' and source_kind(fn) == 'zip':
+            with zipfile.ZipFile(fn) as z:
+                ret.extend(ArchiveMember(fn, name) for name in z.namelist() if not name.endswith('/'))
+        else:
+            ret.append(fn)
+    return ret
+
+
+def _gunzip_member(stream, name):
+    '''
+    アーカイブ内の .gz ファイルは展開しながら読む
+    '''
+    if name.lower().endswith('.gz'):
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def _index_show_lines(fn, cmd_pat, encoding='utf-8'):
+    """
+    ファイル全体を 1 パスで走査し、cmd_pat にマッチするプロンプト行 (show ...) の
+    (バイトオフセット, 直前までの行数) のリストを返す。
+    "show " の検索は mmap 上で行い、マッチ判定はその行に対してのみ行う。
+    """
+    hits = []
+    with open(fn, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:      # empty file
+            return hits
+
+    with mm:
+        size = len(mm)
+        pos = lno = last = 0
+        while True:
+            pos = mm.find(b'show ', pos)
+            if pos < 0:
+                break
+            start = mm.rfind(b'\n', 0, pos) + 1
+            end = mm.find(b'\n', pos)
+            if end < 0:
+                end = size
+            line = mm[start:end].decode(encoding, errors='replace').rstrip()
+            if cmd_pat.search(line):
+                lno += mm[last:start].count(b'\n')
+                last = start
+                hits.append((start, lno))
+            pos = end
+
+    return hits
+
 def _get_cols_gen(tbl, *cols):
     try:
         idx = [tbl[0].index(col) for col in cols]
@@ -65,6 +417,10 @@ def _get_cols_gen(tbl, *cols):
         log.err(f"Column not found: {e}")
         return
 
+    if isinstance(tbl, ColumnTable):    # 列指向テーブルは必要な列のみ参照
+        yield from tbl.iter_cols(*idx)
+        return
+
     if len(cols) == 1:  # 1列のみ指定された場合は文字列を返す
         for row in tbl[1:]:
             yield row[idx[0]]
@@ -73,9 +429,19 @@ def _get_cols_gen(tbl, *cols):
             yield [row[i] for i in idx] # 複数列が指定された場合はリストを返す
 
 
+def _cell_str(v):
+    '''
+    出力用にセルの値を文字列にする (typed=True の数値, None を含む場合)
+    '''
+    if isinstance(v, str):
+        return v
+    return '' if v is None else str(v)
+
+
 def table2str(table):
     if len(table) < 2:
         return ""
+    table = [[_cell_str(v) for v in row] for row in table]
 
     max_col_widths = [0] * len(table[0])
     for row in table:
@@ -94,7 +460,7 @@ def table2csv(table):
     if len(table) < 2:
         return ""
 
-    s = [",".join(row) for row in table]
+    s = [",".join(map(_cell_str, row)) for row in table]
     return "\n".join(s) + "\n"
 
 
@@ -125,6 +491,7 @@ def write_table_csv(table, fn):
 def cols2str(table, *col_names):
     if len(col_names) == 0 or col_names[0] == '*':
         return table2str(table)
+    table = [[_cell_str(v) for v in row] for row in table]
 
     max_col_widths = [0] * len(table[0])
     for row in table:
@@ -149,6 +516,35 @@ def cols2str(table, *col_names):
     return "\n".join(s) + "\n"
 
 
+def _parse_file_worker(fn, cmds, opts):
+    '''
+    ワーカープロセスで 1 つのファイルをパースする
+    :return: パース結果 (コマンド -> テーブルの配列), エンコーディング, 統計
+    '''
+    aos = AOSParser([fn], cmds, **opts)
+    return aos.tables, aos.encodings, aos.stats
+
+
+_profile = False        # set_profile() で設定. profile 引数を省略した AOSParser の既定値
+_profiled = []          # 終了時に統計を表示するパーサ
+
+
+def _print_profiles():
+    for aos in _profiled:
+        print(aos.stats.report(), file=sys.stderr)
+
+
+def set_profile(enable=True):
+    '''
+    以降に作成する AOSParser の統計を有効にし、終了時に標準エラー出力に表示する (スクリプトの --profile)
+    :param enable: 有効にする場合 True
+    '''
+    global _profile
+    if enable and not _profile:
+        atexit.register(_print_profiles)
+    _profile = enable
+
+
 class AOSParser:
     """
     show コマンドパーサ
@@ -156,7 +552,7 @@ class AOSParser:
 
     def file_line(self):
         if self.fromfile:
-            return(f"{fileinput.filename()}:{fileinput.filelineno()}: ")
+            return(f"{self.cur_file}:{self.lno}: ")
         else:
             return(f"{self.lno}: ")
 
@@ -166,7 +562,7 @@ class AOSParser:
     def end_of_cmd(self):
         '''
         1つのコマンドをパース完了した場合に呼ばれる。
-        cur_table を辞書の配列 tables に追加するか、merge=True の場合はマージする
+        cur_table を現在のファイルのテーブルの配列 file_tables に追加する
         :return:
         '''
 
@@ -176,26 +572,53 @@ class AOSParser:
             #log.info(f"No entries found for '{self.cur_cmd}'.")
             return
         log.debug(f"{len(self.cur_table)-1} entries found in '{self.cur_cmd}'.")
+        if self.columnar:
+            self.cur_table.compact()
+        self.file_tables[self.cur_cmd].append(self.cur_table)
+
+    def add_table(self, cmd, table):
+        '''
+        パース結果のテーブルを辞書の配列 tables に追加するか、merge=True の場合はマージする
+        :param cmd: コマンド
+        :param table: テーブル (2次元配列)
+        :return:
+        '''
+        if self.callback is not None:
+            self.callback(cmd, table)
 
         if not self.isMerge:
-            self.tables[self.cur_cmd].append(self.cur_table)    # 表の配列に追加
+            self.tables[cmd].append(table)    # 表の配列に追加
             return
 
-        if len(self.tables[self.cur_cmd]) == 0:
-            self.tables[self.cur_cmd].append(self.cur_table)
+        if len(self.tables[cmd]) == 0:
+            self.tables[cmd].append(table)
             return
 
-        log.debug(f"Merging table '{self.cur_cmd}'...")
-        tbl = self.tables[self.cur_cmd][0]     # マージ先2次元配列
-        if len(tbl[0]) != len(self.cur_table[0]):
-            log.err(f"Can't merge the output for '{self.cur_cmd}'. Num of columns does not match: {len(self.cur_table[0])} vs {len(tbl[0])}.")
+        log.debug(f"Merging table '{cmd}'...")
+        self.drop_index(cmd)
+        tbl = self.tables[cmd][0]     # マージ先2次元配列
+        if len(tbl[0]) != len(table[0]):
+            log.err(f"Can't merge the output for '{cmd}'. Num of columns does not match: {len(table[0])} vs {len(tbl[0])}.")
             return
 
-        tbl.extend(self.cur_table[1:])
+        tbl.extend(table[1:])
+        if self.columnar:
+            tbl.compact()
         log.debug(f"Merge success. Total entries: {len(tbl)-1}")
         return
 
-    def __init__(self, files, cmds=(AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE), activeonly=True, merge=False, encoding='utf-8'):
+    def add_file_tables(self):
+        '''
+        1 ファイル分のパース結果 file_tables を tables に追加する
+        '''
+        t0 = time.perf_counter()
+        for cmd, tbls in self.file_tables.items():
+            for tbl in tbls:
+                self.add_table(cmd, tbl)
+        if self.stats:
+            self.stats.phases['merge'] += time.perf_counter() - t0
+
+    def __init__(self, files, cmds=(AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE), activeonly=True, merge=False, encoding='auto', cache=None, lazy=False, columnar=False, workers=1, typed=False, callback=None, profile=None):
         """
         tech-support または show コマンドログファイルをパースし、以下の table の内容を
         2 次元配列に格納
@@ -205,167 +628,727 @@ class AOSParser:
         :param cmds: パース対象コマンド
         :param activeonly: show ap database では、ステータスが Up のもののみ格納
         :param merge: コマンドが複数回出現する場合、結合する
+        :param encoding: 入力ファイルのエンコーディング. 'auto' の場合、UTF-8 としてデコードできない行が
+                         あった時点でそのファイルのエンコーディングを判定し、以降の行に適用する
+                         (ファイルの読み直しは行わない). 判定結果は self.encodings に格納
+        :param cache: パース結果のディスクキャッシュ. True, ディレクトリ名, ParseCache のいずれか.
+                      None の場合は share_results() で有効にしたプロセス内のキャッシュ、
+                      または環境変数 AOS_PARSER_CACHE が設定されていれば有効
+        :param lazy: bytes モード. ファイルを mmap し、各行は列の位置のみ保持する (LazyRow).
+                     列は get_table() などでアクセスされた時にデコードする (UTF-8 のみ)
+        :param columnar: テーブルを列指向 (ColumnTable) で格納する. 大量の行を持つテーブルのメモリを削減
+        :param workers: 複数ファイルを並列にパースするプロセス数. 0 または None の場合は CPU 数
+        :param typed: COLUMN_SCHEMAS に定義された列をパース時に数値に変換する (TAge, Bytes, curr-snr など).
+                      "Radio N Band Ch/EIRP/MaxEIRP/Clients" 列は 5 列に分割する. lazy とは併用できない
+        :param callback: テーブルのパースが完了するごとに callback(cmd, table) を呼ぶ (マージ前のテーブル)
+        :param profile: パース統計 (ParseStats) を self.stats に記録する. None の場合は set_profile() の設定に従う
         """
 
+        self.setup(cmds, activeonly=activeonly, merge=merge, encoding=encoding, cache=cache, lazy=lazy, columnar=columnar, typed=typed, callback=callback)
+        if profile or (profile is None and _profile):
+            self.stats = ParseStats()
+            if profile is None:
+                _profiled.append(self)
+        files, data = self.get_input(files)
+
+        if not self.fromfile:
+            self.parse_lines(self.data_lines(data))
+            if self.in_cmd:
+                self.end_of_cmd()
+            self.add_file_tables()
+            if self.stats:
+                self.stats.add_tables(self.tables)
+            return
+
+        if workers is None or workers <= 0:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(files))
+        if workers > 1 and '-' not in files:
+            self.parse_files_parallel(files, workers)
+        else:
+            for fn in files:
+                self.parse_file(fn)
+        if self.cache:
+            self.cache.evict()
+        if self.stats:
+            self.stats.add_tables(self.tables)
+
+    def setup(self, cmds, activeonly=True, merge=False, encoding='auto', cache=None, lazy=False, columnar=False, typed=False, callback=None):
+        '''
+        パーサの設定と状態を初期化する (パースは行わない)
+        '''
         self.isMerge = merge
+        self.activeonly = activeonly
+        self.encoding = encoding
+        self.encodings = {}     # ファイル名 -> 使用したエンコーディング
+        self.cache = get_cache(cache)
+        # typed=True では行を変換するため、列を遅延デコードする lazy は無効
+        self.lazy = lazy and not typed and encoding.replace('_', '-').lower() in ('utf-8', 'utf8', 'auto')
+        self.mm = None          # bytes モードでパース中のファイルの mmap
+        self.columnar = columnar
+        self.typed = typed
+        self.conv = None        # typed=True の場合、パース中のテーブルの _RowConverter
+        self.callback = callback
+        self.stats = None       # ParseStats (profile=True)
+        self.follow_state = None    # follow モードの読み込み位置 {'ino': inode, 'pos': offset}
+        self.row_sink = None    # 設定されている場合、行をテーブルに格納せずにこの関数に渡す (iter_rows)
         self.tables = {}        # 各コマンドのパース結果を格納するdict. キー=コマンド名, val=パース結果の配列
+        self.indexes = {}       # (コマンド, キー列) -> TableIndex. index() で作成
         if type(cmds) == str:
             cmds = [cmds]
-        pat = {}
+        self.pat = {}
         for cmd in cmds:
             self.tables[cmd] = []
-            pat[cmd] = re.compile(cmd + r"$")
+            self.pat[cmd] = re.compile(cmd + r"$")
+        # 全コマンドを1つにまとめた正規表現. プロンプト行の判定は 1 回の search で済ませる
+        self.cmd_pat = re.compile("|".join(f"(?:{cmd})$" for cmd in cmds))
 
         self.in_cmd  = False
         self.in_cont = False
+        self.cur_file = None
+        self.prev_line = ''
+        self.lno = 0
+        self.file_tables = {cmd: [] for cmd in self.tables}
 
+    def get_input(self, files):
+        '''
+        files 引数を解釈し、self.fromfile を設定する
+        :return: (ファイル名のリスト, 入力データの行のリスト) のどちらか一方は None
+        '''
         self.fromfile = True
+        if files is None or len(files) == 0:     # follow() のみ使用する場合
+            return [], None
         if type(files) == str:
             if '\n' in files:   # files = ファイル名ではなく、パースする入力データとみなす
-                data = files.splitlines()
                 self.fromfile = False
+                return None, files.splitlines()
             elif '*' in files:
                 import glob
-                files = glob.glob(files)
-        else:   # files is a list
-            if '\n' in files[0]:    # 改行コードが含まれている場合、ファイル名ではなく、行のリストとみなす
-                data = files
-                self.fromfile = False
+                return expand_archives(glob.glob(files)), None
+            return expand_archives([files]), None
 
-        if self.fromfile:
-            data = fileinput.input(files, encoding=encoding)
+        # files is a list
+        if '\n' in files[0]:    # 改行コードが含まれている場合、ファイル名ではなく、行のリストとみなす
+            self.fromfile = False
+            return None, files
+        return expand_archives(files), None
 
+    def cache_opts(self):
+        '''
+        キャッシュのキーに含める、パース結果に影響するオプション
+        '''
+        return (PARSER_VERSION, self.activeonly, self.columnar, self.encoding, self.typed)
+
+    @classmethod
+    def iter_rows(cls, files, cmd, cols=(), activeonly=True, encoding='auto', typed=False):
+        '''
+        コマンドの結果テーブルの行を、パースしながら 1 行ずつ返すジェネレータ。
+        行はテーブルに格納しないため、メモリに載らない大きさのテーブルも処理できる
+        :param files: ファイル名 or ファイル名のリスト or コマンド出力を含む文字列
+        :param cmd: コマンド
+        :param cols: 取得したい列名. 省略時は全列 (ファイル入力の場合は filename 列を含む)
+        :param typed: 列スキーマに従って値を変換する (AOSParser の typed 引数を参照)
+        :return: 行 (list). cols に 1 列のみ指定した場合は値
+        '''
+        self = cls.__new__(cls)
+        self.setup(cmd, activeonly=activeonly, encoding=encoding, cache=False, typed=typed)
+        files, data = self.get_input(files)
+
+        pending = []
+        self.row_sink = pending.append
+        hdr = None
+        idx = None
+
+        def lines():
+            if not self.fromfile:
+                yield from self.data_lines(data)
+                return
+            for fn in files:
+                self.cur_file = fn
+                self.lno = 0
+                yield from self.read_lines(fn)
+                if self.in_cmd:
+                    self.end_of_cmd()
+
+        for line in lines():
+            self.parse_line(line)
+            if not pending:
+                continue
+            if self.cur_table[0] is not hdr:      # 新しいテーブルの最初の行
+                hdr = self.cur_table[0]
+                try:
+                    idx = [hdr.index(col) for col in cols]
+                except ValueError as e:
+                    log.err(f"Column not found: {e}")
+                    return
+            for row in pending:
+                if len(idx) == 0:
+                    yield row
+                elif len(idx) == 1:
+                    yield row[idx[0]]
+                else:
+                    yield [row[i] for i in idx]
+            pending.clear()
+
+    def parse_files_parallel(self, files, workers):
+        '''
+        ファイルごとに別プロセスでパースし、結果をファイルの順にマージする
+        :param files: ファイル名のリスト
+        :param workers: プロセス数
+        '''
+        # プロセス内で共有するキャッシュ (share_results()) はワーカーに渡さず、親プロセスで参照・保存する
+        shared = self.cache if isinstance(self.cache, MemoryCache) else None
+        hits = {}       # ファイル名 -> 共有キャッシュにあった file_tables
+        if shared is not None:
+            for fn in files:
+                if source_kind(fn) not in ('file', 'gzip'):
+                    continue
+                cached = {cmd: shared.get(fn, cmd, self.cache_opts()) for cmd in self.tables}
+                if None not in cached.values():
+                    hits[fn] = cached
+        todo = [fn for fn in files if fn not in hits]
+
+        # lazy=True の行は mmap を参照するためプロセス間で受け渡せない. ワーカーでは通常モードでパースする
+        cache = shared.backing if shared is not None else self.cache
+        opts = dict(activeonly=self.activeonly, merge=False, encoding=self.encoding,
+                    cache=cache or False, columnar=self.columnar, typed=self.typed, profile=bool(self.stats))
+        log.debug(f"Parsing {len(todo)} files with {workers} processes...")
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = ex.map(_parse_file_worker, todo, repeat(list(self.tables)), repeat(opts))
+            for fn in files:
+                self.cur_file = fn
+                if fn in hits:
+                    log.debug(f"{fn}: loaded from cache.")
+                    self.file_tables = hits[fn]
+                    self.add_file_tables()
+                    continue
+                tables, encodings, stats = next(results)
+                if shared is not None and source_kind(fn) in ('file', 'gzip'):
+                    for cmd, tbls in tables.items():
+                        shared.put(fn, cmd, tbls, self.cache_opts())
+                self.encodings.update(encodings)
+                self.file_tables = tables
+                self.add_file_tables()
+                if stats:
+                    self.stats.merge(stats)
+
+    def parse_file(self, fn):
+        '''
+        1 つのファイルをパースする。
+        事前にインデックスを作成し、パース対象コマンドの出力部分のみを読み込む
+        :param fn: ファイル名 ('-' の場合は標準入力)
+        '''
+        t0 = time.perf_counter()
+        self.cur_file = fn
         self.lno = 0
-        try:
-            for line in data:
-                line = line.rstrip()
-                self.lno += 1
+        self.file_tables = {cmd: [] for cmd in self.tables}
+
+        # 通常ファイルと .gz ファイルのみキャッシュする (アーカイブは filename 列にメンバー名を含むため)
+        use_cache = self.cache is not None and source_kind(fn) in ('file', 'gzip')
+        if use_cache:
+            cached = {cmd: self.cache.load(fn, cmd, self.cache_opts()) for cmd in self.tables}
+            if None not in cached.values():
+                log.debug(f"{fn}: loaded from cache.")
+                self.file_tables = cached
+                self.add_file_tables()
+                if self.stats:
+                    self.stats.add_file(fn, 0, time.perf_counter() - t0, cached=True)
+                return
+
+        n = self.parse_lines(self.read_lines(fn))
+
+        # EOF
+        if self.in_cmd:
+            self.end_of_cmd()
+
+        if use_cache:
+            for cmd, tbls in self.file_tables.items():
+                self.cache.store(fn, cmd, tbls, self.cache_opts())
+        self.add_file_tables()
+        if self.stats:
+            self.stats.add_file(fn, n, time.perf_counter() - t0)
+
+    def parse_lines(self, lines):
+        '''
+        行のイテレータをパースする. profile=True の場合は読み込みとパースの時間を計測する
+        :return: パースした行数 (profile=True の場合のみ)
+        '''
+        if self.stats is not None:
+            return self.stats.run(self, lines)
+        for line in lines:
+            self.parse_line(line)
 
+    def file_encoding(self, fn):
+        '''
+        ファイルの読み込みに使用する (最初の) エンコーディング
+        '''
+        enc = 'utf-8' if self.encoding == 'auto' else self.encoding
+        self.encodings[fn] = enc
+        return enc
+
+    def redecode(self, fn, raw, exc, offset=None):
+        '''
+        デコードできない行があった場合に呼ばれる. encoding='auto' の場合はエンコーディングを判定し直す
+        :param fn: ファイル名
+        :param raw: デコードできなかった行
+        :param exc: デコード時の UnicodeDecodeError
+        :param offset: 行のファイル上の位置 (判定用のサンプルの読み込みに使用). ストリームの場合は None
+        :return: デコードした行
+        :raise UnicodeDecodeError: エンコーディングを指定している場合 (exc)
+        '''
+        if self.encoding != 'auto':
+            raise exc
+        sample = raw
+        if offset is not None:
+            with open(fn, 'rb') as f:
+                f.seek(offset)
+                sample = f.read(256 * 1024)
+        enc = detect_encoding(sample)
+        log.info(f"{fn}:{self.lno}: not UTF-8. Encoding detected as {enc}.")
+        self.encodings[fn] = enc
+        self.mm = None      # 以降の行は LazyRow (UTF-8 のみ) を使わない
+        return raw.decode(enc, errors='replace')
+
+    def data_lines(self, data):
+        '''
+        文字列入力の行のうち、パースが必要な行を返すジェネレータ
+        '''
+        self.lno = 0
+        for line in data:
+            self.lno += 1
+            if not self.in_cmd and "show " not in line:
+                continue            # optimize parse speed a bit
+            yield line.rstrip()
+
+    def read_lines(self, fn):
+        '''
+        ファイルからパースが必要な行を読み込むジェネレータ (行末の空白は削除済み)。
+        インデックスにあるコマンドの位置に seek し、コマンドの出力が終わるまで読み込む
+        :param fn: ファイル名 ('-' の場合は標準入力)
+        '''
+        if fn == '-':
+            for line in sys.stdin:
+                self.lno += 1
                 if not self.in_cmd and "show " not in line:
-                    continue            # optimize parse speed a bit
+                    continue
+                yield line.rstrip()
+            return
 
-                if not self.in_cont and self.in_cmd and "show " in line:
-                    self.end_of_cmd()
-                    # fall through
+        kind = source_kind(fn)
+        if kind == 'gzip':
+            with gzip.open(fn, 'rb') as f:
+                yield from self.read_stream_lines(fn, f)
+            return
+        if kind == 'member':
+            with zipfile.ZipFile(fn.archive) as z, z.open(fn.member) as f:
+                yield from self.read_stream_lines(fn, _gunzip_member(f, fn.member))
+            return
+        if kind == 'tar':
+            yield from self.read_tar_lines(fn)
+            return
 
-                # found matching show command
-                if not self.in_cmd:
-                    for cmd, p in pat.items():
-                        if p.search(line):
-                            log.debug(self.file_line() + "Parsing " + cmd)
-                            self.in_cmd = True
-                            self.cur_cmd = cmd
-                            self.cur_table = []
-                            continue
+        if self.lazy:
+            yield from self.read_lines_mmap(fn)
+            return
 
+        enc = self.file_encoding(fn)
+        hits = _index_show_lines(fn, self.cmd_pat, enc)
+        log.debug(f"{fn}: {len(hits)} target command(s) found in index.")
+        with open(fn, 'rb') as f:
+            pos = 0
+            for off, lno in hits:
+                if off < pos:
+                    continue        # already parsed as a part of the previous command
+                f.seek(off)
+                self.lno = lno
+                for raw in f:
+                    self.lno += 1
+                    try:
+                        line = raw.decode(enc)
+                    except UnicodeDecodeError as e:
+                        line = self.redecode(fn, raw, e, f.tell() - len(raw))
+                        enc = self.encodings[fn]
+                    yield line.rstrip()
+                    if not self.in_cmd:
+                        break
+                pos = f.tell()
+
+    def read_stream_lines(self, fn, stream):
+        '''
+        圧縮ファイルなど seek できない入力から行を読み込むジェネレータ
+        :param fn: ファイル名 (アーカイブのメンバー名)
+        :param stream: バイナリストリーム
+        '''
+        enc = self.file_encoding(fn)
+        self.lno = 0
+        for raw in stream:
+            self.lno += 1
+            if not self.in_cmd and b"show " not in raw:
+                continue
+            try:
+                line = raw.decode(enc)
+            except UnicodeDecodeError as e:
+                line = self.redecode(fn, raw, e)
+                enc = self.encodings[fn]
+            yield line.rstrip()
+
+    def read_tar_lines(self, fn):
+        '''
+        tar アーカイブの各メンバーを順にストリームで展開しながら行を読み込むジェネレータ。
+        メンバーごとに 1 つのファイルとして扱う (filename 列は "アーカイブ名:メンバー名")
+        :param fn: tar アーカイブ名
+        '''
+        with tarfile.open(fn, 'r|*') as tar:
+            for m in tar:
+                if not m.isfile():
                     continue
+                if self.in_cmd:
+                    self.end_of_cmd()       # 前のメンバーの EOF
+                self.cur_file = f"{fn}:{m.name}"
+                yield from self.read_stream_lines(self.cur_file, _gunzip_member(tar.extractfile(m), m.name))
 
-                if self.in_cont:     # inside a table content
-                    #
-                    #   end of table check
-                    #
-                    if self.cur_cmd in (DATAPATH_SESSION_TABLE, DATAPATH_SESSION_DPI, DATAPATH_SESSION_INT, DATAPATH_USER, DATAPATH_TUNNEL):
-                        if line == '':
-                            continue        # skip blank line in datapath session table
-                        if re.match("[0-9A-Fa-f][0-9A-Fa-f]:", line):
-                            continue        # skip entries start with MAC address
-                        if not line[0].isdigit():
-                            self.end_of_cmd()
-                            continue
-                    elif self.cur_cmd == DATAPATH_BRIDGE:
-                        if line == '':
-                            continue        # skip blank line in datapath bridge table
-                        if not re.match("[0-9A-Fa-f][0-9A-Fa-f]:", line):
-                            self.end_of_cmd()
-                            continue
-                    elif AP_ASSOCIATION_TABLE in self.cur_cmd:
-                        if line.startswith("Num Clients:"):
-                            self.end_of_cmd()
-                            continue
-                    elif ('ap-list' in self.cur_cmd) or ('client-list' in self.cur_cmd):
-                        if line.startswith("Start:") or line.startswith("dt:Discovered"):
-                            self.end_of_cmd()
-                            continue
-                    elif self.cur_cmd == 'show clients debug':
-                        if len(line) < 50:
-                            self.end_of_cmd()
-                            continue
-                    elif line.startswith('end of '):
-                        self.end_of_cmd()
-                        continue
-                    elif line.startswith('Neighbor Summary:'):  # show ap arm neighbors on IAP
-                        self.end_of_cmd()
-                        continue
-
-                    if line == '':          # end of a contents section
-                        self.in_cont = False
-                        continue
-
-                    #
-                    #   split columns and add them to a list
-                    #
-                    # row = [line[idx[i]:idx[i + 1]].rstrip() for i in range(len(idx) - 1)]
-                    # row.append(line[idx[-1]:].rstrip())
-                    row = _split_cols_by_utf8_bytes(line, idx)
-
-                    #
-                    #   apply some filter
-                    #
-                    if self.cur_cmd in (AP_DATABASE_TABLE, AP_DATABASE_LONG_TABLE):
-                        if activeonly and not row[idx_status].startswith("Up"):
-                            continue  # skip if Status is not 'Up'
-                    elif self.cur_cmd == DATAPATH_SESSION_DPI:
-                        app = row[idx_app]
-                        if app.startswith(" "):
-                            row[idx_app] = "unknown"
-                        else:
-                            row[idx_app] = app.split(" ")[0]
-
-                    if self.fromfile:
-                        row.append(fileinput.filename())        # add filename column
-                    self.cur_table.append(row)
-                    continue
+    def read_lines_mmap(self, fn):
+        '''
+        bytes モードの read_lines(). 各行の mmap 上の位置を self.span に設定する。
+        mmap はパース結果の LazyRow から参照されるため、ここでは close しない
+        :param fn: ファイル名
+        '''
+        enc = self.file_encoding(fn)
+        hits = _index_show_lines(fn, self.cmd_pat, enc)
+        if not hits:
+            return
+        with open(fn, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.mm = mm
+        size = len(mm)
+        pos = 0
+        for off, lno in hits:
+            if off < pos:
+                continue
+            pos = off
+            self.lno = lno
+            while pos < size:
+                nl = mm.find(b'\n', pos)
+                if nl < 0:
+                    nl = size
+                raw = mm[pos:nl].rstrip()
+                self.lno += 1
+                self.span = (pos, pos + len(raw))
+                if self.in_cont and self.mm is not None and self.is_plain_row(raw):
+                    yield None      # 表の内容の行はデコードしない (parse_line() は self.span の LazyRow にする)
+                else:
+                    try:
+                        line = raw.decode(enc)
+                    except UnicodeDecodeError as e:
+                        line = self.redecode(fn, raw, e, pos)
+                        enc = self.encodings[fn]
+                    yield line.rstrip()
+                pos = nl + 1
+                if not self.in_cmd:
+                    break
+        self.mm = None
 
+    def is_plain_row(self, raw):
+        '''
+        bytes モードで、行をデコードせずに表の内容の行と判定できるか.
+        parse_line() の表の終わり・スキップする行の判定を bytes のまま行う. ASCII 以外を含む行は
+        デコード (UTF-8 の検証・エンコーディングの判定) が必要なので False
+        :param raw: 行 (bytes. 行末の空白は削除済み)
+        '''
+        if not raw or not raw.isascii():
+            return False
+        cmd = self.cur_cmd
+        if cmd in DATAPATH_TABLES:
+            return 0x30 <= raw[0] <= 0x39 and not _MAC_PREFIX_B.match(raw)
+        if cmd == DATAPATH_BRIDGE:
+            return _MAC_PREFIX_B.match(raw) is not None
+        if AP_ASSOCIATION_TABLE in cmd:
+            return not raw.startswith(b"Num Clients:")
+        if ('ap-list' in cmd) or ('client-list' in cmd):
+            return not raw.startswith((b"Start:", b"dt:Discovered"))
+        if cmd == 'show clients debug':
+            return len(raw) >= 50
+        return not raw.startswith((b'end of ', b'Neighbor Summary:'))
+
+    # follow モードで保存・復元するパーサの状態
+    _STATE_ATTRS = ('in_cmd', 'in_cont', 'cur_cmd', 'cur_table', 'idx', 'prev_line', 'lno',
+                    'idx_status', 'idx_app', 'conv', 'encodings', 'follow_state')
+
+    def reset_state(self):
+        '''
+        パース中の状態を初期化する (follow モードでファイルがローテートされた場合)
+        '''
+        self.in_cmd = False
+        self.in_cont = False
+        self.prev_line = ''
+        self.lno = 0
+        self.conv = None
+        self.follow_state = None
+
+    def save_state(self, fn):
+        '''
+        follow モードの読み込み位置とパース中の状態をファイルに保存する
+        :param fn: 状態ファイル名
+        '''
+        state = {a: getattr(self, a, None) for a in self._STATE_ATTRS}
+        state['opts'] = (list(self.tables), self.cache_opts())
+        tmp = f"{fn}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, fn)
+
+    def load_state(self, fn):
+        '''
+        save_state() で保存した状態を復元する
+        :param fn: 状態ファイル名
+        :return: 復元できた場合 True
+        '''
+        try:
+            with open(fn, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError) as e:
+            log.warn(f"Can't load state file {fn}: {e}")
+            return False
+        if state.get('opts') != (list(self.tables), self.cache_opts()):
+            log.warn(f"{fn}: commands or options have changed. Ignoring the saved state.")
+            return False
+        for a in self._STATE_ATTRS:
+            setattr(self, a, state[a])
+        return True
+
+    def poll(self, fn):
+        '''
+        follow モード: 前回読み込んだ位置以降にファイルに追記された行をパースする。
+        書き込み途中の (改行で終わっていない) 行は次回に読む。
+        ファイルが小さくなった場合、inode が変わった場合は先頭から読み直す
+        :param fn: ファイル名
+        :return: 今回パースが完了したテーブルの数
+        '''
+        try:
+            st = os.stat(fn)
+        except FileNotFoundError:
+            return 0
+        fs = self.follow_state
+        if fs is None or fs['ino'] != st.st_ino or st.st_size < fs['pos']:
+            if fs is not None:
+                log.info(f"{fn}: file was rotated or truncated. Reading from the beginning.")
+            self.reset_state()
+            fs = self.follow_state = {'ino': st.st_ino, 'pos': 0}
+        if st.st_size == fs['pos']:
+            return 0
+
+        self.cur_file = fn
+        self.file_tables = {cmd: [] for cmd in self.tables}
+        enc = self.encodings.get(fn) or self.file_encoding(fn)
+        with open(fn, 'rb') as f:
+            f.seek(fs['pos'])
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break           # 書き込み途中の行
+                fs['pos'] += len(raw)
+                self.lno += 1
+                if not self.in_cmd and b"show " not in raw:
+                    continue
+                try:
+                    line = raw.decode(enc)
+                except UnicodeDecodeError as e:
+                    line = self.redecode(fn, raw, e, fs['pos'] - len(raw))
+                    enc = self.encodings[fn]
+                self.parse_line(line.rstrip())
+
+        n = sum(len(tbls) for tbls in self.file_tables.values())
+        self.add_file_tables()
+        self.file_tables = {cmd: [] for cmd in self.tables}
+        return n
+
+    def follow(self, fn, interval=1.0, state_file=None, stop=None):
+        '''
+        tail -f のようにファイルへの追記を監視し、追記された部分のみをパースする。
+        完了したテーブルは callback(cmd, table) に渡す. callback を指定した場合、テーブルは
+        self.tables に保持しない (長時間の監視でメモリが増え続けないように)
+        :param fn: ファイル名
+        :param interval: ファイルをチェックする間隔 (秒)
+        :param state_file: 読み込み位置とパース中の状態を保存するファイル. 再起動時は続きから読む
+        :param stop: 引数なしの関数. True を返したら終了する. None の場合は Ctrl-C まで継続
+        '''
+        self.fromfile = True
+        if state_file is not None and self.load_state(state_file):
+            log.info(f"{fn}: resuming from offset {self.follow_state['pos']}.")
+        try:
+            while stop is None or not stop():
+                pos = self.follow_state and self.follow_state['pos']
+                self.poll(fn)
+                if self.callback is not None:
+                    for tbls in self.tables.values():
+                        tbls.clear()
+                    self.drop_index()
+                if state_file is not None and self.follow_state and self.follow_state['pos'] != pos:
+                    self.save_state(state_file)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    def parse_line(self, line):
+        '''
+        1 行をパースする (行末の空白は削除済み)
+        :param line: 入力行. None は bytes モードでデコードせずに渡された表の内容の行 (位置は self.span)
+        '''
+        if line is None:
+            self.add_row(None)
+            return
 
+        if not self.in_cont and self.in_cmd and "show " in line:
+            self.end_of_cmd()
+            # fall through
+
+        # found matching show command
+        if not self.in_cmd:
+            if not self.cmd_pat.search(line):
+                return
+            for cmd in reversed(self.pat):      # 複数マッチした場合は後に指定されたコマンドを優先
+                if self.pat[cmd].search(line):
+                    log.debug(self.file_line() + "Parsing " + cmd)
+                    self.in_cmd = True
+                    self.cur_cmd = cmd
+                    self.cur_table = []
+                    break
+            return
 
-                #
-                #   inside supported show command output, but not in a content section
-                #
+        if self.in_cont:     # inside a table content
+            #
+            #   end of table check
+            #
+            if self.cur_cmd in DATAPATH_TABLES:
+                if line == '':
+                    return          # skip blank line in datapath session table
+                if re.match("[0-9A-Fa-f][0-9A-Fa-f]:", line):
+                    return          # skip entries start with MAC address
+                if not line[0].isdigit():
+                    self.end_of_cmd()
+                    if "show " in line:
+                        self.parse_line(line)   # 次のコマンドのプロンプト行 (同じコマンドの繰り返しの取得など)
+                    return
+            elif self.cur_cmd == DATAPATH_BRIDGE:
+                if line == '':
+                    return          # skip blank line in datapath bridge table
+                if not re.match("[0-9A-Fa-f][0-9A-Fa-f]:", line):
+                    self.end_of_cmd()
+                    return
+            elif AP_ASSOCIATION_TABLE in self.cur_cmd:
+                if line.startswith("Num Clients:"):
+                    self.end_of_cmd()
+                    return
+            elif ('ap-list' in self.cur_cmd) or ('client-list' in self.cur_cmd):
+                if line.startswith("Start:") or line.startswith("dt:Discovered"):
+                    self.end_of_cmd()
+                    return
+            elif self.cur_cmd == 'show clients debug':
+                if len(line) < 50:
+                    self.end_of_cmd()
+                    return
+            elif line.startswith('end of '):
+                self.end_of_cmd()
+                return
+            elif line.startswith('Neighbor Summary:'):  # show ap arm neighbors on IAP
+                self.end_of_cmd()
+                return
 
-                if self.cur_cmd == 'show datapath bridge' and line.startswith('--- '):
-                    continue    # skip the first table
+            if line == '':          # end of a contents section
+                self.in_cont = False
+                return
 
-                if re.match("-+ +-", line):  # beginning of a content section
-                    self.in_cont = True
-                    idx = []
-                    for r in re.finditer('-+', line):
-                        idx.append(r.span(0)[0])  # index of each separator string '----'
+            self.add_row(line)
+            return
 
-                    if len(self.cur_table) == 0:
-                        # the very first content section for a table... parse header
-                        hdr = prev_line  # save the first header line
-                        row = [hdr[idx[i]:idx[i + 1]].strip() for i in range(len(idx) - 1)]
-                        row.append(hdr[idx[-1]:].strip())
 
-                        if self.cur_cmd in (AP_DATABASE_TABLE, AP_DATABASE_LONG_TABLE):
-                            idx_status = row.index("Status")
-                        elif self.cur_cmd == DATAPATH_SESSION_DPI:
-                            idx_app = row.index("AppID")
-                        if self.fromfile:
-                            row.append("filename")  # add filename column
-                        # add header row
-                        self.cur_table.append(row)
 
+        #
+        #   inside supported show command output, but not in a content section
+        #
+
+        if self.cur_cmd == 'show datapath bridge' and line.startswith('--- '):
+            return      # skip the first table
+
+        if re.match("-+ +-", line):  # beginning of a content section
+            self.in_cont = True
+            idx = []
+            for r in re.finditer('-+', line):
+                idx.append(r.span(0)[0])  # index of each separator string '----'
+            self.idx = idx
+
+            if len(self.cur_table) == 0:
+                # the very first content section for a table... parse header
+                hdr = self.prev_line  # save the first header line
+                row = [hdr[idx[i]:idx[i + 1]].strip() for i in range(len(idx) - 1)]
+                row.append(hdr[idx[-1]:].strip())
+
+                if self.cur_cmd in (AP_DATABASE_TABLE, AP_DATABASE_LONG_TABLE):
+                    self.idx_status = row.index("Status")
+                elif self.cur_cmd == DATAPATH_SESSION_DPI:
+                    self.idx_app = row.index("AppID")
+                types = None
+                schema = column_schema(self.cur_cmd) if self.typed else None
+                if schema is not None:
+                    self.conv = _RowConverter(row, schema)
+                    row = self.conv.header
+                    types = self.conv.types
                 else:
-                    prev_line = line
+                    self.conv = None
+                if self.fromfile:
+                    row.append("filename")  # add filename column
+                    if types is not None:
+                        types = types + [None]
+                # add header row
+                if self.columnar:
+                    self.cur_table = ColumnTable(row, types=types)
+                else:
+                    self.cur_table.append(row)
 
-            # EOF
-            if self.in_cmd:
-                self.end_of_cmd()
+            if self.mm is not None:
+                transforms = {self.idx_app: _normalize_appid} if self.cur_cmd == DATAPATH_SESSION_DPI else None
+                self.layout = _RowLayout(idx, (self.cur_file,), transforms)
+
+        else:
+            self.prev_line = line
 
-        except UnicodeDecodeError as e:
-            fileinput.close()
-            raise e
+    def add_row(self, line):
+        '''
+        表の内容の行を列に分割してテーブルに追加する
+        :param line: 入力行. bytes モードでは使用しない (self.span の LazyRow にする)
+        '''
+        st = self.stats
+        if st is not None:
+            t0 = time.perf_counter()
+        if self.mm is not None:
+            row = LazyRow(self.mm, self.span[0], self.span[1], self.layout)
+        else:
+            row = _split_cols_by_utf8_bytes(line, self.idx)
+        if st is not None:
+            t1 = time.perf_counter()
+            st.phases['split'] += t1 - t0
+
+        #
+        #   apply some filter
+        #
+        if self.cur_cmd in (AP_DATABASE_TABLE, AP_DATABASE_LONG_TABLE):
+            if self.activeonly and not row[self.idx_status].startswith("Up"):
+                return  # skip if Status is not 'Up'
+        elif self.cur_cmd == DATAPATH_SESSION_DPI and self.mm is None:
+            row[self.idx_app] = _normalize_appid(row[self.idx_app])
+        if self.conv is not None:
+            row = self.conv.convert(row)
+        if st is not None:
+            st.phases['filter'] += time.perf_counter() - t1
+
+        if self.fromfile and self.mm is None:
+            row.append(self.cur_file)       # add filename column
+        if self.row_sink is not None:
+            self.row_sink(row)
+        else:
+            self.cur_table.append(row)
 
     def get_num_tables(self, cmd):
         if cmd not in self.tables:
@@ -399,7 +1382,8 @@ class AOSParser:
 
     def get_table_key(self, cmd, key, val, *cols):
         '''
-        コマンドの結果テーブルから key==val の列をすべて取得する
+        コマンドの結果テーブルから key==val の列をすべて取得する.
+        key 列のインデックスを使用するため、繰り返し呼んでもテーブルの走査は初回のみ
         :param cmd: コマンド
         :param cols: 取得したい列名
         :return: コマンド結果テーブル
@@ -407,14 +1391,35 @@ class AOSParser:
         if len(cols)==0 or cmd not in self.tables or len(self.tables[cmd])==0:
             return None
         tbl = self.tables[cmd][0]
-        r = []
         idx = [tbl[0].index(col) for col in cols]
-        kidx = tbl[0].index(key)
-        for row in tbl[1:]:
-            if row[kidx] == val:
-                r.append([row[i] for i in idx])
+        return [[row[i] for i in idx] for row in self.index(cmd, key).rows(val)]
 
-        return r
+
+    def index(self, cmd, *keycols):
+        '''
+        コマンドの結果テーブルの keycols 列によるハッシュインデックスを取得する.
+        初回に作成してパーサに保持し、テーブルが変更された場合 (dedup, マージなど) は作り直す
+        :param cmd: コマンド
+        :param keycols: キーとする列名. 複数指定した場合、キーは値のタプル
+        :return: TableIndex. テーブルがない場合は None
+        '''
+        if cmd not in self.tables or len(self.tables[cmd])==0:
+            return None
+        tbl = self.tables[cmd][0]
+        idx = self.indexes.get((cmd, keycols))
+        if idx is None or not idx.is_valid(tbl):
+            idx = TableIndex(tbl, *keycols)
+            self.indexes[(cmd, keycols)] = idx
+        return idx
+
+    def drop_index(self, cmd=None):
+        '''
+        インデックスを破棄する. テーブルを直接書き換えた場合に呼ぶ
+        :param cmd: コマンド. None の場合は全コマンド
+        '''
+        for k in list(self.indexes):
+            if cmd is None or k[0] == cmd:
+                del self.indexes[k]
 
 
     def get_tables(self, cmd, *cols):
@@ -430,63 +1435,39 @@ class AOSParser:
             return [_get_cols_gen(tbl, *cols) for tbl in self.tables[cmd]]
         return self.tables[cmd]
 
-    def dedup(self, cmd, keycol):
+    def dedup(self, cmd, keycol, keep='first', by=None):
         '''
         指定したコマンドのテーブルを keycol 列で重複排除する
         :param cmd: コマンド
         :param keycol: 重複排除に使用する列名
+        :param keep: 重複する行のうち残す行. 'first' (最初), 'last' (最後), 'max' (by 列が最大),
+                     'fewest_blanks' (by 列の空欄が最少. by 省略時は全列)
+        :param by: keep='max' では列名、'fewest_blanks' では列名の配列
         :return: 重複排除後のレコード数
         '''
-        if cmd not in self.tables or len(self.tables[cmd])==0:
-            return 0
-
-        tbl = self.tables[cmd][0]
-        try:
-            idx = tbl[0].index(keycol)
-        except ValueError as e:
-            log.err(f"Column not found: {e}")
-            return 0
-        seen = set()
-        new_tbl = [tbl[0]]   # ヘッダ行
-
-        for row in tbl[1:]:
-            key = row[idx]
-            if key in seen:
-                continue
-            seen.add(key)
-            new_tbl.append(row)
+        return self.dedup2(cmd, keycol, keep=keep, by=by)
 
-        self.tables[cmd][0] = new_tbl
-        return len(new_tbl)-1
 
-
-    def dedup2(self, cmd, *keycol):
+    def dedup2(self, cmd, *keycol, keep='first', by=None):
         '''
         指定したコマンドのテーブルを keycol 列で重複排除する。複数の列を指定可能
         :param cmd: コマンド
         :param keycol: 重複排除に使用する列名のリスト
+        :param keep: 重複する行のうち残す行 (dedup() を参照)
+        :param by: keep='max' では列名、'fewest_blanks' では列名の配列
         :return: 重複排除後のレコード数
         '''
         if cmd not in self.tables or len(self.tables[cmd])==0:
             return 0
 
-        tbl = self.tables[cmd][0]
         try:
-            idx = [tbl[0].index(col) for col in keycol]
+            new_tbl = dedup_table(self.tables[cmd][0], keycol, keep=keep, by=by)
         except ValueError as e:
-            log.err(f"Column not found: {e}")
+            log.err(f"Can't dedup '{cmd}': {e}")
             return 0
-        seen = set()
-        new_tbl = [tbl[0]]   # ヘッダ行
-
-        for row in tbl[1:]:
-            key = tuple([row[i] for i in idx])
-            if key in seen:
-                continue
-            seen.add(key)
-            new_tbl.append(row)
 
         self.tables[cmd][0] = new_tbl
+        self.drop_index(cmd)
         return len(new_tbl)-1
 
     def change_colname(self, cmd, col_nam):
@@ -496,4 +1477,22 @@ class AOSParser:
         for i, col in enumerate(cols):
             if col in col_nam:
                 cols[i] = col_nam[col]
+        self.drop_index(cmd)
+
 
+    def export(self, path, cmd=None, fmt=None, infer=True):
+        '''
+        パース結果のテーブルを Parquet / Feather ファイルに書き出す (aos_export.py. pyarrow が必要)
+        :param path: cmd を指定した場合はファイル名、省略した場合は出力先ディレクトリ (コマンドごとに 1 ファイル)
+        :param cmd: コマンド. 省略時は全コマンド
+        :param fmt: 'parquet' または 'feather'. 省略時はファイル名の拡張子から判定 (ディレクトリの場合は parquet)
+        :param infer: 整数のみの文字列の列を int64 として書き出す
+        :return: 書き出したファイル名のリスト
+        '''
+        from aos_export import write_tables, export_tables
+        if cmd is None:
+            return export_tables(self.tables, path, fmt or 'parquet', infer)
+        if cmd not in self.tables:
+            log.err(f"Command not parsed: {cmd}")
+            return []
+        return write_tables(self.tables[cmd], path, cmd, fmt, infer)
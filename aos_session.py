@@ -0,0 +1,336 @@
+#
+#   aos_session.py
+#
+#   show datapath session (dpi / internal / verbose) の分析 (dp-ses-* で使用)
+#   - セッションテーブルを 1 回だけ NumPy の列 (SessionTable) に変換し、
+#     フィルタ・集計・ソートを行単位のループではなく配列演算で行う
+#   - 2 次元配列 / ColumnTable, typed=True / False のいずれのテーブルにも対応
+#     (ColumnTable の整数列・辞書エンコード列はそのまま NumPy 配列にする)
+#   - 文字列の列 (IP アドレス, Flags, AppID) は コード (int32) + 値のリスト に変換する.
+#     送信元・宛先 IP は共通のコードで、AP 名 (ip2apn) や IP の集合による判定は値ごとに 1 回だけ行う
+#   - 列
+#       sip, dip            IP アドレスのコード (値は ips)
+#       sap, dap            AP 名のコード (値は ap_names. 0 は AP なし (''))
+#       proto, sport, dport, tage, packets, bytes   int64 (欠損値は 0)
+#       flags, app          Flags, AppID のコード (値は flag_values, app_values)
+#       bitrate             bps (TAge が min_tage 未満の場合は 0)
+#       ipa                 ips の IPArray (aos_ip. CIDR, マルチキャストなどの判定とサブネットごとの集計に使用)
+#   numpy が必要
+#
+#       ses = SessionTable(aos.get_table(DATAPATH_SESSION_DPI), ip2apn)
+#       m = (ses.proto != 47) & ses.ap_mask('AP-1F') & ses.port_mask([443])
+#       for i in ses.top(ses.bitrate, 100, m):
+#           print(ses.row(i))
+#       ses.top_groups((ses.sap, ses.dap), ses.ap_names, ses.bitrate, m)     # [(AP 名, bps), ...]
+#
+
+import re
+import numpy as np
+from aos_parser import DATAPATH_SESSION_DPI, DATAPATH_SESSION_INT, DATAPATH_SESSION_TABLE
+from aos_ip import IPArray, subnet_rollup
+
+SESSION_CMDS = (DATAPATH_SESSION_DPI, DATAPATH_SESSION_INT, DATAPATH_SESSION_TABLE)
+
+MIN_TAGE = 5        # TAge (秒) がこれ未満のセッションは bitrate を 0 とする
+
+# 列名 -> (属性名, 文字列の場合の変換). ヘッダにない列は 0 または空
+_NUM_COLUMNS = {
+    'Prot': ('proto', int),
+    'SPort': ('sport', int),
+    'Dport': ('dport', int),
+    'TAge': ('tage', lambda v: int(v, 16)),
+    'Packets': ('packets', int),
+    'Bytes': ('bytes', int),
+}
+_IP_COLUMNS = (('Source IP or MAC', 'Source IP'), ('Destination IP',))
+
+
+def _to_num(conv, v):
+    '''
+    文字列 / 数値 / None を整数にする. 変換できない値は 0
+    '''
+    if v is None or v == '':
+        return 0
+    if not isinstance(v, str):
+        return v
+    try:
+        return conv(v)
+    except ValueError:
+        return 0
+
+
+def _factorize(values, lookup=None):
+    '''
+    値の配列をコードの配列と値のリストにする
+    :param lookup: 値 -> コード の dict (指定した場合は追加・共有する)
+    :return: (コードの np.int32 配列, lookup)
+    '''
+    lookup = {} if lookup is None else lookup
+    codes = [lookup.setdefault(v, len(lookup)) for v in values]
+    return np.array(codes, dtype=np.int32), lookup
+
+
+def _str_column(tbl, j, lookup=None):
+    '''
+    文字列の列をコードの配列にする. ColumnTable の辞書エンコード列は既存のコードを使う
+    :return: (コードの np.int32 配列, 値 -> コード の dict)
+    '''
+    col = tbl.cols[j] if hasattr(tbl, 'cols') else None
+    if col is not None and col.kind == 'dict':
+        remap, lookup = _factorize(col.values, lookup)
+        return remap[np.frombuffer(col.codes, dtype=col.codes.typecode)], lookup
+    if col is not None:
+        return _factorize(col, lookup)
+    return _factorize([row[j] for row in tbl[1:]], lookup)
+
+
+def _num_column(tbl, j, conv):
+    '''
+    数値の列を np.int64 の配列にする (欠損値は 0)
+    '''
+    col = tbl.cols[j] if hasattr(tbl, 'cols') else None
+    if col is not None:
+        if col.kind in ('int', 'num'):
+            a = np.frombuffer(col.data, dtype=col.data.typecode).astype(np.int64)
+            if col.kind == 'num' and col.missing:
+                a[list(col.missing)] = 0
+            return a
+        if col.kind == 'dict':
+            values = np.array([_to_num(conv, v) for v in col.values] or [0], dtype=np.int64)
+            return values[np.frombuffer(col.codes, dtype=col.codes.typecode)]
+        values = col
+    else:
+        values = [row[j] for row in tbl[1:]]
+    return np.array([_to_num(conv, v) for v in values], dtype=np.int64)
+
+
+class SessionTable:
+    """
+    datapath session テーブルを NumPy の列に変換したもの
+    """
+
+    def __init__(self, tbl, ip2apn=None, min_tage=MIN_TAGE):
+        '''
+        :param tbl: show datapath session dpi / internal / verbose のテーブル (ヘッダ行を含む)
+        :param ip2apn: IP アドレス -> AP 名 の dict (show user-table から作成)
+        :param min_tage: TAge がこの値未満のセッションは bitrate を 0 とする
+        '''
+        self.tbl = tbl
+        header = tbl[0]
+        self.n = len(tbl) - 1
+
+        #   IP アドレス (送信元と宛先で共通のコード)
+        sip, dip = (next((header.index(c) for c in names if c in header), None) for names in _IP_COLUMNS)
+        if sip is None or dip is None:
+            raise ValueError("Source/Destination IP column not found")
+        self.sip, lookup = _str_column(tbl, sip)
+        self.dip, lookup = _str_column(tbl, dip, lookup)
+        self.ips = list(lookup)
+
+        for name, (attr, conv) in _NUM_COLUMNS.items():
+            if name in header:
+                setattr(self, attr, _num_column(tbl, header.index(name), conv))
+            else:
+                setattr(self, attr, np.zeros(self.n, dtype=np.int64))
+
+        self.flags, lookup = _str_column(tbl, header.index('Flags')) if 'Flags' in header else (np.zeros(self.n, dtype=np.int32), {'': 0})
+        self.flag_values = list(lookup)
+        self.app, lookup = _str_column(tbl, header.index('AppID')) if 'AppID' in header else (np.zeros(self.n, dtype=np.int32), {'': 0})
+        self.app_values = list(lookup)
+
+        self._ipa = None
+        self.bitrate = np.where(self.tage >= min_tage, self.bytes * 8 / np.maximum(self.tage, 1), 0.0)
+        self.set_ap_map(ip2apn or {})
+
+    def set_ap_map(self, ip2apn):
+        '''
+        IP アドレス -> AP 名 の対応から sap, dap 列を作成する
+        '''
+        names = {'': 0}
+        codes = np.array([names.setdefault(ip2apn.get(ip, ''), len(names)) for ip in self.ips] or [0], dtype=np.int32)
+        self.ap_names = list(names)
+        self.sap = codes[self.sip]
+        self.dap = codes[self.dip]
+
+    def __len__(self):
+        return self.n
+
+    def row(self, i):
+        '''
+        i 番目のセッション (0 起点) の元のテーブルの行
+        '''
+        return self.tbl[i + 1]
+
+    #
+    #   フィルタ (bool の配列を返す. & | ~ で組み合わせる)
+    #
+    @staticmethod
+    def _lookup(values, func):
+        '''
+        値ごとに func を 1 回だけ評価した bool の配列 (コードで参照する)
+        '''
+        return np.array([bool(func(v)) for v in values] or [False])
+
+    @staticmethod
+    def _sides(src, dst, side):
+        '''
+        送信元・宛先の bool 配列を side に従って組み合わせる
+        :param side: 'src', 'dst', 'any' (どちらか), 'both' (両方)
+        '''
+        if side == 'src':
+            return src()
+        if side == 'dst':
+            return dst()
+        if side == 'both':
+            return src() & dst()
+        return src() | dst()
+
+    def ip_mask(self, ips, side='any'):
+        '''
+        IP アドレスが ips に含まれるセッション
+        '''
+        t = self._lookup(self.ips, lambda v: v in ips)
+        return self._sides(lambda: t[self.sip], lambda: t[self.dip], side)
+
+    def ap_mask(self, pattern, side='any'):
+        '''
+        AP 名 (AP なしの場合は '') が正規表現 pattern にマッチするセッション
+        '''
+        t = self._lookup(self.ap_names, re.compile(pattern).search)
+        return self._sides(lambda: t[self.sap], lambda: t[self.dap], side)
+
+    def port_mask(self, ports, side='any'):
+        '''
+        ポート番号が ports に含まれるセッション
+        '''
+        ports = np.asarray(list(ports), dtype=np.int64)
+        return self._sides(lambda: np.isin(self.sport, ports), lambda: np.isin(self.dport, ports), side)
+
+    def flag_mask(self, flag):
+        '''
+        Flags に flag (1 文字) を含むセッション
+        '''
+        return self._lookup(self.flag_values, lambda v: flag in v)[self.flags]
+
+    @property
+    def ipa(self):
+        '''
+        ips (IP アドレスの値) の IPArray (最初の参照時に作成する)
+        '''
+        if self._ipa is None:
+            self._ipa = IPArray.from_values(self.ips)
+        return self._ipa
+
+    def cidr_mask(self, nets, side='any'):
+        '''
+        IP アドレスが CIDR nets (文字列 またはそのリスト) に含まれるセッション
+        '''
+        t = self.ipa.in_cidr(nets)
+        return self._sides(lambda: t[self.sip], lambda: t[self.dip], side)
+
+    def ip_class(self, side='dst'):
+        '''
+        IP アドレスの種類 (aos_ip.IP_CLASSES の番号の配列)
+        :param side: 'src' または 'dst'
+        '''
+        return self.ipa.classify()[self.sip if side == 'src' else self.dip]
+
+    def multicast(self):
+        '''
+        宛先がマルチキャスト (224.0.0.0/4, ff00::/8) のセッション
+        '''
+        return self.ipa.is_multicast()[self.dip]
+
+    def subnets(self, prefix4=24, prefix6=64, weights=None, mask=None, side='dst', n=None):
+        '''
+        サブネットごとの合計 (aos_ip.subnet_rollup)
+        :param side: 'src' または 'dst'
+        :return: [(サブネット, 合計, セッション数), ...]
+        '''
+        ipa = self.ipa.take(self.sip if side == 'src' else self.dip)
+        return subnet_rollup(ipa, prefix4, prefix6, weights, mask, n)
+
+    #
+    #   集計
+    #
+    def count_flags(self, flags, mask=None):
+        '''
+        フラグごとのセッション数
+        :param flags: フラグの文字の並び ('VIQu' など)
+        :return: dict フラグ -> 数
+        '''
+        cnt = np.bincount(self.flags if mask is None else self.flags[mask], minlength=len(self.flag_values))
+        return {f: int(sum(c for v, c in zip(self.flag_values, cnt) if f in v)) for f in flags}
+
+    def total(self, values, mask=None):
+        '''
+        values の合計 (先頭から順に加算する. 行ごとのループでの合計と同じ値になる)
+        '''
+        v = values if mask is None else values[mask]
+        return float(v.cumsum()[-1]) if len(v) else 0
+
+    @staticmethod
+    def top(values, n, mask=None):
+        '''
+        values の降順で上位 n 件のセッションの番号 (値が同じ場合は元の順)
+        :param mask: 対象のセッション (None の場合は全て)
+        :return: セッション番号 (0 起点) の np 配列
+        '''
+        idx = np.arange(len(values)) if mask is None else np.flatnonzero(mask)
+        v = values[idx]
+        if n is not None and n < len(v):
+            kth = np.partition(v, len(v) - n)[len(v) - n]
+            sel = v >= kth
+            idx, v = idx[sel], v[sel]
+        order = np.argsort(-v, kind='stable')
+        return idx[order] if n is None else idx[order[:n]]
+
+    def group_sum(self, keys, weights=None, mask=None):
+        '''
+        キーごとの合計 (weights=None の場合は件数)
+        :param keys: キーのコードの配列, または配列のタプル (sap, dap など. 各配列の値をそれぞれ集計する).
+                     負のコードは集計しない (np.where(cond, ses.sip, -1) で条件を満たす側のみ集計するなど)
+        :param weights: 値の配列
+        :param mask: 対象のセッション
+        :return: (キーのコード, 合計, 最初に出現した位置) の np 配列. キーはコードの昇順
+        '''
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        # 行ごと・キーの順に並べる (行ごとのループで dict に加算した場合と同じ順)
+        k = np.stack(keys, axis=1).ravel()
+        sel = k >= 0
+        if mask is not None:
+            sel &= np.repeat(mask, len(keys))
+        pos = np.flatnonzero(sel)
+        k = k[pos]
+        if len(k) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=np.int64)
+        w = None if weights is None else np.repeat(weights.astype(np.float64), len(keys))[pos]
+        sums = np.bincount(k, weights=w)
+        codes, first = np.unique(k, return_index=True)
+        return codes, sums[codes], first
+
+    def top_groups(self, keys, values, weights=None, mask=None, n=20):
+        '''
+        キーごとの合計の上位 n 件
+        :param keys: group_sum() の keys
+        :param values: コード -> 名前 のリスト (ips, ap_names, app_values など)
+        :return: [(名前, 合計), ...] 合計の降順 (同じ場合は最初に出現した順). weights=None の場合は件数 (int)
+        '''
+        codes, sums, first = self.group_sum(keys, weights, mask)
+        order = np.lexsort((first, -sums))[:n]
+        conv = int if weights is None else float
+        return [(values[codes[i]], conv(sums[i])) for i in order]
+
+
+def load_sessions(aos, ip2apn=None, cmds=SESSION_CMDS, min_tage=MIN_TAGE):
+    '''
+    パース結果から datapath session のテーブルを探して SessionTable にする
+    :param aos: AOSParser
+    :param cmds: 探すコマンド (先に見つかったものを使用)
+    :return: SessionTable. テーブルがない場合は None
+    '''
+    for cmd in cmds:
+        tbl = aos.get_table(cmd)
+        if tbl is not None:
+            return SessionTable(tbl, ip2apn, min_tage)
+    return None
@@ -0,0 +1,164 @@
+#
+#   aos_stats.py
+#
+#   AOSParser のパース統計 (AOSParser(profile=True) または set_profile(True) で有効)
+#   - ファイルごと: 行数、サイズ、パース時間、キャッシュヒット
+#   - コマンドごと: 行数、テーブル数、レコード数、パース時間、メモリ使用量の見積もり
+#   - フェーズごとの時間
+#       scan    ファイルの読み込み、インデックス作成、デコード
+#       parse   プロンプト・ヘッダの判定などの状態遷移
+#       split   行の列への分割
+#       filter  activeonly, AppID の正規化, 型変換
+#       merge   テーブルのマージ (merge=True)、列指向テーブルの圧縮
+#
+
+import os
+import sys
+from time import perf_counter
+from collections import defaultdict
+
+PHASES = ('scan', 'parse', 'split', 'filter', 'merge')
+
+
+def estimate_nbytes(tbl, samples=100):
+    '''
+    テーブルのおおよそのメモリ使用量 (bytes). 2次元配列の場合は先頭の samples 行から見積もる
+    '''
+    if hasattr(tbl, 'nbytes'):      # ColumnTable
+        return tbl.nbytes()
+    n = len(tbl)
+    if n == 0:
+        return 0
+    rows = tbl[:samples]
+    size = 0
+    for row in rows:
+        size += sys.getsizeof(row)
+        if isinstance(row, list):
+            size += sum(sys.getsizeof(v) for v in row)
+    return int(size * n / len(rows)) + sys.getsizeof(tbl)
+
+
+class ParseStats:
+    """
+    パース統計
+    """
+
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)       # フェーズ -> 秒
+        self.files = {}                                 # ファイル名 -> {'lines', 'bytes', 'time', 'cached'}
+        self.cmd_lines = defaultdict(int)               # コマンド -> 行数
+        self.cmd_time = defaultdict(float)              # コマンド -> 秒 (parse, split, filter)
+        self.tables = {}                                # コマンド -> {'tables', 'rows', 'cols', 'nbytes'}
+        self.lines = 0
+
+    def run(self, aos, lines):
+        '''
+        AOSParser.parse_lines() の計測版. 行の読み込みとパースの時間を分けて計測する
+        :param aos: AOSParser
+        :param lines: 行のイテレータ
+        :return: パースした行数
+        '''
+        phases = self.phases
+        cmd_lines = self.cmd_lines
+        cmd_time = self.cmd_time
+        it = iter(lines)
+        n = 0
+        scan = parse = 0.0
+        while True:
+            t0 = perf_counter()
+            try:
+                line = next(it)
+            except StopIteration:
+                scan += perf_counter() - t0
+                break
+            t1 = perf_counter()
+            aos.parse_line(line)
+            t2 = perf_counter()
+            scan += t1 - t0
+            parse += t2 - t1
+            n += 1
+            if aos.in_cmd:
+                cmd_lines[aos.cur_cmd] += 1
+                cmd_time[aos.cur_cmd] += t2 - t1
+        phases['scan'] += scan
+        phases['parse'] += parse
+        self.lines += n
+        return n
+
+    def add_file(self, fn, lines, elapsed, cached=False):
+        '''
+        1 ファイル分の統計を記録する
+        '''
+        try:
+            size = os.path.getsize(fn)
+        except (OSError, TypeError, ValueError):
+            size = None     # 標準入力, アーカイブのメンバー
+        self.files[fn] = {'lines': lines, 'bytes': size, 'time': elapsed, 'cached': cached}
+
+    def add_tables(self, tables):
+        '''
+        パース結果のテーブルのサイズを記録する
+        :param tables: AOSParser.tables
+        '''
+        for cmd, tbls in tables.items():
+            self.tables[cmd] = {
+                'tables': len(tbls),
+                'rows': sum(len(t) - 1 for t in tbls),
+                'cols': len(tbls[0][0]) if tbls else 0,
+                'nbytes': sum(estimate_nbytes(t) for t in tbls),
+            }
+
+    def merge(self, other):
+        '''
+        ワーカープロセスの統計を加算する
+        '''
+        for k, v in other.phases.items():
+            self.phases[k] += v
+        self.files.update(other.files)
+        for k, v in other.cmd_lines.items():
+            self.cmd_lines[k] += v
+        for k, v in other.cmd_time.items():
+            self.cmd_time[k] += v
+        self.lines += other.lines
+
+    def as_dict(self):
+        '''
+        統計を dict で返す (JSON などへの出力用)
+        '''
+        phases = dict(self.phases)
+        # parse には split, filter の時間が含まれるため差し引く
+        phases['parse'] = max(0.0, phases['parse'] - phases['split'] - phases['filter'])
+        cmds = {}
+        for cmd in set(self.cmd_lines) | set(self.tables):
+            d = {'lines': self.cmd_lines.get(cmd, 0), 'time': self.cmd_time.get(cmd, 0.0)}
+            d.update(self.tables.get(cmd, {}))
+            cmds[cmd] = d
+        return {'lines': self.lines, 'phases': phases, 'files': dict(self.files), 'commands': cmds}
+
+    def report(self):
+        '''
+        統計を表形式の文字列で返す
+        '''
+        d = self.as_dict()
+        s = [f"==== Parser statistics: {d['lines']} lines ===="]
+        s.append("Phase    Time(s)")
+        for k, v in d['phases'].items():
+            s.append(f"{k:7}  {v:8.3f}")
+
+        if d['files']:
+            w = max(len(str(fn)) for fn in d['files'])
+            s.append("")
+            s.append(f"{'File':{w}}  {'Lines':>9}  {'MB':>8}  {'Time(s)':>8}")
+            for fn, f in d['files'].items():
+                mb = f"{f['bytes'] / 1024 / 1024:8.1f}" if f['bytes'] is not None else f"{'-':>8}"
+                t = "  (cache)" if f['cached'] else ""
+                s.append(f"{str(fn):{w}}  {f['lines']:9}  {mb}  {f['time']:8.3f}{t}")
+
+        if d['commands']:
+            w = max(len(cmd) for cmd in d['commands'])
+            s.append("")
+            s.append(f"{'Command':{w}}  {'Lines':>9}  {'Time(s)':>8}  {'Tables':>6}  {'Rows':>9}  {'Cols':>4}  {'Mem(MB)':>8}")
+            for cmd, c in sorted(d['commands'].items(), key=lambda x: x[1]['time'], reverse=True):
+                s.append(f"{cmd:{w}}  {c['lines']:9}  {c['time']:8.3f}  {c.get('tables', 0):6}  {c.get('rows', 0):9}  "
+                         f"{c.get('cols', 0):4}  {c.get('nbytes', 0) / 1024 / 1024:8.2f}")
+        return "\n".join(s) + "\n"
@@ -0,0 +1,243 @@
+#
+#   aos_synth.py
+#
+#   ベンチマーク用の合成 tech-support ファイルを生成する
+#   - 乱数のシードを固定し、同じパラメータからは常に同じファイルを生成する
+#   - 生成するコマンド
+#       show ap database long
+#       show ap active
+#       show ap bss-table
+#       show user-table
+#       show datapath session dpi
+#       show datapath session verbose
+#       show ap monitor ap-list ap-name <AP>
+#
+#       python aos_synth.py --aps 1000 --sessions 100000 ts-synth.txt
+#
+
+import sys
+import random
+import argparse
+
+PROMPT = "(synth-md) #"
+
+SYNTH_CMDS = (
+    "show ap database long",
+    "show ap active",
+    "show ap bss-table",
+    "show user-table",
+    "show datapath session dpi",
+    "show datapath session verbose",
+    "show ap monitor ap-list",
+)
+
+_APPS = ('office365', 'teams', 'zoom', 'youtube', 'dns', 'ssl', 'http', 'google', 'webex', 'unknown')
+_SSIDS = ('corp', 'guest', 'iot', 'voice')
+_ROLES = ('authenticated', 'guest', 'employee', 'voice')
+_OSES = ('Win 10', 'iOS', 'Android', 'macOS', '')
+
+
+class _Table:
+    """
+    固定幅のテーブル出力. 列幅はヘッダと見本の値の長さから決める
+    """
+
+    def __init__(self, header, sample):
+        widths = [max(len(h), len(s)) + 2 for h, s in zip(header, sample)]
+        self.fmt = "".join("{:<%d}" % w for w in widths[:-1]) + "{}"
+        self.header = self.fmt.format(*header).rstrip()
+        self.sep = self.fmt.format(*["-" * len(h) for h in header]).rstrip()
+
+    def row(self, values):
+        return self.fmt.format(*values).rstrip()
+
+
+def _ip(net, i):
+    return f"{net}.{(i >> 8) & 0xff}.{i & 0xff}"
+
+
+def _mac(prefix, i):
+    return f"{prefix}:{(i >> 16) & 0xff:02x}:{(i >> 8) & 0xff:02x}:{i & 0xff:02x}"
+
+
+def _apname(i):
+    return f"AP-{i // 100 + 1:02d}F-{i % 100 + 1:03d}"
+
+
+def _radio(rnd, band, ch):
+    return f"AP:{band}-HE:{ch}/{rnd.choice((12, 15, 18))}.0/{rnd.choice((21, 23))}.0/{rnd.randrange(30)}"
+
+
+def generate(out, aps=1000, users=None, sessions=10000, monitor=10, seed=1):
+    '''
+    合成 tech-support を出力する
+    :param out: 出力先 (テキストファイルオブジェクト)
+    :param aps: AP 数
+    :param users: ユーザ数 (None の場合は AP 数 x 10)
+    :param sessions: datapath session 数 (dpi, verbose それぞれ)
+    :param monitor: show ap monitor ap-list を出力する AP 数
+    :param seed: 乱数のシード
+    :return: 出力した行数
+    '''
+    rnd = random.Random(seed)
+    users = aps * 10 if users is None else users
+    nlines = 0
+
+    def write(lines):
+        nonlocal nlines
+        for line in lines:
+            out.write(line)
+            out.write("\n")
+            nlines += 1
+
+    def cmd(c, title=None):
+        write(["", PROMPT + c, ""])
+        if title:
+            write([title, "-" * len(title)])
+
+    write([PROMPT + "show version", "ArubaOS (MODEL: Synthetic), Version 8.10.0.0"])
+
+    # show ap database long
+    cmd("show ap database long", "AP Database")
+    hdr = ["Name", "Group", "AP Type", "IP Address", "Status", "Flags", "Switch IP", "Standby IP",
+           "Wired MAC Address", "Serial #", "Port", "FQLN", "Outer IP", "User"]
+    t = _Table(hdr, ["AP-00F-000", "group-00", "535", "10.100.255.255", "Up 10d:23h:59m:59s", "2",
+                     "10.0.0.1", "0.0.0.0", "00:00:00:00:00:00", "CNAAAA0000", "N/A", "N/A", "N/A", ""])
+    write([t.header, t.sep])
+    for i in range(aps):
+        status = f"Up {rnd.randrange(100)}d:{rnd.randrange(24)}h:{rnd.randrange(60)}m:{rnd.randrange(60)}s" if rnd.random() < 0.97 else "Down"
+        write([t.row([_apname(i), f"group-{i // 200:02d}", rnd.choice(("535", "635", "655")), _ip("10.100", i),
+                      status, "", "10.0.0.1", "0.0.0.0", _mac("20:4c:03", i), f"CNAA{i:06d}", "N/A", "N/A", "N/A", ""])])
+    write(["", "Flags: 2 = Using IKE version 2", f"Total APs:{aps}"])
+
+    # show ap active
+    cmd("show ap active", "Active AP Table")
+    hdr = ["Name", "Group", "IP Address", "11g Clients", "11a Clients", "AP Type", "Flags", "Uptime", "Outer IP"] + \
+          [f"Radio {n} Band Ch/EIRP/MaxEIRP/Clients" for n in range(3)]
+    t = _Table(hdr, ["AP-00F-000", "group-00", "10.100.255.255", "999", "999", "655", "2", "10d:23h:59m:59s", "N/A"] +
+               ["AP:5GHz-HE:149E/18.0/23.0/99"] * 3)
+    write([t.header, t.sep])
+    for i in range(aps):
+        r0 = _radio(rnd, "5GHz", rnd.choice(("36E", "44E", "52E", "100E", "149E")))
+        r1 = _radio(rnd, "2.4GHz", rnd.choice(("1", "6", "11")))
+        r2 = _radio(rnd, "6GHz", rnd.choice(("5", "21", "37"))) if i % 3 == 0 else ""
+        write([t.row([_apname(i), f"group-{i // 200:02d}", _ip("10.100", i), str(rnd.randrange(30)), str(rnd.randrange(60)),
+                      "655", "2", f"{rnd.randrange(100)}d:{rnd.randrange(24)}h", "N/A", r0, r1, r2])])
+    write(["", f"Total APs:{aps}"])
+
+    # show ap bss-table
+    cmd("show ap bss-table", "Aruba AP BSS Table")
+    hdr = ["bss", "ess", "port", "ip", "phy", "type", "ch/EIRP/max-EIRP", "cur-cl", "ap name", "in-t(s)", "tot-t", "mtu",
+           "acl-state", "acl", "fm", "srcip"]
+    t = _Table(hdr, ["00:00:00:00:00:00", "guest-0000", "?/?", "10.100.255.255", "a-HE", "ap", "149E/18.0/23.0", "99",
+                     "AP-00F-000", "0", "10d:23h:59m:59s", "1500", "-", "-", "T", "0.0.0.0"])
+    write([t.header, t.sep])
+    for i in range(aps):
+        for n, ess in enumerate(_SSIDS[:2]):
+            write([t.row([_mac("20:4c:0%d" % n, i), ess, "?/?", _ip("10.100", i), "a-HE", "ap", "36E/18.0/23.0",
+                          str(rnd.randrange(30)), _apname(i), "0", f"{rnd.randrange(100)}d:{rnd.randrange(24)}h:0m:0s",
+                          "1500", "-", "-", "T", "0.0.0.0"])])
+    write(["", "Channel followed by \"*\" indicates channel selected due to unsupported configured channel."])
+
+    # show user-table
+    cmd("show user-table", "Users")
+    hdr = ["IP", "MAC", "Name", "Role", "Age(d:h:m)", "Auth", "VPN link", "AP name", "Roaming", "Essid/Bssid/Phy",
+           "Profile", "Forward mode", "Type", "Host Name", "User Type"]
+    t = _Table(hdr, ["10.200.255.255", "00:00:00:00:00:00", "user00000000", "authenticated", "00:00:00", "802.1x", "",
+                     "AP-00F-000", "Wireless", "guest/00:00:00:00:00:00/5GHz-HE-2ss", "default-dot1x", "tunnel",
+                     "Android", "host-00000000", "WIRELESS"])
+    write([t.header, t.sep])
+    for i in range(users):
+        ap = rnd.randrange(max(aps, 1))
+        ess = rnd.choice(_SSIDS)
+        write([t.row([_ip("10.200", i), _mac("f2:00:00", i), f"user{i}", rnd.choice(_ROLES),
+                      f"00:{rnd.randrange(24):02d}:{rnd.randrange(60):02d}", "802.1x", "", _apname(ap), "Wireless",
+                      f"{ess}/{_mac('20:4c:00', ap)}/5GHz-HE-2ss", "default-dot1x", "tunnel", rnd.choice(_OSES),
+                      f"host-{i}", "WIRELESS"])])
+    write(["", f"User Entries: {users}/{users}"])
+
+    # show datapath session dpi / verbose
+    def session():
+        sip = _ip("10.200", rnd.randrange(max(users, 1)))
+        dip = f"{rnd.choice((13, 20, 52, 142, 172, 224))}.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(1, 255)}"
+        prot = rnd.choice(("6", "6", "6", "17", "17", "47"))
+        pkts = rnd.randrange(100000)
+        return [sip, dip, prot, str(rnd.randrange(1024, 65536)), rnd.choice(("443", "80", "53", "8801", "3478")),
+                "0/0", "0", "0", str(rnd.randrange(4)), f"tunnel {rnd.randrange(100)}", f"{rnd.randrange(0x10000):x}",
+                str(pkts), str(pkts * rnd.randrange(60, 1500))]
+
+    cmd("show datapath session dpi", "Datapath Session Table Entries")
+    write(["", "Flags: F - fast age, S - src NAT, N - dest NAT", ""])
+    hdr = ["Source IP or MAC", "Destination IP", "Prot", "SPort", "Dport", "Cntr", "Prio", "ToS", "Age", "Destination",
+           "TAge", "Packets", "Bytes", "Flags", "CPU ID", "AppID"]
+    t = _Table(hdr, ["255.255.255.255", "255.255.255.255", "47", "65535", "65535", "0/0", "0", "0", "3", "tunnel 100",
+                     "ffff", "9999999999", "9999999999", "FCI", "99", "office365 [1234]"])
+    write([t.header, t.sep])
+    for i in range(sessions):
+        app = rnd.choice(_APPS)
+        write([t.row(session() + [rnd.choice(("F", "FC", "FCI", "FY")), str(rnd.randrange(16)), f"{app} [{_APPS.index(app) + 1}]"])])
+    write(["", f"Total sessions: {sessions}"])
+
+    cmd("show datapath session verbose", "Datapath Session Table Entries")
+    write(["", "Flags: F - fast age, S - src NAT, N - dest NAT", ""])
+    hdr = ["Source IP", "Destination IP", "Prot", "SPort", "Dport", "Cntr", "Prio", "ToS", "Age", "Destination", "TAge",
+           "Packets", "Bytes", "UplinkVlan", "DstVlan", "InPkts", "InBytes", "OutPkts", "OutBytes", "CPU ID", "Flags"]
+    t = _Table(hdr, ["255.255.255.255", "255.255.255.255", "47", "65535", "65535", "0/0", "0", "0", "3", "tunnel 100",
+                     "ffff", "9999999999", "9999999999", "4094", "4094", "9999999999", "9999999999", "9999999999",
+                     "9999999999", "99", "FCI"])
+    write([t.header, t.sep])
+    for i in range(sessions):
+        r = session()
+        write([t.row(r + ["1", "1", r[11], r[12], "0", "0", str(rnd.randrange(16)), rnd.choice(("F", "FC", "FCI"))])])
+    write(["", f"Total sessions: {sessions}"])
+
+    # show ap monitor ap-list
+    hdr = ["bssid", "essid", "band/chan/ch-width/ht-type", "ap-type", "phy-type", "dos", "dt/mt", "ut/it", "encr",
+           "nstas", "avg-snr", "curr-snr", "avg-rssi", "curr-rssi", "wmacs", "ibss"]
+    t = _Table(hdr, ["00:00:00:00:00:00(+)", "guest-0000", "5GHz/149E/80MHz/HE", "interfering", "80211-HE-80MHz",
+                     "disable", "999/0", "0/0", "wpa3-sae-aes", "99", "99", "99", "-99", "-99", "0", "no"])
+    for i in range(min(monitor, aps)):
+        cmd(f"show ap monitor ap-list ap-name {_apname(i)}", "Monitored AP Table")
+        write([t.header, t.sep])
+        for n in range(30):
+            ap = (i + n) % aps
+            snr = rnd.randrange(5, 60)
+            write([t.row([_mac("20:4c:00", ap) + ("(+)" if n == 0 else ""), rnd.choice(_SSIDS),
+                          f"5GHz/{rnd.choice(('36E', '44E', '149E'))}/80MHz/HE", "valid" if n % 3 else "interfering",
+                          "80211-HE-80MHz", "disable", "10/0", "0/0", "wpa2-8021x-aes", str(rnd.randrange(20)),
+                          str(snr), str(snr), str(snr - 95), str(snr - 95), "0", "no"])])
+        write(["", "Num APs:30"])
+
+    write(["", PROMPT + "show clock", "Mon Jan  1 00:00:00.000 2024 UTC"])
+    return nlines
+
+
+def write_techsupport(fn, **kwargs):
+    '''
+    合成 tech-support をファイルに書き出す (引数は generate() と同じ)
+    :return: 出力した行数
+    '''
+    with open(fn, "w", encoding="utf-8") as f:
+        return generate(f, **kwargs)
+
+
+#
+#   main
+#
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic tech-support file for parser benchmarks")
+    parser.add_argument('outfile', help="Output file ('-' for stdout)", type=str)
+    parser.add_argument('--aps', help='Number of APs', type=int, default=1000)
+    parser.add_argument('--users', help='Number of users (default: APs x 10)', type=int)
+    parser.add_argument('--sessions', help='Number of datapath sessions', type=int, default=10000)
+    parser.add_argument('--monitor', help='Number of APs with show ap monitor ap-list output', type=int, default=10)
+    parser.add_argument('--seed', help='Random seed', type=int, default=1)
+    args = parser.parse_args()
+
+    opts = dict(aps=args.aps, users=args.users, sessions=args.sessions, monitor=args.monitor, seed=args.seed)
+    if args.outfile == '-':
+        n = generate(sys.stdout, **opts)
+    else:
+        n = write_techsupport(args.outfile, **opts)
+    print(f"{n} lines written.", file=sys.stderr)
@@ -0,0 +1,327 @@
+#
+#   aos_table.py
+#
+#   列指向のテーブル (AOSParser(columnar=True) で使用)
+#   - 列ごとに 1 つの配列に値を格納する
+#   - 種類の少ない文字列の列 (AP Group, ESSID, Flags, AppID など) は辞書エンコード
+#   - 整数のみの列は array('q') に格納
+#   - 型付きの列 (AOSParser(typed=True)) は数値のまま array('q') / array('d') に格納
+#   - 行アクセスは list を返すビューで、従来の 2 次元配列と同様に扱える
+#       tbl[0]      ヘッダ行
+#       tbl[1:]     行のビュー (イテレート時に 1 行ずつ list を生成)
+#     行は読み取り専用 (返された list を書き換えてもテーブルには反映されない)
+#
+
+import re
+import sys
+from array import array
+from collections.abc import Sequence
+
+_INT_PAT = re.compile(r'-?(?:0|[1-9][0-9]{0,17})\Z')     # int64 に収まる正規形の整数
+_NUM_TYPECODES = {'int': 'q', 'float': 'd'}
+
+
+def _code_typecode(n):
+    '''
+    n 種類の値を表せる最小の配列型
+    '''
+    if n <= 0x100:
+        return 'B'
+    if n <= 0x10000:
+        return 'H'
+    return 'I'
+
+
+class _DictColumn:
+    """
+    辞書エンコードした文字列の列
+    """
+    kind = 'dict'
+
+    def __init__(self, values=(), codes=None):
+        self.values = list(values)          # code -> 文字列
+        self.lookup = {v: i for i, v in enumerate(self.values)}
+        self.codes = codes if codes is not None else array('I')
+
+    def append(self, v):
+        code = self.lookup.get(v)
+        if code is None:
+            code = len(self.values)
+            self.lookup[v] = code
+            self.values.append(v)
+            if code >= 1 << (8 * self.codes.itemsize):
+                self.codes = array('I', self.codes)
+        self.codes.append(code)
+
+    def get(self, i):
+        return self.values[self.codes[i]]
+
+    def __iter__(self):
+        values = self.values
+        return (values[c] for c in self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def take(self, rows):
+        codes = self.codes
+        return _DictColumn(self.values, array(codes.typecode, [codes[i] for i in rows]))
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + sum(sys.getsizeof(v) for v in self.values)
+
+    def __getstate__(self):
+        return (self.values, self.codes)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+class _IntColumn:
+    """
+    整数の列. 文字列としてアクセスされた場合は str に変換して返す
+    """
+    kind = 'int'
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else array('q')
+
+    def append(self, v):
+        if not _INT_PAT.match(v):
+            raise ValueError(f"not an integer: {v!r}")
+        self.data.append(int(v))
+
+    def get(self, i):
+        return str(self.data[i])
+
+    def __iter__(self):
+        return map(str, self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def take(self, rows):
+        data = self.data
+        return _IntColumn(array('q', [data[i] for i in rows]))
+
+    def nbytes(self):
+        return self.data.itemsize * len(self.data)
+
+
+class _StrColumn:
+    """
+    種類の多い文字列の列 (IP アドレス、MAC アドレスなど)
+    """
+    kind = 'str'
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else []
+
+    def append(self, v):
+        self.data.append(v)
+
+    def get(self, i):
+        return self.data[i]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def take(self, rows):
+        data = self.data
+        return _StrColumn([data[i] for i in rows])
+
+    def nbytes(self):
+        return 8 * len(self.data) + sum(sys.getsizeof(v) for v in set(self.data))
+
+
+class _NumColumn:
+    """
+    型付きの数値の列 (int: array('q'), float: array('d')). 値は数値のまま返す. 欠損値は None
+    """
+    kind = 'num'
+
+    def __init__(self, typecode='q', data=None, missing=None):
+        self.data = data if data is not None else array(typecode)
+        self.missing = missing if missing is not None else set()     # 値が None の行
+
+    def append(self, v):
+        if v is None:
+            self.missing.add(len(self.data))
+            v = 0
+        self.data.append(v)
+
+    def get(self, i):
+        if self.missing and i in self.missing:
+            return None
+        return self.data[i]
+
+    def __iter__(self):
+        if not self.missing:
+            return iter(self.data)
+        return (self.get(i) for i in range(len(self.data)))
+
+    def __len__(self):
+        return len(self.data)
+
+    def take(self, rows):
+        data = self.data
+        missing = self.missing
+        return _NumColumn(data.typecode, array(data.typecode, [data[i] for i in rows]),
+                          {j for j, i in enumerate(rows) if i in missing} if missing else None)
+
+    def nbytes(self):
+        return self.data.itemsize * len(self.data)
+
+
+def _compact_column(col):
+    '''
+    辞書エンコードで構築した列を、値に応じて適切な形式に変換する
+    '''
+    if col.kind != 'dict' or len(col) == 0:
+        return col
+    values = col.values
+    if all(_INT_PAT.match(v) for v in values):
+        ints = [int(v) for v in values]
+        return _IntColumn(array('q', [ints[c] for c in col.codes]))
+    if len(values) * 2 > len(col):
+        return _StrColumn(list(col))
+    return _DictColumn(values, array(_code_typecode(len(values)), col.codes))
+
+
+class ColumnTable:
+    """
+    列指向テーブル. 2 次元配列 (ヘッダ行 + 行の配列) と互換のアクセスを提供する
+    """
+
+    def __init__(self, header, cols=None, nrows=0, types=None):
+        '''
+        :param header: ヘッダ行
+        :param cols: 列の配列 (省略時は空の列)
+        :param nrows: 行数
+        :param types: 各列の型 ('int', 'float' または None (文字列)) の配列. cols 省略時に使用
+        '''
+        self.header = list(header)
+        if cols is None:
+            types = types or [None] * len(self.header)
+            cols = [_NumColumn(_NUM_TYPECODES[t]) if t in _NUM_TYPECODES else _DictColumn() for t in types]
+        self.cols = cols
+        self.nrows = nrows
+
+    def append(self, row):
+        cols = self.cols
+        if len(row) != len(cols):
+            raise ValueError(f"Num of columns does not match: {len(row)} vs {len(cols)}")
+        for j, v in enumerate(row):
+            try:
+                cols[j].append(v)
+            except ValueError:
+                # 整数列に整数以外の値が追加された. 辞書エンコードに戻す
+                col = _DictColumn()
+                for x in cols[j]:
+                    col.append(x)
+                col.append(v)
+                cols[j] = col
+        self.nrows += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def compact(self):
+        '''
+        各列を整数配列 / 辞書エンコード / 文字列配列のいずれかに変換する.
+        テーブルの構築完了時 (コマンドのパース完了時) に呼ばれる
+        '''
+        self.cols = [_compact_column(c) for c in self.cols]
+
+    def row(self, i):
+        '''
+        i 番目のデータ行 (0 起点) を list で返す
+        '''
+        return [c.get(i) for c in self.cols]
+
+    def column(self, j):
+        '''
+        j 番目の列の値のイテレータ
+        '''
+        return iter(self.cols[j])
+
+    def iter_cols(self, *idx):
+        '''
+        指定した列のみを行ごとに返すイテレータ. 列が 1 つの場合は値そのものを返す
+        '''
+        if len(idx) == 1:
+            return self.column(idx[0])
+        return map(list, zip(*[self.cols[j] for j in idx]))
+
+    def set_column(self, j, value):
+        '''
+        j 番目の列の値をすべて value にする
+        '''
+        self.cols[j] = _DictColumn([value], array('B', bytes(self.nrows)))
+
+    def take(self, rows):
+        '''
+        指定した行 (0 起点) のみからなる新しいテーブルを返す
+        '''
+        rows = list(rows)
+        return ColumnTable(self.header, [c.take(rows) for c in self.cols], len(rows))
+
+    def nbytes(self):
+        '''
+        おおよそのメモリ使用量 (bytes)
+        '''
+        return sum(c.nbytes() for c in self.cols)
+
+    def __len__(self):
+        return self.nrows + 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self.nrows + 1)
+            if start == 0 or step < 0:
+                return [self[j] for j in range(start, stop, step)]     # ヘッダを含む場合は list を返す
+            return _RowsView(self, start - 1, stop - 1, step)
+        if i < 0:
+            i += self.nrows + 1
+        if i == 0:
+            return self.header
+        if not 0 < i <= self.nrows:
+            raise IndexError("table index out of range")
+        return self.row(i - 1)
+
+    def __iter__(self):
+        yield self.header
+        yield from _RowsView(self, 0, self.nrows, 1)
+
+    def __repr__(self):
+        return f"<ColumnTable {len(self.header)} cols x {self.nrows} rows>"
+
+
+class _RowsView(Sequence):
+    """
+    ColumnTable の行範囲のビュー (tbl[1:] など). 行はアクセス時に生成する
+    """
+
+    def __init__(self, tbl, start, stop, step):
+        self.tbl = tbl
+        self.range = range(start, max(start, stop), step)
+
+    def __len__(self):
+        return len(self.range)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            r = self.range[i]
+            return _RowsView(self.tbl, r.start, r.stop, r.step)
+        return self.tbl.row(self.range[i])
+
+    def __iter__(self):
+        cols = self.tbl.cols
+        r = self.range
+        if r.step == 1 and r.start == 0 and r.stop == self.tbl.nrows:
+            return map(list, zip(*cols))
+        return (self.tbl.row(i) for i in r)
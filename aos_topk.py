@@ -0,0 +1,121 @@
+#
+#   aos_topk.py
+#
+#   上位 N 件 (top-N) の集計
+#   - TopK はヒープで上位 n 件のみを保持する. 行を 1 件ずつ push() し、全件をリストに溜めずに
+#     O(件数 log n) の時間, O(n) のメモリで上位 n 件を求める (AOSParser.iter_rows() などのストリームから直接集計できる)
+#   - 値が同じ場合は先に push() した方を上位とする (sorted(..., reverse=True) と同じ順)
+#   - merge() で別の TopK (別ファイル・別プロセスの集計結果) を結合できる.
+#     key 関数を使わない TopK は pickle できるため、ワーカープロセスから結果を返せる
+#   - top_items() は dict (名前 -> 件数 など) の値の大きい順に上位 n 件を返す
+#
+#       top = TopK(20, key=lambda r: r[7])
+#       for row in AOSParser.iter_rows(files, cmd, typed=True):
+#           top.push(row)
+#       for row in top:
+#           print(row)
+#
+#       for apn, n in top_items(apnctr, 10):
+#           print(f"{apn}: {n}")
+#
+
+import heapq
+
+
+class TopK:
+    '''
+    値の大きい順に上位 n 件を保持する
+    '''
+    def __init__(self, n, key=None):
+        '''
+        :param n: 保持する件数 (None の場合は全件)
+        :param key: 要素から値を求める関数 (None の場合は push() で値を指定する)
+        '''
+        if n is not None and n < 0:
+            raise ValueError(f"n must be >= 0: {n}")
+        self.n = n
+        self.key = key
+        self.count = 0          # push() した件数
+        self.heap = []          # (値, -順番, 要素) の min-heap. 先頭が最下位 (値が同じ場合は後から push() した方)
+
+    def push(self, item, value=None):
+        '''
+        要素を追加する
+        :param item: 要素
+        :param value: 値 (省略した場合は key(item))
+        '''
+        if value is None:
+            value = self.key(item) if self.key is not None else item
+        entry = (value, -self.count, item)
+        self.count += 1
+        if self.n is None or len(self.heap) < self.n:
+            heapq.heappush(self.heap, entry)
+        elif self.n > 0 and entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def extend(self, items):
+        '''
+        要素をまとめて追加する
+        :return: self
+        '''
+        for item in items:
+            self.push(item)
+        return self
+
+    def merge(self, other):
+        '''
+        別の TopK の要素を追加する. other の要素は self の全要素より後に push() したものとして扱う
+        (ファイルごと・ワーカーごとの TopK を入力の順に merge() すると、全件を 1 つの TopK に push() した場合と同じ結果)
+        :return: self
+        '''
+        base = self.count
+        for value, seq, item in sorted(other.heap, key=lambda e: -e[1]):
+            entry = (value, seq - base, item)
+            if self.n is None or len(self.heap) < self.n:
+                heapq.heappush(self.heap, entry)
+            elif self.n > 0 and entry[:2] > self.heap[0][:2]:
+                heapq.heapreplace(self.heap, entry)
+        self.count += other.count
+        return self
+
+    def __getstate__(self):
+        if self.key is not None:
+            # lambda などは pickle できないため、ワーカーでは key を使わずに push(item, value) で値を指定する
+            raise TypeError("TopK with a key function cannot be pickled; use push(item, value) instead")
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def scored(self):
+        '''
+        :return: (値, 要素) のリスト (値の大きい順)
+        '''
+        return [(value, item) for value, _, item in sorted(self.heap, reverse=True, key=lambda e: e[:2])]
+
+    def items(self):
+        '''
+        :return: 要素のリスト (値の大きい順)
+        '''
+        return [item for _, item in self.scored()]
+
+    def __iter__(self):
+        return iter(self.items())
+
+    def __len__(self):
+        return len(self.heap)
+
+
+def top_items(d, n=None):
+    '''
+    dict の値の大きい順に上位 n 件を返す. 値が同じ場合は dict の順
+    :param d: dict (キー -> 件数 など)
+    :param n: 件数 (None の場合は全件)
+    :return: (キー, 値) のリスト
+    '''
+    if n is None or n >= len(d):
+        return sorted(d.items(), key=lambda kv: kv[1], reverse=True)
+    top = TopK(n)
+    for k, v in d.items():
+        top.push(k, v)
+    return [(k, v) for v, k in top.scored()]
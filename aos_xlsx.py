@@ -0,0 +1,282 @@
+#
+#   aos_xlsx.py
+#
+#   Excel (.xlsx) 書き出しの共通処理
+#   - openpyxl の write-only モードで 1 行ずつストリーミングで書き出す (全セルをメモリに保持しない)
+#   - スタイルは列ごと・行の帯 (ストライプ) ごとに 1 回だけ作成し、各セルはその参照を持つ
+#     (セルごとに Font / PatternFill を作成・設定するループは不要)
+#   - 各スクリプトの書式を STYLES のプリセットにまとめている
+#       green   ヘッダ Calibri 11 bold 白文字 / 70AD47, データ Consolas, 奇数行 e2efda のストライプ
+#       blue    ヘッダ Arial 9 bold / BDD7EE, データ Consolas
+#       plain   ヘッダもデータと同じフォント, 背景色なし
+#   - ヘッダ行の固定 (freeze panes) とオートフィルタは既定で設定する
+#   openpyxl が必要 (XlsxBook の作成時に import する)
+#
+#       book = XlsxBook("coch-aps.xlsx")
+#       sheet = book.add_sheet(header, style='green', widths=[30, 40, 10], col_align={'C': 'center'})
+#       for row in tbl:
+#           sheet.append(row)
+#       book.save()
+#
+#       write_xlsx("ap-list.xlsx", header, rows, widths=[25, 30, 10])      # 1 シートの場合
+#
+
+STYLES = {
+    'green': {
+        'header_font': {'name': 'Calibri', 'bold': True, 'size': 11, 'color': 'FFFFFF'},
+        'header_fill': '70AD47',
+        'font': {'name': 'Consolas'},
+        'stripe': 'e2efda',
+    },
+    'blue': {
+        'header_font': {'name': 'Arial', 'bold': True, 'size': 9},
+        'header_fill': 'BDD7EE',
+        'font': {'name': 'Consolas'},
+        'stripe': None,
+    },
+    'plain': {
+        'header_font': None,        # None: データと同じフォント
+        'header_fill': None,
+        'font': None,
+        'stripe': None,
+    },
+}
+
+
+def _openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("openpyxl is required to write Excel files (pip install openpyxl)")
+    return openpyxl
+
+
+def col_index(col):
+    '''
+    列の指定 (0 始まりの番号 または 'A', 'B', ... の列名) を 0 始まりの番号にする
+    '''
+    if isinstance(col, int):
+        return col
+    from openpyxl.utils import column_index_from_string
+    return column_index_from_string(col) - 1
+
+
+def _key(d):
+    '''
+    Font / Alignment の引数 (dict) を辞書のキーにできる tuple にする
+    '''
+    return tuple(sorted(d.items())) if d else ()
+
+
+def _merge(key, d):
+    '''
+    _key() の tuple に引数 d を上書きした tuple を返す
+    '''
+    if not d:
+        return key
+    m = dict(key)
+    m.update(d)
+    return _key(m)
+
+
+def _align_args(a):
+    '''
+    Alignment の引数. 文字列の場合は horizontal とみなす ('center' など)
+    '''
+    return {'horizontal': a} if isinstance(a, str) else a
+
+
+def _by_index(d, func=None):
+    '''
+    列の指定をキーとする dict を 0 始まりの番号をキーとする dict にする
+    '''
+    if not d:
+        return {}
+    return {col_index(c): (func(v) if func else v) for c, v in d.items()}
+
+
+class XlsxBook:
+    '''
+    write-only の Workbook. シートを追加し、行を書き込んだ後 save() で保存する
+    '''
+    def __init__(self, fn):
+        '''
+        :param fn: 出力ファイル名
+        '''
+        openpyxl = _openpyxl()
+        from openpyxl.cell import Cell
+        self.fn = fn
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.sheets = []
+        self._cell = Cell
+        self._styles = {}       # (font, fill, alignment) -> StyleArray
+
+    def style(self, ws, font=(), fill=None, align=()):
+        '''
+        スタイルを作成する (スタイルは Workbook 単位のため、同じ組み合わせは全シートで 1 回だけ作成する)
+        :param ws: このブックのシート
+        :param font: Font の引数 (_key() の tuple)
+        :param fill: 背景色 (None の場合はなし)
+        :param align: Alignment の引数 (_key() の tuple)
+        :return: セルの style_array
+        '''
+        key = (font, fill, align)
+        arr = self._styles.get(key)
+        if arr is None:
+            from openpyxl.styles import Font, PatternFill, Alignment
+            tmpl = self._cell(ws)
+            if font:
+                tmpl.font = Font(**dict(font))
+            if fill:
+                tmpl.fill = PatternFill(fgColor=fill, fill_type='solid')
+            if align:
+                tmpl.alignment = Alignment(**dict(align))
+            arr = self._styles[key] = tmpl._style
+        return arr
+
+    def add_sheet(self, header, title=None, style='blue', widths=None, freeze='A2', autofilter=True,
+                  align=None, col_align=None, col_fonts=None, header_align=None, header_fills=None, **opts):
+        '''
+        シートを追加し、ヘッダ行を書き込む
+        :param header: 列名のリスト (None の場合はヘッダ行なし)
+        :param title: シート名
+        :param style: STYLES のプリセット名
+        :param widths: 列幅 (A 列からのリスト または 列 -> 幅 の dict)
+        :param freeze: 固定するセル ('A2' でヘッダ行を固定. None の場合は固定しない)
+        :param autofilter: ヘッダの全列にオートフィルタを設定する
+        :param align: データ行の全列の Alignment の引数 (dict)
+        :param col_align: 列 -> Alignment の引数 (dict または horizontal の文字列). align に上書き
+        :param col_fonts: 列 -> データ行の Font の引数. プリセットの font に上書き
+        :param header_align: 列 -> ヘッダの Alignment の引数
+        :param header_fills: 列 -> ヘッダの背景色
+        :param opts: プリセットの値の上書き (header_font, header_fill, font, stripe)
+        :return: XlsxSheet
+        '''
+        preset = dict(STYLES[style])
+        for k, v in opts.items():
+            if k not in preset:
+                raise TypeError(f"Unknown style option: {k}")
+            preset[k] = v
+        sheet = XlsxSheet(self, self.wb.create_sheet(title), preset, align,
+                          _by_index(col_align, _align_args), _by_index(col_fonts))
+        sheet.ws_setup(header, widths, freeze, autofilter,
+                       _by_index(header_align, _align_args), _by_index(header_fills))
+        self.sheets.append(sheet)
+        return sheet
+
+    def save(self):
+        self.wb.save(self.fn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.save()
+        return False
+
+
+class XlsxSheet:
+    '''
+    XlsxBook.add_sheet() で作成するシート. append() で 1 行ずつ書き出す
+    '''
+    def __init__(self, book, ws, preset, align, col_align, col_fonts):
+        self.book = book
+        self.ws = ws
+        self.rows = 0               # 書き込んだデータ行の数 (ヘッダを除く)
+        self.font = _key(preset['font'])
+        self.stripe = preset['stripe']
+        self.preset = preset
+        self.align = _key(align)
+        self.col_align = col_align
+        self.col_fonts = col_fonts
+        self.specs = []             # 列ごとの (font, alignment)
+        self.bands = ([], [])       # 列ごとの style_array (通常の行, ストライプの行)
+
+    def ws_setup(self, header, widths, freeze, autofilter, header_align, header_fills):
+        '''
+        列幅, 固定, オートフィルタを設定し、ヘッダ行を書き込む (write-only のシートは行の書き込み前に設定する)
+        '''
+        from openpyxl.utils import get_column_letter
+        if widths:
+            items = widths.items() if isinstance(widths, dict) else enumerate(widths)
+            for c, w in items:
+                self.ws.column_dimensions[get_column_letter(col_index(c) + 1)].width = w
+        if freeze:
+            self.ws.freeze_panes = freeze
+        if not header:
+            return
+        if autofilter:
+            self.ws.auto_filter.ref = "A:" + get_column_letter(len(header))
+        self._columns(len(header))
+
+        p = self.preset
+        font = _key(p['header_font']) if p['header_font'] is not None else self.font
+        cells = []
+        for j, v in enumerate(header):
+            arr = self.book.style(self.ws, font, header_fills.get(j, p['header_fill']), _key(header_align.get(j)))
+            cells.append(self.book._cell(self.ws, 1, 1, v, arr))
+        self.ws.append(cells)
+
+    def _columns(self, n):
+        '''
+        n 列目までの列ごとのスタイルを作成する
+        '''
+        for j in range(len(self.specs), n):
+            font = _merge(self.font, self.col_fonts.get(j))
+            align = _merge(self.align, self.col_align.get(j))
+            self.specs.append((font, align))
+            self.bands[0].append(self.book.style(self.ws, font, None, align))
+            self.bands[1].append(self.book.style(self.ws, font, self.stripe, align))
+
+    def append(self, row, fills=None, bold=None):
+        '''
+        データ行を書き込む
+        :param row: 値のリスト ('=' で始まる文字列は数式)
+        :param fills: 列 -> 背景色 (このセルのみ. ストライプより優先)
+        :param bold: True の場合は行全体、列のリストの場合はその列を太字にする
+        '''
+        if len(row) > len(self.specs):
+            self._columns(len(row))
+        striped = self.stripe is not None and not self.rows & 1      # データ行の 1, 3, 5, ... 行目
+        band = self.bands[striped]
+        Cell = self.book._cell
+        ws = self.ws
+        if not fills and not bold:
+            cells = [Cell(ws, 1, 1, v, arr) for v, arr in zip(row, band)]     # 行・列は書き込み時に設定される
+        else:
+            fills = _by_index(fills)
+            bold = range(len(row)) if bold is True else {col_index(c) for c in bold or ()}
+            cells = []
+            for j, v in enumerate(row):
+                if j in fills or j in bold:
+                    font, align = self.specs[j]
+                    if j in bold:
+                        font = _merge(font, {'bold': True})
+                    fill = fills.get(j, self.stripe if striped else None)
+                    arr = self.book.style(self.ws, font, fill, align)
+                else:
+                    arr = band[j]
+                cells.append(Cell(ws, 1, 1, v, arr))
+        ws.append(cells)
+        self.rows += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+
+def write_xlsx(fn, header, rows, **kwargs):
+    '''
+    1 シートの Excel ファイルを書き出す
+    :param fn: ファイル名
+    :param header: 列名のリスト
+    :param rows: データ行のイテレータ
+    :param kwargs: XlsxBook.add_sheet() の引数
+    :return: 書き込んだデータ行の数
+    '''
+    book = XlsxBook(fn)
+    sheet = book.add_sheet(header, **kwargs)
+    sheet.extend(rows)
+    book.save()
+    return sheet.rows
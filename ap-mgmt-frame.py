@@ -8,12 +8,9 @@
 import sys
 import re
 import argparse
-import pandas as pd
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
+from aos_topk import top_items
 
 
 #
@@ -24,9 +21,12 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description="Parse show ap remote debug mgmt-frames and count deauths")
     parser.add_argument('infiles', help="Input file containing 'show ap monitor ap-list' output", type=str, nargs='+')
+    parser.add_argument('--top', help='Show top N reasons (default: all)', type=int, default=None)
     #parser.add_argument('outfile', help='Output Excel file', type=str, nargs='?', default='')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -76,14 +76,14 @@ if __name__ == '__main__':
                 auth_resp[rsn] = 1
 
     print("\n*** deauth reasons ***")
-    for rsn in sorted(deauth_reason.keys(), key=lambda x: deauth_reason[x], reverse=True):
-        print(f"{deauth_reason[rsn]:5}  {rsn}")
+    for rsn, ctr in top_items(deauth_reason, args.top):
+        print(f"{ctr:5}  {rsn}")
     print("\n*** auth responses ***")
-    for rsn in sorted(auth_resp.keys(), key=lambda x: auth_resp[x], reverse=True):
-        print(f"{auth_resp[rsn]:5}  {rsn}")
+    for rsn, ctr in top_items(auth_resp, args.top):
+        print(f"{ctr:5}  {rsn}")
     print("\n*** assoc responses ***")
-    for rsn in sorted(assoc_resp.keys(), key=lambda x: assoc_resp[x], reverse=True):
-        print(f"{assoc_resp[rsn]:5}  {rsn}")
+    for rsn, ctr in top_items(assoc_resp, args.top):
+        print(f"{ctr:5}  {rsn}")
     #for rsn,ctr in deauth_reason.items():
     #    print(f"{ctr:5}  {rsn}")
 
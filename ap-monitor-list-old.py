@@ -10,7 +10,7 @@ import re
 import argparse
 import pandas as pd
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
@@ -26,7 +26,9 @@ if __name__ == '__main__':
     parser.add_argument('infile', help="Input file containing 'show ap monitor ap-list' output", type=str, nargs=1)
     #parser.add_argument('outfile', help='Output Excel file', type=str, nargs='?', default='')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
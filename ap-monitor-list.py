@@ -11,7 +11,7 @@ import sys
 import re
 import argparse
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
 from collections import defaultdict
 from colorama import Fore, Style
 from utils import isintf
@@ -72,6 +72,7 @@ if __name__ == '__main__':
     parser.add_argument('infiles', help="Input file containing 'show ap monitor ap-list' output", type=str, nargs='+')
     #parser.add_argument('outfile', help='Output Excel file', type=str, nargs='?', default='')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('--band', '-b', help='Radio band', type=str, default='5')
     parser.add_argument('--summary', help='Summary only', action='store_true')
     parser.add_argument('--intfsummary', help='Summary only for interfering APs', action='store_true')
@@ -81,6 +82,7 @@ if __name__ == '__main__':
     parser.add_argument('--bssdic', '-d', help='Specify BSSID dictionary', type=str)
     parser.add_argument('--excel', help='Write interfering APs to Excel', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
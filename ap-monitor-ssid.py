@@ -10,7 +10,7 @@ import sys
 import re
 import argparse
 import mylogger as log
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 from collections import defaultdict
 
 SSIDnames = ["RHC", "RHC_GUEST"]
@@ -25,7 +25,9 @@ if __name__ == '__main__':
     parser.add_argument('infile', help="Input files(s) containing 'show ap monitor ap-list' output", type=str, nargs='+')
     #parser.add_argument('outfile', help='Output Excel file', type=str, nargs='?', default='')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -11,7 +11,7 @@ import argparse
 import sys
 import mylogger as log
 import pandas as pd
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 from collections import defaultdict
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl import Workbook
@@ -32,7 +32,9 @@ parser = argparse.ArgumentParser(
     description="Parse IAP/AOS10 AP tech-support and generate Excel file")
 parser.add_argument('infiles', help="Input file(s) containing 'show tech-support' output", type=str, nargs='+')
 parser.add_argument('--debug', help='Enable debug log', action='store_true')
+parser.add_argument('--profile', help='Print parser statistics', action='store_true')
 args = parser.parse_args()
+set_profile(args.profile)
 
 xlsfile = 'aplist.xlsx'
 
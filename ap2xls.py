@@ -11,21 +11,10 @@ import re
 import argparse
 import pandas as pd
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
+from aos_xlsx import write_xlsx
 from collections import defaultdict
 
-def uniq(tbl):
-    ret = []
-    k = set()
-    for r in tbl:
-        if r[0] in k: continue
-        k.add(r[0])
-        ret.append(r)
-    return ret
-
 def toi(s):
     try:
         return int(s)
@@ -43,8 +32,11 @@ if __name__ == '__main__':
     parser.add_argument('infile', help="Input file(s) containing 'show ap database long' and 'show ap active' output", type=str, nargs='+')
     parser.add_argument('outfile', help='Output Excel file', type=str, nargs='?', default='')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('--pattern', '-p', help='regex for AP name', type=str, default='.*')
+    parser.add_argument('--workers', '-j', help='Number of processes to parse input files in parallel', type=int, default=1)
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -60,19 +52,15 @@ if __name__ == '__main__':
     #   parse AP tables
     #
     print("Parsing files ... ", end="")
-    try:
-        aos = AOSParser(args.infile, [AP_DATABASE_LONG_TABLE], merge=True, encoding='utf-8')
-    except UnicodeDecodeError as e:
-        print(f'UTF-8 decode error. Trying MacRoman...')
-        aos = AOSParser(args.infile, [AP_DATABASE_LONG_TABLE], merge=True, encoding='macroman')
+    aos = AOSParser(args.infile, [AP_DATABASE_LONG_TABLE], merge=True, workers=args.workers)
 
-    ap_database_tbl = aos.get_table(AP_DATABASE_LONG_TABLE)
-    if ap_database_tbl is None:
+    if aos.get_table(AP_DATABASE_LONG_TABLE) is None:
         print("show ap database long output not found.")
         sys.exit(-1)
     print("done.")
 
-    ap_database_tbl = uniq(ap_database_tbl)
+    aos.dedup(AP_DATABASE_LONG_TABLE, 'Name')
+    ap_database_tbl = aos.get_table(AP_DATABASE_LONG_TABLE)
     print(f"{len(ap_database_tbl)-1} unique APs found in ap database.")
 
     #
@@ -112,35 +100,14 @@ if __name__ == '__main__':
     #
     #   Create Excel
     #
-    wb = Workbook()
-    ws = wb.active
-    for r in dataframe_to_rows(df, index=False, header=True):
-        ws.append(r)
-
-    f = Font(name='Consolas')
-    for row in ws.iter_rows(min_row=1):
-        for cell in row:
-            cell.font = f
-
     widths = [25, 30, 10, 20, 20, 13, 25]
-    for i,w in enumerate(widths):
-        ws.column_dimensions[chr(65+i)].width = w
-
-    f = Font(name='Arial', bold=True, size=9)
-    Ses = PatternFill(fgColor="BDD7EE", fill_type="solid")
-    for cell in ws['A1':'G1'][0]:
-        cell.fill = Ses
-        cell.font = f
-
-    ws.auto_filter.ref = "A:G"
-    ws.freeze_panes = "A2"
 
 
     #
     #   output to file
     #
     print(f"Writing to {xlsfile} ... ", end="")
-    wb.save(xlsfile)
+    write_xlsx(xlsfile, list(df.columns), df.values.tolist(), style='blue', widths=widths)
     print("done.")
 
     sys.exit(0)
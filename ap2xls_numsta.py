@@ -11,48 +11,10 @@ import re
 import argparse
 import pandas as pd
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
+from aos_xlsx import write_xlsx
 from collections import defaultdict
 
-def uniq(tbl):
-    ret = []
-    k = set()
-    for r in tbl:
-        if r[0] in k: continue
-        k.add(r[0])
-        ret.append(r)
-    return ret
-
-def uniq_aptbl(tbl):
-    # AP名が重複している場合、Radio 0/1/2 列に空欄が少ない方のエントリを選ぶ
-    idx_r0 = ap_active_tbl[0].index("Radio 0 Band Ch/EIRP/MaxEIRP/Clients")
-    idx_r1 = ap_active_tbl[0].index("Radio 1 Band Ch/EIRP/MaxEIRP/Clients")
-    try:
-        idx_r2 = ap_active_tbl[0].index("Radio 2 Band Ch/EIRP/MaxEIRP/Clients")
-    except ValueError:
-        idx_r2 = idx_r1
-    ret = []
-    k = set()
-    for r in tbl:
-        apn = r[0]
-        if apn in k:
-            for i, rr in enumerate(ret):
-                if rr[0] == apn:
-                    # どちらのエントリに空欄が少ないか比較
-                    cnt1 = sum(1 for x in r[idx_r0:idx_r2+1] if x != '')
-                    cnt2 = sum(1 for x in rr[idx_r0:idx_r2+1] if x != '')
-                    if cnt1 > cnt2:
-                        ret[i] = r
-                    break
-        else:
-            k.add(apn)
-            ret.append(r)
-    return ret
-
-
 def toi(s):
     try:
         return int(s)
@@ -76,8 +38,10 @@ if __name__ == '__main__':
     parser.add_argument('infile', help="Input file(s) containing 'show ap database long' and 'show ap active' output", type=str, nargs='+')
     parser.add_argument('outfile', help='Output Excel file', type=str, nargs='?', default='')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('--pattern', '-p', help='regex for AP name', type=str, default='.*')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -93,32 +57,24 @@ if __name__ == '__main__':
     #   parse AP tables
     #
     print("Parsing files ... ", end="")
+    aos = AOSParser(args.infile, [AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE], merge=True)
 
-    for enc in ('utf-8', 'shift-jis', 'mac-roman'):
-        try:
-            aos = AOSParser(args.infile, [AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE], merge=True, encoding=enc)
-        except UnicodeDecodeError as e:
-            print(f'{enc} decode error.')
-            continue
-        break   # decode success
-    else:
-        print("unknown encoding, abort.")
-        sys.exit(-1)
-
-    ap_database_tbl = aos.get_table(AP_DATABASE_LONG_TABLE)
-    ap_active_tbl   = aos.get_table(AP_ACTIVE_TABLE)
-    if ap_database_tbl is None:
+    if aos.get_table(AP_DATABASE_LONG_TABLE) is None:
         print("show ap database long output not found.")
         sys.exit(-1)
-    if ap_active_tbl is None:
+    if aos.get_table(AP_ACTIVE_TABLE) is None:
         print("show ap active output not found.")
         sys.exit(-1)
     print("done.")
 
-    ap_database_tbl = uniq(ap_database_tbl)
-    print(f"{len(ap_database_tbl)-1} unique APs found in ap database.")
-    ap_active_tbl = uniq_aptbl(ap_active_tbl)
-    print(f"{len(ap_active_tbl)-1} unique APs found in active ap table.")
+    n = aos.dedup(AP_DATABASE_LONG_TABLE, 'Name')
+    print(f"{n} unique APs found in ap database.")
+    # AP名が重複している場合、Radio 0/1/2 列に空欄が少ない方のエントリを選ぶ
+    radio_cols = [c for c in aos.get_table_header(AP_ACTIVE_TABLE) if re.match(r"Radio \d Band Ch/EIRP/MaxEIRP/Clients", c)]
+    n = aos.dedup(AP_ACTIVE_TABLE, 'Name', keep='fewest_blanks', by=radio_cols)
+    print(f"{n} unique APs found in active ap table.")
+    ap_database_tbl = aos.get_table(AP_DATABASE_LONG_TABLE)
+    ap_active_tbl   = aos.get_table(AP_ACTIVE_TABLE)
 
     #
     #   filter AP database table
@@ -246,35 +202,14 @@ if __name__ == '__main__':
     #
     #   Create Excel
     #
-    wb = Workbook()
-    ws = wb.active
-    for r in dataframe_to_rows(df, index=False, header=True):
-        ws.append(r)
-
-    f = Font(name='Consolas')
-    for row in ws.iter_rows(min_row=1):
-        for cell in row:
-            cell.font = f
-
     widths = [25, 30, 10, 20, 20,   15, 10, 10, 10,   15, 10, 10, 10,   15, 10, 10, 10,  13, 25]
-    for i,w in enumerate(widths):
-        ws.column_dimensions[chr(65+i)].width = w
-
-    f = Font(name='Arial', bold=True, size=9)
-    Ses = PatternFill(fgColor="BDD7EE", fill_type="solid")
-    for cell in ws['A1':'S1'][0]:
-        cell.fill = Ses
-        cell.font = f
-
-    ws.auto_filter.ref = "A:S"
-    ws.freeze_panes = "A2"
 
 
     #
     #   output to file
     #
     print(f"Writing to {xlsfile} ... ", end="")
-    wb.save(xlsfile)
+    write_xlsx(xlsfile, list(df.columns), df.values.tolist(), style='blue', widths=widths)
     print("done.")
 
     sys.exit(0)
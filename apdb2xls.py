@@ -6,7 +6,7 @@
 import sys
 import argparse
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, set_profile
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
 
@@ -20,7 +20,9 @@ if __name__ == '__main__':
     parser.add_argument('infile', help='input file containing show ap database long output', type=str, nargs=1)
     parser.add_argument('outfile', help='output Excel file', type=str, nargs='?', default='')
     parser.add_argument('--debug', help='enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
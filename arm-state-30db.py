@@ -10,7 +10,7 @@ import re
 import argparse
 import fileinput
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
 from collections import defaultdict
 
 # APpat = "^APKUDKS|^APSMFTM"
@@ -108,9 +108,11 @@ if __name__ == '__main__':
         description="Parse show ap tech and display neighbor APs")
     parser.add_argument('infile', help="Input file(s)", type=str, nargs='+')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('--pattern', '-p', help='reged for AP name', type=str, default='.*')
 
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
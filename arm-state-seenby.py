@@ -9,13 +9,10 @@ import re
 import argparse
 import fileinput
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
 from collections import defaultdict
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-import pandas as pd
 
+ARM_STATE_CMD = "show ap arm state"
 
 
 # Print iterations progress
@@ -75,9 +72,11 @@ if __name__ == '__main__':
     parser.add_argument('infile', help="Input file(s)", type=str)
     parser.add_argument('apname', help="AP name", type=str)
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('--band', '-b', help='Radio band', type=str, default='5')
     parser.add_argument('--pattern', '-p', help='regex for AP name', type=str, default='.*')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -88,23 +87,17 @@ if __name__ == '__main__':
     #   parse ap database and get apname -> ap model mapping
     #   identiry the encoding - utf-8, shift-jis, mac-roman
     #
-    for enc in ('utf-8', 'shift-jis', 'mac-roman'):
-        try:
-            aos = AOSParser(args.infile, [AP_DATABASE_LONG_TABLE], merge=True, encoding=enc)
-        except UnicodeDecodeError as e:
-            continue
-        break   # encode success
-    else:
-        print("unknown encoding, abort.")
-        sys.exit(-1)
+    #   show ap arm state も同じパースの対象にして、その範囲のエンコーディングも判定させる (aos.encodings)
+    #
+    aos = AOSParser(args.infile, [AP_DATABASE_LONG_TABLE, ARM_STATE_CMD], merge=True)
 
 
     #
     #   parse show ap arm state
     #
-    f = fileinput.input(args.infile, encoding=enc)
+    f = fileinput.input(args.infile, openhook=lambda fn, mode: open(fn, mode, encoding=aos.encodings.get(fn, 'utf-8'), errors='replace'))
     for l in f:
-        if l.startswith('show ap arm state'):
+        if l.startswith(ARM_STATE_CMD):
             break
     arm_state = []
     for l in f:
@@ -13,16 +13,14 @@ import re
 import argparse
 import fileinput
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
 from collections import defaultdict
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-import pandas as pd
+from aos_xlsx import write_xlsx
 from utils import isintf
 
 COV_SNR = 30
 xlsfile = "coch-aps.xlsx"
+ARM_STATE_CMD = "show ap arm state"
 
 
 def fln():
@@ -64,7 +62,6 @@ def parse_nbr_data(out, myapn, mych):
     global apn2model, apn2group
     global allctr, allitf
     global COV_SNR
-    global enc
 
     if not re.search(args.pattern, myapn):
         return
@@ -74,7 +71,7 @@ def parse_nbr_data(out, myapn, mych):
         return
 
     cmd = out[0].strip()
-    aos = AOSParser("".join(out), [cmd], encoding=enc)
+    aos = AOSParser("".join(out), [cmd])
     tbl = aos.get_table(cmd)
     if tbl is None or len(tbl) == 0:
         log.warn(fln() + f": No Neighbor Data found for AP {myapn}")
@@ -135,9 +132,11 @@ if __name__ == '__main__':
         description="Parse show ap tech and display neighbor APs")
     parser.add_argument('infile', help="Input file(s)", type=str, nargs='+')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('--pattern', '-p', help='Regex for AP name', type=str, default='.*')
     parser.add_argument('--band', '-b', help='Radio band', type=str, default='5')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -147,16 +146,9 @@ if __name__ == '__main__':
     #
     #   parse ap database and get apname -> ap model mapping
     #
-    enc = ""
-    for enc in ('utf-8', 'mac-roman'):
-        try:
-            aos = AOSParser(args.infile, [AP_DATABASE_LONG_TABLE], merge=True, encoding=enc)
-        except UnicodeDecodeError as e:
-            continue
-        break   # encode success
-    else:
-        print("unknown encoding, abort.")
-        sys.exit(-1)
+    #   show ap arm state も同じパースの対象にして、その範囲のエンコーディングも判定させる (aos.encodings)
+    #
+    aos = AOSParser(args.infile, [AP_DATABASE_LONG_TABLE, ARM_STATE_CMD], merge=True)
 
     ap_database_tbl = aos.get_table(AP_DATABASE_LONG_TABLE)
     if ap_database_tbl is None:
@@ -171,9 +163,9 @@ if __name__ == '__main__':
     #   parse show ap arm state
     #
 
-    f = fileinput.input(args.infile, encoding=enc)
+    f = fileinput.input(args.infile, openhook=lambda fn, mode: open(fn, mode, encoding=aos.encodings.get(fn, 'utf-8'), errors='replace'))
     for l in f:
-        if l.startswith('show ap arm state'):
+        if l.startswith(ARM_STATE_CMD):
             break
 
     print("AP Name,Group,Type,Channel,Neighbor AP,Coverage AP,Co-ch AP")
@@ -231,51 +223,15 @@ if __name__ == '__main__':
     #
     #   Excel 書き出し
     #
-    df = pd.DataFrame(tbl, columns=["AP Name", "Group", "Type", "Channel", "Neighbor AP", "Coverage AP", "Co-ch AP"])
-
-    wb = Workbook()
-    ws = wb.active
-    for r in dataframe_to_rows(df, index=False, header=True):
-        ws.append(r)
-
-    # set column width
+    header = ["AP Name", "Group", "Type", "Channel", "Neighbor AP", "Coverage AP", "Co-ch AP"]
     widths = [30, 40, 10, 10, 10, 10, 10]
-    for i, w in enumerate(widths):
-        ws.column_dimensions[chr(65+i)].width = w
-
-    # set header font and color
-    f = Font(name='Calibri', bold=True, size=11, color="FFFFFF")
-    p = PatternFill(fgColor="70AD47", fill_type="solid")
-    for cell in ws['A1':'G1'][0]:
-        cell.font = f
-        cell.fill = p
-
-    # set font, bgcolor
-    f = Font(name='Consolas')
-    p = PatternFill(fgColor="e2efda", fill_type="solid")
-    rn = 1
-    for row in ws.iter_rows(min_row=2):
-        for cell in row:
-            cell.font = f
-            if rn&1:
-                cell.fill = p
-        rn += 1
-
-    # centering for AP type
-    for cell in ws['C'][1:]:
-        cell.alignment = Alignment(horizontal='center')
-
-
-    # set autofilter and freeze panes
-    ws.auto_filter.ref = "A:G"
-    ws.freeze_panes = "A2"
-
 
     #
     #   output to file
     #
     print(f"Writing to {xlsfile} ... ", end="")
-    wb.save(xlsfile)
+    # ヘッダ: 緑, データ: ストライプ, AP type は中央揃え. オートフィルタ, ヘッダ行の固定
+    write_xlsx(xlsfile, header, tbl, style='green', widths=widths, col_align={'C': 'center'})
     print("done.")
 
     sys.exit(0)
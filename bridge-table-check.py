@@ -7,14 +7,16 @@
 import argparse
 import sys
 import mylogger as log
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 from collections import defaultdict
 
 parser = argparse.ArgumentParser(
     description="Check datapath bridge table")
 parser.add_argument('infile', help="Input file containing 'show datapath bridge' output", type=str, nargs=1)
 parser.add_argument('--debug', help='Enable debug log', action='store_true')
+parser.add_argument('--profile', help='Print parser statistics', action='store_true')
 args = parser.parse_args()
+set_profile(args.profile)
 
 if args.debug:
     log.setloglevel(log.LOG_DEBUG)
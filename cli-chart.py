@@ -10,17 +10,16 @@ import sys
 import re
 import argparse
 import mylogger as log
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 from colorama import Fore, Style
 from collections import defaultdict
-import plotly.graph_objects as go
-import plotly.express as px
-from ouimap import ouimap
+from aos_mac import macs2ints, count_types, vendor_counts
 
 #
 #   display pie chart
 #
 def draw_pie_chart(data_dict, title, filename, marker, width=400, height=400):
+    import plotly.graph_objects as go
     labels = list(data_dict.keys())
     values = list(data_dict.values())
     fig = go.Figure(data=[go.Pie(labels=labels, values=values, sort=False, hole=.5, insidetextorientation='horizontal')])
@@ -39,7 +38,9 @@ parser.add_argument('infiles', help="Input file(s)", type=str, nargs='+')
 parser.add_argument('--pattern', '-p', help='regex for AP name', type=str, default='.*')
 parser.add_argument('--ssid', help='Parse specific SSID(s)', type=str, default='.*')
 parser.add_argument('--debug', help='Enable debug log', action='store_true')
+parser.add_argument('--profile', help='Print parser statistics', action='store_true')
 args = parser.parse_args()
+set_profile(args.profile)
 
 if args.debug:
     log.setloglevel(log.LOG_DEBUG)
@@ -107,7 +108,7 @@ cap_ss = defaultdict(int, {'1ss':0, '2ss':0})
 cap_randmac = defaultdict(int, {'Normal MAC':0, 'Random MAC':0})
 cap_os = defaultdict(int)
 vendor = defaultdict(int)
-ouis = {}
+cap_macs = []                       # MAC Type, Vendor を集計する MAC (ループの後で一括して集計)
 
 print(f"Total {len(user_tbl)} client records found.")
 for r in user_tbl:
@@ -158,19 +159,15 @@ for r in user_tbl:
             ss = '1ss'  # non-HT
         cap_ss[ss] += 1
 
-        if mac[1] in '26ae':
-            cap_randmac['Random MAC'] += 1
-        else:
-            cap_randmac['Normal MAC'] += 1
-
         cap_os[os] += 1
 
-        oui = mac[:8].lower()
-        if oui in ouimap:
-            vendor[ouimap[oui][:10]] += 1
-            ouis[oui] = ouimap[oui]
-        else:
-            vendor['Unknown'] += 1
+        cap_macs.append(mac)
+
+cap_macs = macs2ints(cap_macs)
+mac_types = count_types(cap_macs)
+cap_randmac['Random MAC'] += mac_types['random']
+cap_randmac['Normal MAC'] += len(cap_macs) - mac_types['random']
+vendor.update(vendor_counts(cap_macs, width=10))
 
 if cap_gen['Legacy'] == 0:
     del(cap_gen['Legacy'])
@@ -198,11 +195,9 @@ print("\nVendor distribution:")
 for v, count in sorted(vendor.items(), key=lambda x: x[1], reverse=True):
     print(f"{v:20}: {count}")
 
-# print("OUIs found:")
-# for oui, vendor_name in sorted(ouis.items(), key=lambda x: x[1]):
-#     print(f"{oui}  {vendor_name}")
 
 #   Draw pie charts using plotly
+import plotly.express as px
 col1 = dict(colors=px.colors.qualitative.Set1, line=dict(color='#ffffff', width=1))
 col2 = dict(colors=px.colors.qualitative.Safe, line=dict(color='#ffffff', width=1))
 col3 = dict(colors=px.colors.qualitative.Plotly, line=dict(color='#ffffff', width=1))
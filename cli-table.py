@@ -7,11 +7,9 @@ import sys
 import re
 import mylogger as log
 import argparse
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 from collections import defaultdict
 from colorama import Fore, Style
-import pandas as pd
-import matplotlib.pyplot as plt
 from glob import glob
 
 Color = True
@@ -90,8 +88,10 @@ if __name__ == '__main__':
     #parser.add_argument('outfile', help='Output Excel file', type=str, nargs='?', default='')
     parser.add_argument('--snr', help='Sort by SNR', action='store_true')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('--band', '-b', help='Radio band (2/5:default/6)', type=str, default='all')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -115,15 +115,7 @@ if __name__ == '__main__':
     tbl = []
     tbl_assoc = []
     for fn in infiles:
-        for enc in ('utf-8', 'shift-jis', 'mac-roman'):
-            try:
-                aos = AOSParser(fn, cmds, encoding=enc, merge=True)
-            except UnicodeDecodeError as e:
-                continue
-            break   # encode success
-        else:
-            print(f"unknown encoding for {fn}, skip.")
-            continue
+        aos = AOSParser(fn, cmds, merge=True)
 
         cli_tbl = aos.get_table(cmds[0], *cols)
         if cli_tbl is None:
@@ -237,6 +229,9 @@ if __name__ == '__main__':
     #
     #   Tx/Rx rate histogram
     #
+    import pandas as pd
+    import matplotlib.pyplot as plt
+
     max_hist = max(max(tx_hist), max(rx_hist))
     rate_label = []
     for r1, r2 in zip(rate_buckets[:-1], rate_buckets[1:]):
@@ -6,24 +6,12 @@
 #
 
 import sys
-import re
 import argparse
+import numpy as np
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
-from collections import defaultdict
-
-
-#
-#   重複するキーを削除
-#
-def uniq(tbl, col=0):
-    ret = []
-    k = set()
-    for r in tbl:
-        if r[col] in k: continue
-        k.add(r[col])
-        ret.append(r)
-    return ret
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
+from aos_session import SessionTable
+from aos_appclass import AppClassifier
 
 
 #
@@ -37,8 +25,12 @@ if __name__ == '__main__':
     parser.add_argument('--pattern', '-p', help='regex for AP name', type=str, default='.*')
     parser.add_argument('--top', '-t', help='Top N sessions', type=int, default=100)
     parser.add_argument('--p2p', help='Display P2P sessions', action='store_true')
+    parser.add_argument('--apps', help='Show bitrate per application class', action='store_true')
+    parser.add_argument('--subnet', '-s', help='Prefix length to show top destination subnets (e.g. 24)', type=int, default=None)
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -51,16 +43,7 @@ if __name__ == '__main__':
     #
     print("Parsing files ... ", end="")
     cmds = ["show user-table", "show datapath session dpi", "show datapath session internal", "show switches"]
-    for enc in ('utf-8', 'mac-roman'):
-        try:
-            aos = AOSParser(args.infile, cmds, merge=True, encoding=enc)
-        except UnicodeDecodeError as e:
-            print(f'{enc} decode error.')
-            continue
-        break   # decode success
-    else:
-        print("unknown encoding, abort.")
-        sys.exit(-1)
+    aos = AOSParser(args.infile, cmds, merge=True, typed=True, columnar=True)
 
     dp_ses = aos.get_table(cmds[1])
     if dp_ses is None:
@@ -85,122 +68,94 @@ if __name__ == '__main__':
     #
     #   parse user-table and create IP to AP Name mapping
     #
-    user_ip = set()
-    ip2apn = {}
-    for r in user_tbl[1:]:
-        apn = r[7]
-        ip = r[0]
-        user_ip.add(ip)
-        ip2apn[ip] = apn
+    user_ip = aos.index(cmds[0], 'IP')
+    ip2apn = user_ip.mapping('AP name')
 
     #
-    #   get top 100 high-bandwidth session
+    #   filter sessions
     #
-    tbl = []
-    tbl_m = []
-    num_v = num_i = num_q = num_u = tot_br = 0
+    ses = SessionTable(dp_ses, ip2apn)
+    m = ses.proto != 47                                 # ignore GRE tunnel
+    m &= (ses.bytes != 0) & (ses.packets != 0)          # ignore session with no traffic
+    if sw_ips:
+        m &= ~ses.ip_mask(sw_ips)                       # ignore sessions involving switch IPs
+    m &= ses.ap_mask(args.pattern)                      # AP name matches
+    if args.p2p:
+        m &= (ses.sap != 0) & (ses.dap != 0)            # P2P session only
+
+    aps = np.unique(np.concatenate((ses.sap[m], ses.dap[m])))
+    maxlen = max([6] + [len(ses.ap_names[c]) for c in aps.tolist()])
+
     idx_tos   = dp_ses[0].index('ToS')
     idx_tage  = dp_ses[0].index('TAge')
     idx_pkts  = dp_ses[0].index('Packets')
     idx_bytes = dp_ses[0].index('Bytes')
     idx_flags = dp_ses[0].index('Flags')
     idx_appid = dp_ses[0].index('AppID')
-    rate_ap = defaultdict(lambda: 0)
-    rate_ip = defaultdict(lambda: 0)
-    num_ses = defaultdict(lambda: 0)
-    maxlen = 6
-
-    for r in dp_ses[1:]:
-        tage = int(r[idx_tage], 16)
-        # if tage <= 5: continue          # ignore short-lived session
-        if r[2] == '47': continue       # ignore GRE tunnel
-        if r[idx_bytes] == '0' or r[idx_pkts] == '0':
-            continue        # ignore session with no traffic
-        sip = r[0]
-        dip = r[1]
-        if sip in sw_ips or dip in sw_ips:
-            continue        # ignore sessions involving switch IPs
-        sap = ip2apn.get(sip, '')
-        dap = ip2apn.get(dip, '')
-        if (not re.search(args.pattern, sap)) and (not re.search(args.pattern, dap)):
-            continue        # AP name does not match
-        if args.p2p:
-            if sap == '' or dap == '':
-                continue    # not P2P session
-
-        maxlen = max(maxlen, len(sap), len(dap))
-
-
-        flags = r[idx_flags]
-        bytes = int(r[idx_bytes])
-        if tage >= 5:
-            bitrate = bytes*8/tage
-        else:
-            bitrate = 0
-        tot_br += bitrate
-        avg_pkt_size = bytes / int(r[idx_pkts])
-        # SIP, SAP, DIP, DAP, Proto, SPort, DPort, ToS, TAge, Bytes, AvgPKtSize, Bitrate, Flags, AppID
-        tbl.append([sip, sap, dip, dap, r[2], r[3], r[4], r[idx_tos], tage, bytes, avg_pkt_size, bitrate, flags, r[idx_appid][:16].rstrip()])
-
-        m = re.match(r'(\d+)\.', dip)
-        if m:
-            ip = int(m.group(1))
-            if 224 <= ip <= 239:
-                tbl_m.append([sip, sap, dip, r[2], r[3], r[4], tage, bytes, bitrate, flags])
-
-        if 'V' in flags: num_v += 1
-        if 'I' in flags: num_i += 1
-        if 'Q' in flags: num_q += 1
-        if 'u' in flags: num_u += 1
-
-        #   traffic summary
-        if sap:
-            rate_ap[sap] += bitrate
-        if dap:
-            rate_ap[dap] += bitrate
-        if sip in user_ip:
-            rate_ip[sip] += bitrate    # Source IP
-            num_ses[sip] += 1
-        if dip in user_ip:
-            rate_ip[dip] += bitrate    # Dest IP
-            num_ses[dip] += 1
+    bitrate = ses.bitrate
+
+    #   traffic summary
+    mcast = m & ses.multicast()
+    flags = ses.count_flags('VIQu', m)
+    top_ap = ses.top_groups((np.where(ses.sap != 0, ses.sap, -1), np.where(ses.dap != 0, ses.dap, -1)),
+                            ses.ap_names, bitrate, m)
+    user_src = np.where(ses.ip_mask(user_ip, 'src'), ses.sip, -1)
+    user_dst = np.where(ses.ip_mask(user_ip, 'dst'), ses.dip, -1)
+    top_ip = ses.top_groups((user_src, user_dst), ses.ips, bitrate, m)
+    top_ses = ses.top_groups((user_src, user_dst), ses.ips, None, m)
 
 
     #
     #   show results
     #
 
-    print(f'Matched {len(tbl)} sessions:')
+    print(f'Matched {np.count_nonzero(m)} sessions:')
     print(f'Listing top {args.top} sessions:\n')
     spc = " " * (maxlen-4)
     print(f"Src IP           Src AP{spc}Dst IP           Dst AP{spc}Proto  SPort  DPort  ToS       Bytes   Dur  Avg.Size  BW(Kbps)  Flags  AppID")
     print(f"------           ------{spc}------           ------{spc}-----  -----  -----  ---       -----   ---  --------  --------  -----  -----")
 
     # Sorty by BW
-    for r in sorted(tbl, key=lambda x:x[11], reverse=True)[:args.top]:
-        print(f'{r[0]:17}{r[1]:{maxlen+2}}{r[2]:17}{r[3]:{maxlen+2}}{r[4]:7}{r[5]:7}{r[6]:7}{r[7]:3}  {r[9]:>10}{r[8]:>6}  {int(r[10]):>8} {r[11]/1000:>9.2f}  {r[12]:5}  {r[13]}')
-
-    print(f"Total bitrate: {tot_br/1000/1000:.2f} Mbps")
+    for i in ses.top(bitrate, args.top, m):
+        r = ses.row(i)
+        sap = ses.ap_names[ses.sap[i]]
+        dap = ses.ap_names[ses.dap[i]]
+        tage = r[idx_tage] or 0
+        avg_pkt_size = r[idx_bytes] / r[idx_pkts]
+        print(f'{r[0]:17}{sap:{maxlen+2}}{r[1]:17}{dap:{maxlen+2}}{r[2]:7}{r[3]:7}{r[4]:7}{r[idx_tos]:3}  {r[idx_bytes]:>10}{tage:>6}  {int(avg_pkt_size):>8} {bitrate[i]/1000:>9.2f}  {r[idx_flags]:5}  {r[idx_appid][:16].rstrip()}')
+
+    print(f"Total bitrate: {ses.total(bitrate, m)/1000/1000:.2f} Mbps")
     #sys.exit(0)
 
     print("\n==== Multicast ====")
     i = 1
-    for r in sorted(tbl_m, key=lambda x:x[8], reverse=True)[:100]:
-        print(f'{i:>3}: {r[0]:20}{r[1]:20}{r[2]:20}{r[3]:5}{r[4]:6}{r[5]:6}{r[7]:>10} {r[8]/1000:>8.2f} Kbps')
-        #print(f'{ip},{r[1]},{ip2name[ip]},{ip2apn[ip]},{ip2ssid[ip]},{r[2]}')
+    for j in ses.top(bitrate, 100, mcast):
+        r = ses.row(j)
+        sap = ses.ap_names[ses.sap[j]]
+        print(f'{i:>3}: {r[0]:20}{sap:20}{r[1]:20}{r[2]:5}{r[3]:6}{r[4]:6}{r[idx_bytes]:>10} {bitrate[j]/1000:>8.2f} Kbps')
         i+=1
 
     print("\n==== Flagged sessions ====")
-    print(f"V:{num_v}  I(Deep Instpect):{num_i}  Q(Real-Time Quality analysis):{num_q}  u(Upstream Real-Time Quality analysis):{num_u}")
+    print(f"V:{flags['V']}  I(Deep Instpect):{flags['I']}  Q(Real-Time Quality analysis):{flags['Q']}  u(Upstream Real-Time Quality analysis):{flags['u']}")
 
     print("\n==== Top APs ====")
-    for ap, br in sorted(rate_ap.items(), key=lambda x:x[1], reverse=True)[:20]:
+    for ap, br in top_ap:
         print(f'{ap:{maxlen}}  {br/1000/1000:>8.2f} Mbps')
 
     print("\n==== Top Users ====")
-    for ip, br in sorted(rate_ip.items(), key=lambda x:x[1], reverse=True)[:20]:
+    for ip, br in top_ip:
         print(f'{ip:15}  {br/1000/1000:>8.2f} Mbps')
 
     print("\n==== Top Users by # of sessions ====")
-    for ip, ns in sorted(num_ses.items(), key=lambda x:x[1], reverse=True)[:20]:
-        print(f'{ip:15}  {ns:>5} sessions')
\ No newline at end of file
+    for ip, ns in top_ses:
+        print(f'{ip:15}  {ns:>5} sessions')
+
+    if args.apps:
+        print("\n==== Application classes ====")
+        for app, ns, br in AppClassifier().summary(ses, bitrate, m):
+            print(f'{app or "(other)":15}  {br/1000/1000:>8.2f} Mbps  {ns:>6} sessions')
+
+    if args.subnet is not None:
+        print(f"\n==== Top Destination Subnets (/{args.subnet}) ====")
+        for net, br, ns in ses.subnets(args.subnet, weights=bitrate, mask=m, n=20):
+            print(f'{net:20}  {br/1000/1000:>8.2f} Mbps  {ns:>5} sessions')
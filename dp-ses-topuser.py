@@ -9,20 +9,11 @@ import sys
 import re
 import argparse
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
+from aos_index import dedup_rows
 from collections import defaultdict
 
 
-def uniq(tbl, col=0):
-    ret = []
-    k = set()
-    for r in tbl:
-        if r[col] in k: continue
-        k.add(r[col])
-        ret.append(r)
-    return ret
-
-
 #
 #   main
 #
@@ -32,7 +23,9 @@ if __name__ == '__main__':
         description="Parse show datapath user table sort by the number of sessions")
     parser.add_argument('infile', help="Input file(s)", type=str, nargs='+')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -55,8 +48,8 @@ if __name__ == '__main__':
         sys.exit(-1)
     print("done.")
 
-    dp_user_uniq = uniq(dp_user)
-    l3_user = uniq(l3_user)
+    dp_user_uniq = dedup_rows(dp_user)
+    l3_user = dedup_rows(l3_user)
 
     print(f'Got total {len(l3_user)-1} L3 users, {len(dp_user_uniq)-1} L2 users.')
 
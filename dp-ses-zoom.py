@@ -6,11 +6,12 @@
 #
 
 import sys
-import re
 import argparse
+import numpy as np
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
-from collections import defaultdict
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
+from aos_session import SessionTable
+from aos_appclass import AppClassifier
 
 
 def uniq(tbl, col=0):
@@ -32,7 +33,9 @@ if __name__ == '__main__':
         description="Parse show datapath session dpi by the bitrate of each session")
     parser.add_argument('infile', help="Input file(s)", type=str, nargs='+')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -44,7 +47,7 @@ if __name__ == '__main__':
     #   parse AP tables
     #
     print("Parsing files ... ", end="")
-    aos = AOSParser(args.infile, ["show datapath session dpi"], merge=True)
+    aos = AOSParser(args.infile, ["show datapath session dpi"], merge=True, typed=True, columnar=True)
     dp_ses = aos.get_table("show datapath session dpi")
     if dp_ses is None:
         print("show datapath session dpi output not found.")
@@ -55,53 +58,44 @@ if __name__ == '__main__':
     #
     #   get zoom session (src port==8801)
     #
-    tbl = []
-    tbl_m = []
-    dip = set()
-    num_v = num_i = num_q = num_u = tot_br = 0
-    for r in dp_ses[1:]:
-        tage = int(r[10], 16)
-        if tage <= 5: continue          # ignore short-lived session
-        if r[2] == '47': continue       # ignore GRE tunnel
-        sp = int(r[3])
-        if not (8801 <= sp <= 8810): continue       # ignore non-Zoom session
-
-        bytes = int(r[12])
-        flags = r[20]
-        bitrate = bytes*8/tage
-        tot_br += bitrate
-        dip.add(r[1])       # Dest IP
-        tbl.append([r[0], r[1], r[2], r[3], r[4], tage, bytes, bitrate, flags])
-
-        m = re.match(r'(\d+)\.', r[1])
-        if m:
-            ip = int(m.group(1))
-            if 224 <= ip <= 239:
-                tbl_m.append([r[0], r[1], r[2], r[3], r[4], tage, bytes, bitrate, flags])
-
+    ses = SessionTable(dp_ses)
+    clf = AppClassifier()
+    m = ses.tage > 5                                    # ignore short-lived session
+    m &= ses.proto != 47                                # ignore GRE tunnel
+    m &= clf.mask(ses, 'Zoom')                          # ignore non-Zoom session
+    m &= ses.port_mask(clf.ports('Zoom'), 'src')        # from Zoom server
+
+    bitrate = ses.bitrate
+    idx_tage = dp_ses[0].index('TAge')
+    idx_bytes = dp_ses[0].index('Bytes')
+    idx_flags = dp_ses[0].index('Flags')
+    dip = set(ses.dip[m].tolist())      # Dest IP
 
     i = 1
     #print('Src,Dst,Proto,SPort,DPort,Bytes,Bitrate(Kbps),Flags')
     print("Src IP              Dst IP              Proto  SPort  DPort  Bytes      Dur   BW(Kbps)   Flags")
     print("------              ------              -----  -----  -----  -----      ---   --------   -----")
-    for r in sorted(tbl, key=lambda x:x[7], reverse=True):
+    for j in ses.top(bitrate, None, m):
+        r = ses.row(j)
         src = r[0]
         dst = r[1]
-        print(f'{src:20}{dst:20}{r[2]:7}{r[3]:7}{r[4]:7}{r[6]:>10}{r[5]:>6} {r[7]/1000:>10.2f} {r[8]} ')
+        print(f'{src:20}{dst:20}{r[2]:7}{r[3]:7}{r[4]:7}{r[idx_bytes] or 0:>10}{r[idx_tage]:>6} {bitrate[j]/1000:>10.2f} {r[idx_flags]} ')
         #print(f'{src},{dst},{r[2]},{r[3]},{r[4]},{r[6]},{r[7]/1000:>8.2f},{r[8]}')
         i+=1
 
-    print(f"Total sessions: {len(tbl)} sessions")
+    print(f"Total sessions: {np.count_nonzero(m)} sessions")
     print(f"Total unique receiver IP: {len(dip)} IPs")
-    print(f"Total bitrate: {tot_br/1000/1000:.2f} Mbps")
+    print(f"Total bitrate: {ses.total(bitrate, m)/1000/1000:.2f} Mbps")
     sys.exit(0)
 
     print("\n==== Multicast ====")
-    for r in sorted(tbl_m, key=lambda x:x[7], reverse=True)[:100]:
+    for j in ses.top(bitrate, 100, m & ses.multicast()):
+        r = ses.row(j)
         src = r[0]
         dst = r[1]
-        print(f'{i:>3}: {src:20}{dst:20}{r[2]:5}{r[3]:6}{r[4]:6}{r[6]:>10} {r[7]/1000:>8.2f} Kbps')
+        print(f'{i:>3}: {src:20}{dst:20}{r[2]:5}{r[3]:6}{r[4]:6}{r[idx_bytes] or 0:>10} {bitrate[j]/1000:>8.2f} Kbps')
         #print(f'{ip},{r[1]},{ip2name[ip]},{ip2apn[ip]},{ip2ssid[ip]},{r[2]}')
         i+=1
 
-    print(f"V:{num_v}  I:{num_i}  Q:{num_q}  u:{num_u}")
\ No newline at end of file
+    flags = ses.count_flags('VIQu', m)
+    print(f"V:{flags['V']}  I:{flags['I']}  Q:{flags['Q']}  u:{flags['u']}")
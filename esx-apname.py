@@ -11,7 +11,7 @@ import glob
 from zipfile import ZipFile, ZIP_DEFLATED
 import argparse
 import mylogger as log
-from aos_parser import AOSParser, AP_BSS_TABLE
+from aos_parser import AOSParser, AP_BSS_TABLE, set_profile
 
 if __name__ == '__main__':
 
@@ -28,8 +28,10 @@ if __name__ == '__main__':
     parser.add_argument('--vendor', help='Use vendor name for non-Aruba APs', action='store_true')
     parser.add_argument('--dryrun', help='Do not create esx file', action='store_true')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('--info', help='Enable informational log', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -7,7 +7,7 @@ import sys
 import re
 import argparse
 import mylogger as log
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 
 #
 #   START
@@ -16,8 +16,10 @@ from aos_parser import AOSParser
 parser = argparse.ArgumentParser(description="Create python dictionary from BSS table")
 parser.add_argument('infiles', help="Input file(s)", type=str, nargs='*')
 parser.add_argument('--debug', help='Enable debug log', action='store_true')
+parser.add_argument('--profile', help='Print parser statistics', action='store_true')
 parser.add_argument('--out', '-o', help='Output file', type=str, default='bssdic.py')
 args = parser.parse_args()
+set_profile(args.profile)
 
 if args.debug:
     log.setloglevel(log.LOG_DEBUG)
@@ -31,15 +33,7 @@ cmd = ["show ap bss-table.*"]
 cols = ["bss", "ess", "ap name"]
 
 
-for enc in ['utf-8', 'macroman']:
-    try:
-        aos = AOSParser(args.infiles, cmd, merge=True, encoding=enc)
-        break
-    except UnicodeDecodeError:
-        pass
-else:
-    print("unknown encoding, abort.")
-    sys.exit(-1)
+aos = AOSParser(args.infiles, cmd, merge=True)
 
 
 ap_bss_tbl = aos.get_table(cmd[0], *cols)
@@ -9,14 +9,9 @@ import glob
 import sys
 import argparse
 import mylogger as log
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 from colorama import Fore, Style
-import pandas as pd
-import openpyxl
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
+from aos_xlsx import write_xlsx
 
 
 def print_debug(msg):
@@ -337,7 +332,9 @@ parser = argparse.ArgumentParser(
     description="parse show run/show ap database and summarize")
 parser.add_argument('files', help="show run/show ap database long outputs", type=str, nargs='*')
 parser.add_argument('--debug', help='debug log', action='store_true')
+parser.add_argument('--profile', help='Print parser statistics', action='store_true')
 args = parser.parse_args()
+set_profile(args.profile)
 
 if args.debug:
     log.setloglevel(log.LOG_DEBUG)
@@ -461,45 +458,15 @@ for fn in args.files:
 #
 #   Create Excel 1
 #
-df = pd.DataFrame(results, columns=['Controller', 'AP system profile', 'AP uplink ACL', 'AP', 'Bridge SSID'])
-wb = Workbook()
-ws = wb.active
-for r in dataframe_to_rows(df, index=False, header=True):
-    ws.append(r)
-
-f = Font(name='Consolas', size=10)
-for row in ws.iter_rows(min_row=1):
-    for cell in row:
-        cell.font = f
-
+header = ['Controller', 'AP system profile', 'AP uplink ACL', 'AP', 'Bridge SSID']
 widths = [20, 40, 25, 20, 25]
-for i, w in enumerate(widths):
-    ws.column_dimensions[chr(65 + i)].width = w
-
-#   Header format
-f = Font(name='Arial', bold=True, size=9)
-Ses = PatternFill(fgColor="BDD7EE", fill_type="solid")
-for cell in ws[1]:
-    cell.fill = Ses
-    cell.font = f
-
-#ws.auto_filter.ref = "A:" + get_column_letter(ws.max_column)
-ws.freeze_panes = "A2"
-
-#   multi lines
-# for c in ws['D']+ws['E']:
-#     c.alignment = openpyxl.styles.Alignment(wrapText=True)
-
-#   alignment & multi lines
-al = openpyxl.styles.Alignment(vertical='top', wrapText=True)
-for row in ws.iter_rows(min_row=2):
-    for cell in row:
-        cell.alignment = al
 
 #
 #   output to file
 #
 print(f"Writing to {xlsfile} ... ", end="")
-wb.save(xlsfile)
+#   ヘッダ以外は上揃え・折り返し (複数行のセル)
+write_xlsx(xlsfile, header, results, style='blue', widths=widths, font={'name': 'Consolas', 'size': 10},
+           align={'vertical': 'top', 'wrapText': True}, autofilter=False)
 print("done.")
 
@@ -25,14 +25,9 @@ import glob
 import sys
 import argparse
 import mylogger as log
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 from colorama import Fore, Style
-import pandas as pd
-import openpyxl
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
+from aos_xlsx import write_xlsx
 from collections import defaultdict
 
 
@@ -549,7 +544,9 @@ parser = argparse.ArgumentParser(
     description="parse show run/show ap database and summarize")
 parser.add_argument('files', help="show run/show ap database long outputs", type=str, nargs='*')
 parser.add_argument('--debug', help='debug log', action='store_true')
+parser.add_argument('--profile', help='Print parser statistics', action='store_true')
 args = parser.parse_args()
+set_profile(args.profile)
 
 if args.debug:
     log.setloglevel(log.LOG_DEBUG)
@@ -961,53 +958,19 @@ row_add('Static channel assignment', vap_static)
 
 ######################################
 
-df = pd.DataFrame(results, columns=['Functions'] + vap_header)
-
-wb = Workbook()
-ws = wb.active
-for r in dataframe_to_rows(df, index=False, header=True):
-    ws.append(r)
-
-f = Font(name='Consolas', size=9)
-for row in ws.iter_rows(min_row=1):
-    for cell in row:
-        cell.font = f
-
-#   Header format
-f = {
-    'tunnel': PatternFill(fgColor='77CCFF', fill_type='solid'),
-    'split-tunnel': PatternFill(fgColor='66EECC', fill_type='solid'),
-    'bridge': PatternFill(fgColor='FFAAAA', fill_type='solid')
-}
-al = openpyxl.styles.Alignment(textRotation=90, horizontal='center')
-for i, cell in enumerate(ws[1]):
-    if i < 1:
-        continue        # skip column A
-    cell.alignment = al
-    cell.fill = f[vap_fwd_mode[i-1]]
-
-#   column widths
-ws.column_dimensions['A'].width = 30
-
-for i in range(vap_cols):
-    ws.column_dimensions[get_column_letter(i+2)].width = 2
-
-#   Center alignment
-al = openpyxl.styles.Alignment(horizontal='center')
-for r in ws.iter_rows(min_row=2, min_col=2):
-    for cell in r:
-        cell.alignment = al
-
-#   freeze
-ws.freeze_panes = "B2"
-
-# filter
-#ws.auto_filter.ref = "A:" + get_column_letter(ws.max_column)
-#ws.auto_filter.ref = ws.dimensions
+#   Header format (VAP 列は縦書き, fwd-mode ごとの色)
+header_fills = {'tunnel': '77CCFF', 'split-tunnel': '66EECC', 'bridge': 'FFAAAA'}
+al = {'textRotation': 90, 'horizontal': 'center'}
 
 #
 #   output to file
 #
 print(f"Writing to {xlsfile} ... ", end="")
-wb.save(xlsfile)
+write_xlsx(xlsfile, ['Functions'] + vap_header, results, style='plain',
+           font={'name': 'Consolas', 'size': 9},
+           widths=[30] + [2] * vap_cols,
+           freeze="B2", autofilter=False,
+           col_align={i + 1: 'center' for i in range(vap_cols)},
+           header_align={i + 1: al for i in range(vap_cols)},
+           header_fills={i + 1: header_fills[m] for i, m in enumerate(vap_fwd_mode)})
 print("done.")
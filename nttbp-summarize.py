@@ -11,14 +11,9 @@ import glob
 import sys
 import argparse
 import mylogger as log
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 from colorama import Fore, Style
-import pandas as pd
-import openpyxl
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
+from aos_xlsx import XlsxBook, write_xlsx
 
 
 def print_debug(msg):
@@ -317,7 +312,9 @@ parser = argparse.ArgumentParser(
     description="parse show run/show ap database and summarize")
 parser.add_argument('files', help="show run/show ap database long outputs", type=str, nargs='*')
 parser.add_argument('--debug', help='debug log', action='store_true')
+parser.add_argument('--profile', help='Print parser statistics', action='store_true')
 args = parser.parse_args()
+set_profile(args.profile)
 
 if args.debug:
     log.setloglevel(log.LOG_DEBUG)
@@ -582,59 +579,20 @@ for fn in args.files:
 #
 #   Create Excel 1
 #
-df = pd.DataFrame(results,
-                  columns=['Controller', 'Model', 'Version', 'Active groups', 'Active APs', 'AP model', 'Num of SSIDs', 'SSIDs',
-                           'Static Ch APs', 'Mixed APs', 'AP specific', 'Add VAP', 'Del VAP', 'ARM', 'Radio OFF', 'Regulatory', 'Misc', 'Misc config'])
-wb = Workbook()
-ws = wb.active
-for r in dataframe_to_rows(df, index=False, header=True):
-    ws.append(r)
-
-f = Font(name='Arial')
-for row in ws.iter_rows(min_row=1):
-    for cell in row:
-        cell.font = f
-
+header = ['Controller', 'Model', 'Version', 'Active groups', 'Active APs', 'AP model', 'Num of SSIDs', 'SSIDs',
+          'Static Ch APs', 'Mixed APs', 'AP specific', 'Add VAP', 'Del VAP', 'ARM', 'Radio OFF', 'Regulatory', 'Misc', 'Misc config']
 widths = [20, 15, 10, 10, 10, 20, 10, 60,       # A-H
           10, 10, 10, 10, 10, 10, 10, 10, 10, 60]   # I-R
-for i, w in enumerate(widths):
-    ws.column_dimensions[chr(65 + i)].width = w
-
-#   Header format
-f = Font(name='Arial', bold=True, size=9)
-Ses = PatternFill(fgColor="BDD7EE", fill_type="solid")
-for cell in ws[1]:
-    cell.fill = Ses
-    cell.font = f
-
-ws.auto_filter.ref = "A:" + get_column_letter(ws.max_column)
-ws.freeze_panes = "A2"
-
-#   multi lines
-for c in ws['F']+ws['H']:
-    c.alignment = openpyxl.styles.Alignment(wrapText=True)
-
-#   alignment
-al = openpyxl.styles.Alignment(vertical='center', wrapText=True)
-for row in ws.iter_rows(min_row=2):
-    for cell in row:
-        cell.alignment = al
-
-#   SSID list font
-f = Font(name='Consolas', size=10)
-for row in ws['H2':f'H{ws.max_row}']:
-    row[0].font = f
-
-#   misc config font
-for row in ws['R2':f'R{ws.max_row}']:
-    row[0].font = f
-
 
 #
 #   output to file
 #
 print(f"Writing to {xlsfile1} ... ", end="")
-wb.save(xlsfile1)
+#   multi lines (AP model, SSIDs), SSID list / misc config font
+write_xlsx(xlsfile1, header, results, style='blue', widths=widths, font={'name': 'Arial'},
+           align={'vertical': 'center', 'wrapText': True},
+           col_fonts={'H': {'name': 'Consolas', 'size': 10}, 'R': {'name': 'Consolas', 'size': 10}},
+           header_align={'F': {'wrapText': True}, 'H': {'wrapText': True}})
 print("done.")
 
 
@@ -655,55 +613,17 @@ for vap in sorted(controller_sets.keys()):
     row.append(Ses[:-1])
     results.append(row)
 
-df = pd.DataFrame(results,
-                  columns=['SSID', 'Opmode', 'fwd-mode', 'Num of APs', 'Controllers', 'Co-ex VAPs'])
-
-wb = Workbook()
-ws = wb.active
-for r in dataframe_to_rows(df, index=False, header=True):
-    ws.append(r)
-
-f = Font(name='Consolas')
-for row in ws.iter_rows(min_row=1):
-    for cell in row:
-        cell.font = f
-
+header = ['SSID', 'Opmode', 'fwd-mode', 'Num of APs', 'Controllers', 'Co-ex VAPs']
 widths = [40, 15, 15, 10, 20, 80]
-for i, w in enumerate(widths):
-    ws.column_dimensions[chr(65 + i)].width = w
-
-#   Header format
-f = Font(name='Arial', bold=True, size=9)
-Ses = PatternFill(fgColor="BDD7EE", fill_type="solid")
-for cell in ws[1]:
-    cell.fill = Ses
-    cell.font = f
-
-ws.auto_filter.ref = "A:" + get_column_letter(ws.max_column)
-ws.freeze_panes = "A2"
-
-#   multi lines
-for c in ws['E']+ws['F']:
-    c.alignment = openpyxl.styles.Alignment(wrapText=True)
-
-#   alignment
-al = openpyxl.styles.Alignment(vertical='center', wrapText=True)
-for row in ws.iter_rows(min_row=2):
-    for cell in row:
-        cell.alignment = al
-
-#   VAP list font
-# f = Font(name='Consolas', size=10)
-# for cell in ws['F2':f'F{ws.max_row}']:
-#     cell[0].font = f
-
-
 
 #
 #   output to file
 #
 print(f"Writing to {xlsfile2} ... ", end="")
-wb.save(xlsfile2)
+#   multi lines (Controllers, Co-ex VAPs)
+write_xlsx(xlsfile2, header, results, style='blue', widths=widths,
+           align={'vertical': 'center', 'wrapText': True},
+           header_align={'E': {'wrapText': True}, 'F': {'wrapText': True}})
 print("done.")
 
 
@@ -745,75 +665,36 @@ for apn in apn_sorted:
     row = [ apn, model, num_vap, mixed, global_apn_apg_dic[apn] ] + [None] * vap_cols
     results.append(row)
 
-df = pd.DataFrame(results, columns=['AP Name', 'Model', 'SSIDs', 'Mixed', 'Group'] + vap_header)
-
-wb = Workbook()
-ws = wb.active
-for r in dataframe_to_rows(df, index=False, header=True):
-    ws.append(r)
-
-f = Font(name='Consolas', size=9)
-for row in ws.iter_rows(min_row=1):
-    for cell in row:
-        cell.font = f
-
-#   Header format
-f = {
-    'tunnel': PatternFill(fgColor='77CCFF', fill_type='solid'),
-    'split-tunnel': PatternFill(fgColor='66EECC', fill_type='solid'),
-    'bridge': PatternFill(fgColor='FFAAAA', fill_type='solid')
-}
-al = openpyxl.styles.Alignment(textRotation=90, horizontal='center')
-for i, cell in enumerate(ws[1]):
-    if i < 5:
-        continue        # skip left 5 columns
-    cell.alignment = al
-    cell.fill = f[vap_fwd_mode[i-5]]
-
-#   column widths
-ws.column_dimensions['A'].width = 25
-ws.column_dimensions['B'].width = 8
-ws.column_dimensions['C'].width = 8
-ws.column_dimensions['D'].width = 8
-ws.column_dimensions['E'].width = 25
-for i in range(vap_cols):
-    ws.column_dimensions[get_column_letter(i+6)].width = 2
-
-#   Center alignment for column B, C, D (Model, Num SSIDs, mixed)
-al = openpyxl.styles.Alignment(horizontal='center')
-for r in ws.iter_rows(min_row=2, min_col=2, max_col=4):
-    for cell in r:
-        cell.alignment = al
-
-#   freeze
-ws.freeze_panes = "F2"
-
-#   mixed AP
-f = PatternFill(fgColor='FFCC00', fill_type='solid')
-for i, apn in enumerate(apn_sorted):
-    if apn.lower() in global_mixed_ap:
-        ws['A'+str(i+2)].fill = f
+#   Header format (VAP 列は縦書き, fwd-mode ごとの色)
+header_fills = {'tunnel': '77CCFF', 'split-tunnel': '66EECC', 'bridge': 'FFAAAA'}
+al = {'textRotation': 90, 'horizontal': 'center'}
 
 #   fill cells
-f = {
-    'tunnel': PatternFill(fgColor='55AAEE', fill_type='solid'),
-    'split-tunnel': PatternFill(fgColor='44CCAA', fill_type='solid'),
-    'bridge': PatternFill(fgColor='FF8888', fill_type='solid')
-}
-for i, apn in enumerate(apn_sorted):
+vap_fills = {'tunnel': '55AAEE', 'split-tunnel': '44CCAA', 'bridge': 'FF8888'}
+
+book = XlsxBook(xlsfile3)
+ws = book.add_sheet(['AP Name', 'Model', 'SSIDs', 'Mixed', 'Group'] + vap_header, style='plain',
+                    font={'name': 'Consolas', 'size': 9},
+                    widths=[25, 8, 8, 8, 25] + [2] * vap_cols,
+                    freeze="F2",
+                    col_align={'B': 'center', 'C': 'center', 'D': 'center'},     # Model, Num SSIDs, mixed
+                    header_align={i + 5: al for i in range(vap_cols)},
+                    header_fills={i + 5: header_fills[m] for i, m in enumerate(vap_fwd_mode)})
+
+for apn, row in zip(apn_sorted, results):
+    fills = {}
+    #   mixed AP
+    if apn.lower() in global_mixed_ap:
+        fills[0] = 'FFCC00'
     for vap in global_vap_set[apn.lower()]:
-        col = vap_list[vap]
-        cell = ws[get_column_letter(col) + str(i+2)]
-        cell.fill = f[vap[2]]
-        cell.value = "　"
-
-# filter
-ws.auto_filter.ref = "A:" + get_column_letter(ws.max_column)
-#ws.auto_filter.ref = ws.dimensions
+        col = vap_list[vap] - 1
+        row[col] = "　"
+        fills[col] = vap_fills[vap[2]]
+    ws.append(row, fills=fills)
 
 #
 #   output to file
 #
 print(f"Writing to {xlsfile3} ... ", end="")
-wb.save(xlsfile3)
+book.save()
 print("done.")
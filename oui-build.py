@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+#
+#   oui-build.py
+#
+#   ローカルの IEEE レジストリファイルから OUI データベース (oui.bin) を作成・更新する
+#   - oui.txt, oui.csv (MA-L), mam.csv (MA-M), oui36.csv (MA-S), iab.csv に対応
+#   - 既存の oui.bin とマージし、追加・変更されたベンダーを表示する (--replace で作り直し)
+#   - ネットワークにアクセスしないため、オフラインの環境で使用できる
+#
+#       python oui-build.py oui.csv mam.csv oui36.csv
+#       python oui-build.py --dry-run oui.txt
+#
+
+import sys
+import argparse
+import mylogger as log
+from aos_oui import DEFAULT_DB, prefix_str, read_registry, update_db
+
+
+def print_report(report, verbose=False, limit=20):
+    '''
+    update_db() の変更内容を表示する
+    :param verbose: 全ての変更を表示する (False の場合は種類ごとに limit 件まで)
+    '''
+    print(f"Added: {len(report['added'])}, Changed: {len(report['changed'])}, "
+          f"Removed: {len(report['removed'])}, Total: {report['total']}")
+    for kind in ('added', 'changed', 'removed'):
+        items = report[kind]
+        if not items:
+            continue
+        print(f"\n--- {kind.capitalize()} ---")
+        for item in (items if verbose else items[:limit]):
+            bits, prefix = item[:2]
+            if kind == 'changed':
+                print(f"{prefix_str(bits, prefix):14}  {item[2]}  ->  {item[3]}")
+            else:
+                print(f"{prefix_str(bits, prefix):14}  {item[2]}")
+        if not verbose and len(items) > limit:
+            print(f"... and {len(items) - limit} more (--verbose to show all)")
+
+
+#
+#   main
+#
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="Build or update the OUI database from local IEEE registry files")
+    parser.add_argument('infiles', help="oui.txt, oui.csv, mam.csv, oui36.csv or iab.csv", type=str, nargs='+')
+    parser.add_argument('--db', help=f'OUI database to update (default: {DEFAULT_DB})', type=str, default=DEFAULT_DB)
+    parser.add_argument('--replace', help='Rebuild the database only from the input files', action='store_true')
+    parser.add_argument('--dry-run', '-n', help='Show changes without writing the database', action='store_true')
+    parser.add_argument('--verbose', '-v', help='Show all changes', action='store_true')
+    parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    args = parser.parse_args()
+
+    if args.debug:
+        log.setloglevel(log.LOG_DEBUG)
+    else:
+        log.setloglevel(log.LOG_INFO)
+
+    entries = []
+    for fn in args.infiles:
+        try:
+            ents = read_registry(fn)
+        except (OSError, ValueError) as e:
+            log.err(f"Can't read {fn}: {e}")
+            sys.exit(1)
+        if len(ents) == 0:
+            log.warn(f"No OUI entries found in {fn}")
+        print(f"{fn}: {len(ents)} entries")
+        entries.extend(ents)
+
+    report = update_db(args.db, entries, replace=args.replace, dry_run=args.dry_run)
+    print_report(report, args.verbose)
+    if args.dry_run:
+        print(f"\n{args.db} not updated (dry run).")
+    elif not (report['added'] or report['changed'] or report['removed']):
+        print(f"\n{args.db}: no changes.")
+    else:
+        print(f"\n{args.db} updated.")
@@ -1,10 +1,11 @@
 #
 #   download OUI ventor mapping from https://standards-oui.ieee.org/
-#   create ouimap.py file including python dict
+#   update oui.bin (OUI database for aos_oui.py)
+#   オフラインの環境では、ダウンロード済みのファイルから oui-build.py で更新する
 #
 
-import re
 import requests
+from aos_oui import DEFAULT_DB, parse_oui_txt, update_db
 
 
 headers = {
@@ -12,26 +13,10 @@ headers = {
 }
 r = requests.get('https://standards-oui.ieee.org/', headers=headers)
 
-ouimap = {}
-for l in r.text.splitlines():
-    if m:=re.match(r'[0-9A-F]{6}\s+\(base 16\)\s+(.+)', l):
-        oui = l[:2] + ':' + l[2:4] + ':' + l[4:6]
-        oui = oui.lower()
-        vendor = m.group(1)
-        ouimap[oui] = vendor
+entries = list(parse_oui_txt(r.text.splitlines()))
 
-print(f"downloaded {len(ouimap)} OUI vendor mapping from https://standards-oui.ieee.org/")
+print(f"downloaded {len(entries)} OUI vendor mapping from https://standards-oui.ieee.org/")
 
-with open('ouimap.py', 'w') as f:
-    f.write('#!/usr/bin/env python\n')
-    f.write('#\n')
-    f.write('#   OUI vendor mapping\n')
-    f.write('#   downloaded from https://standards-oui.ieee.org/\n')
-    f.write('#\n')
-    f.write('ouimap = {\n')
-    for k in sorted(ouimap.keys()):
-        f.write(f'    "{k}": "{ouimap[k]}",\n')
-    f.write('}\n')
-
-print(f"created ouimap.py file.")
+report = update_db(DEFAULT_DB, entries)
 
+print(f"updated {DEFAULT_DB} file. (added: {len(report['added'])}, changed: {len(report['changed'])})")
@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+#
+#   parser-bench.py
+#
+#   AOSParser のパース性能を測定する
+#   - 合成 tech-support (aos_synth.py) を生成するか、指定したファイルを使用
+#   - パーサ (aos_parser / aos_parser_v2) とオプション (lazy, columnar, typed) ごとに
+#     行数/秒, MB/秒, ピークメモリ (RSS) を表示
+#   - コマンドごとのパース時間を表示
+#   各測定は別プロセスで実行する (ピーク RSS を測定ごとに分けるため)
+#
+#       python parser-bench.py --aps 20000 --sessions 1000000
+#       python parser-bench.py --file tech-support.log --v2
+#
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import mylogger as log
+from aos_synth import SYNTH_CMDS, write_techsupport
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+BENCH_CMDS = list(SYNTH_CMDS[:-1]) + ["show ap monitor ap-list.*"]
+
+VARIANTS = {
+    'default':  dict(),
+    'lazy':     dict(lazy=True),
+    'columnar': dict(columnar=True),
+    'typed':    dict(typed=True),
+}
+
+
+def peak_rss():
+    '''
+    このプロセスのピーク RSS (MB). resource モジュールがない場合は None
+    '''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return rss / 1024 / 1024        # bytes
+    return rss / 1024                   # KB
+
+
+def run_parse(fn, cmds, variant, v2=False):
+    '''
+    ワーカープロセスで 1 回パースする
+    :return: (経過時間, ピーク RSS, 行数の合計)
+    '''
+    if v2:
+        from aos_parser_v2 import AOSParser
+        opts = {}
+    else:
+        from aos_parser import AOSParser
+        opts = dict(VARIANTS[variant], cache=False)
+    t0 = time.perf_counter()
+    aos = AOSParser(fn, cmds, **opts)
+    elapsed = time.perf_counter() - t0
+    rows = sum(len(tbl) - 1 for tbls in aos.tables.values() for tbl in tbls)
+    return elapsed, peak_rss(), rows
+
+
+def measure(fn, cmds, variant, v2=False, repeat=1):
+    '''
+    別プロセスで repeat 回パースし、最短の時間を返す
+    '''
+    best = None
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1) as ex:
+            r = ex.submit(run_parse, fn, cmds, variant, v2).result()
+        if best is None or r[0] < best[0]:
+            best = r
+    return best
+
+
+def count_lines(fn):
+    with open(fn, 'rb') as f:
+        return sum(buf.count(b'\n') for buf in iter(lambda: f.read(1024 * 1024), b''))
+
+
+#
+#   main
+#
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Benchmark AOSParser with a synthetic tech-support file")
+    parser.add_argument('--file', '-f', help='Use this file instead of generating one', type=str)
+    parser.add_argument('--aps', help='Number of APs', type=int, default=1000)
+    parser.add_argument('--users', help='Number of users (default: APs x 10)', type=int)
+    parser.add_argument('--sessions', help='Number of datapath sessions', type=int, default=10000)
+    parser.add_argument('--seed', help='Random seed', type=int, default=1)
+    parser.add_argument('--variant', '-V', help='Parser options to measure', choices=list(VARIANTS), action='append')
+    parser.add_argument('--v2', help='Also measure aos_parser_v2', action='store_true')
+    parser.add_argument('--repeat', '-r', help='Number of runs (the best is reported)', type=int, default=1)
+    parser.add_argument('--no-percmd', help='Skip per-command timing', action='store_true')
+    parser.add_argument('--keep', help='Keep the generated file', action='store_true')
+    parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    args = parser.parse_args()
+
+    if args.debug:
+        log.setloglevel(log.LOG_DEBUG)
+    else:
+        log.setloglevel(log.LOG_INFO)
+
+    if args.file:
+        fn = args.file
+    else:
+        fd, fn = tempfile.mkstemp(prefix="aos-bench-", suffix=".txt")
+        os.close(fd)
+        print(f"Generating {fn} (APs:{args.aps} sessions:{args.sessions}) ... ", end="", flush=True)
+        write_techsupport(fn, aps=args.aps, users=args.users, sessions=args.sessions, seed=args.seed)
+        print("done.")
+
+    try:
+        size = os.path.getsize(fn) / 1024 / 1024
+        nlines = count_lines(fn)
+        print(f"{fn}: {nlines} lines, {size:.1f} MB\n")
+
+        runs = [(v, False) for v in (args.variant or list(VARIANTS))]
+        if args.v2:
+            runs.append(('v2', True))
+
+        print(f"{'Parser':10}  {'Time(s)':>8}  {'Lines/s':>10}  {'MB/s':>7}  {'Peak RSS(MB)':>12}  {'Rows':>9}")
+        print(f"{'------':10}  {'-------':>8}  {'-------':>10}  {'----':>7}  {'------------':>12}  {'----':>9}")
+        for variant, v2 in runs:
+            try:
+                elapsed, rss, rows = measure(fn, BENCH_CMDS, variant, v2, args.repeat)
+            except ImportError as e:
+                print(f"{variant:10}  skipped ({e})")
+                continue
+            rss = f"{rss:.1f}" if rss is not None else "n/a"
+            print(f"{variant:10}  {elapsed:8.3f}  {nlines / elapsed:10.0f}  {size / elapsed:7.1f}  {rss:>12}  {rows:9}")
+
+        if not args.no_percmd:
+            print(f"\n{'Command':32}  {'Time(s)':>8}  {'Rows':>9}")
+            print(f"{'-------':32}  {'-------':>8}  {'----':>9}")
+            for cmd in BENCH_CMDS:
+                elapsed, _, rows = measure(fn, [cmd], 'default', False, args.repeat)
+                print(f"{cmd:32}  {elapsed:8.3f}  {rows:9}")
+    finally:
+        if not args.file and not args.keep:
+            os.remove(fn)
@@ -15,9 +15,9 @@ import sys
 import re
 import argparse
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
+from aos_index import dedup_rows
 from collections import defaultdict
-import matplotlib.pyplot as plt
 
 DrawGraph = True
 
@@ -34,16 +34,6 @@ def floorname(apn):
         return 'n/a'
 
 
-def uniq(tbl, col=0):
-    ret = []
-    k = set()
-    for r in tbl:
-        if r[col] in k: continue
-        k.add(r[col])
-        ret.append(r)
-    return ret
-
-
 wedgep = {'edgecolor': 'white', 'linewidth': 0.5}
 textp = {'fontsize': 20, 'fontweight': 'bold'}
 
@@ -64,8 +54,10 @@ if __name__ == '__main__':
         description="Parse show ap association and display phy_cap breakdown")
     parser.add_argument('infile', help="Input file(s)", type=str, nargs='+')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('--pattern', '-p', help='reged for AP name', type=str, default='.*')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -90,8 +82,8 @@ if __name__ == '__main__':
         print("show ap bss-table output not found.")
         sys.exit(-1)
 
-    assoc_table = uniq(assoc_table, 2)
-    bss_table = uniq(bss_table)
+    assoc_table = dedup_rows(assoc_table, 2)
+    bss_table = dedup_rows(bss_table)
     print(f"done.")
 
     #
@@ -239,6 +231,8 @@ if __name__ == '__main__':
     #   draw pie chart
     #
     if DrawGraph:
+        import matplotlib.pyplot as plt
+
         band = {'2.4GHz': numsta_radio[0], '5GHz': numsta_radio[1], '6GHz': numsta_radio[2]}
         gen = {'HT(11n)': numht, 'VHT(11ac)': numvht, 'HE(11ax)': numhe}
         ss = {f"{i}ss": numss[i] for i in range(1, 4)}
@@ -9,7 +9,7 @@ import argparse
 import fileinput
 import mylogger as log
 from collections import defaultdict
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, set_profile
 
 # APpat = "^APKUD|^APSMFTM"
 # APpat = r" (APGTS(\d\d)\d\d)$"
@@ -27,8 +27,10 @@ if __name__ == '__main__':
         description="Parse airmatch radar events")
     parser.add_argument('infile', help="Input file(s)", type=str, nargs='+')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     parser.add_argument('-d', '--apdb', help='show ap database long output', type=str)
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -41,7 +43,6 @@ if __name__ == '__main__':
     #
     apn2model = None
     if args.apdb is not None:
-        apn2model = {}
         print(f"Parsing file {args.apdb} ... ", end="")
         aos = AOSParser(args.apdb, [AP_DATABASE_LONG_TABLE], merge=True)
         ap_db_tbl = aos.get_table(AP_DATABASE_LONG_TABLE)
@@ -50,8 +51,7 @@ if __name__ == '__main__':
             sys.exit(-1)
         print("done.")
 
-        for r in ap_db_tbl[1:]:
-            apn2model[r[0]] = r[2]
+        apn2model = aos.index(AP_DATABASE_LONG_TABLE, 'Name').mapping('AP Type')
 
 
 
@@ -8,6 +8,7 @@ import re
 import argparse
 import fileinput
 import mylogger as log
+from aos_topk import top_items
 import datetime
 from collections import defaultdict
 
@@ -24,6 +25,7 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description="Parse WIRELESS.log and count radar events")
     parser.add_argument('infile', help="Input file(s)", type=str, nargs='+')
+    parser.add_argument('--top', help='Show top N APs and channels (default: all)', type=int, default=None)
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
     args = parser.parse_args()
 
@@ -66,12 +68,12 @@ if __name__ == '__main__':
         #print(f"Radar detected at {l[:15]} AP:{apn} Ch:{ch}")
 
     print("=== per AP ===")
-    for apn in sorted(apnctr.keys(), key=lambda x:apnctr[x], reverse=True):
-        print(f'{apn}: {apnctr[apn]}')
+    for apn, ctr in top_items(apnctr, args.top):
+        print(f'{apn}: {ctr}')
 
     print("=== per Channel ===")
-    for ch in sorted(chctr.keys(), key=lambda x:chctr[x], reverse=True):
-        print(f'{ch}: {chctr[ch]}')
+    for ch, ctr in top_items(chctr, args.top):
+        print(f'{ch}: {ctr}')
 
     print("=== per Floor ===")
     for fl in sorted(flrctr.keys()):
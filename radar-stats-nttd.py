@@ -8,7 +8,7 @@ import sys
 import argparse
 import re
 import mylogger as log
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
 
@@ -21,7 +21,9 @@ if __name__ == '__main__':
         description="parse tech-support and display client stats")
     parser.add_argument('files', type=str, nargs='*')
     parser.add_argument('--debug', help='debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
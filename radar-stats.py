@@ -11,9 +11,8 @@ import sys
 import argparse
 import re
 import mylogger as log
-from aos_parser import AOSParser
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
+from aos_parser import AOSParser, set_profile
+from aos_xlsx import XlsxBook
 from collections import defaultdict
 from utils import load_csv
 
@@ -30,8 +29,11 @@ if __name__ == '__main__':
     parser.add_argument('files', type=str, nargs='*')
     parser.add_argument('--min', help='Minimum radar threshold', type=int, default=2)
     parser.add_argument('--fromdate', help='From date filter', type=str)
+    parser.add_argument('--workers', '-j', help='Number of processes to parse input files in parallel', type=int, default=1)
     parser.add_argument('--debug', help='debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -43,7 +45,7 @@ if __name__ == '__main__':
     #
     #radar_cmd = "show airmatch event radar all-aps"
     cmds = ["show airmatch event .+", "show ap arm history.*"]
-    aos = AOSParser(args.files, cmds, merge=True)
+    aos = AOSParser(args.files, cmds, merge=True, workers=args.workers)
     radar_tbl = aos.get_table(cmds[0], "APName", "Chan")
     armhist_tbl = aos.get_table(cmds[1], "filename", "Time of Change", "Old Channel", "New Channel", "Reason")
 
@@ -114,83 +116,39 @@ if __name__ == '__main__':
     #
     #   create Excel
     #
-    wb = Workbook()
-    ws = wb.active
-
     dfs_ch = [52, 56, 60, 64, 100, 104, 108, 112, 116, 120, 124, 128, 132, 136, 140]
     if is144:
         dfs_ch.append(144)
-    ws.append(["AP Name"] + dfs_ch + ["Total"])
+    ch_cols = "BCDEFGHIJKLMNOPQ"[:len(dfs_ch)]
+    sum_col = len(dfs_ch) + 1       # Total 列の番号
+
+    #   件数による背景色 (閾値, 色)
+    radar_fills = ((20, "FF6600"), (10, "FDB58D"), (5, "FFC7CE"), (1, "FFE5E8"))
+
+    book = XlsxBook("radar-stats.xlsx")
+    ws = book.add_sheet(["AP Name"] + dfs_ch + ["Total"], widths=[21] + [5] * len(dfs_ch),
+                        font={'name': 'Calibri'}, header_font={'name': 'Calibri', 'bold': True},
+                        freeze=None, autofilter=False)
 
     for apn in sorted(radar_num.keys(), key=lambda x:radar_num[x], reverse=True):
         #print(f"{apn:28}{radar_num[apn]} : ")
         if radar_num[apn] < args.min:
             break         # ignore APs with very few radar events
         nums = [radar_ch[apn][ch] if ch in radar_ch[apn] else 0 for ch in dfs_ch]
-        ws.append([apn] + nums)
-
-    #
-    #   apply styles
-    #
-
-    #  set column width
-    ws.column_dimensions['A'].width = 21
-    if is144:
-        ch_cols = "BCDEFGHIJKLMNOPQ"
-    else:
-        ch_cols = "BCDEFGHIJKLMNOP"
-    for col in ch_cols:
-        ws.column_dimensions[col].width = 5
-
-    #   set font
-    f = Font(name='Calibri')
-    for row in ws.iter_rows():
-        for cell in row:
-            cell.font = f
-
-    f = Font(name='Calibri', bold=True)
-    Ses = PatternFill(fgColor="BDD7EE", fill_type="solid")
-    for cell in ws[1]:
-        cell.font = f
-        cell.fill = Ses
-
-    #   apply conditional formatting
-    f1 = PatternFill(fgColor="FFE5E8", fill_type="solid")
-    f2 = PatternFill(fgColor="FFC7CE", fill_type="solid")
-    f3 = PatternFill(fgColor="FDB58D", fill_type="solid")
-    f4 = PatternFill(fgColor="FF6600", fill_type="solid")
-    for row in ws.iter_rows(min_row=2, min_col=2, max_col=len(dfs_ch)+1):
-        for cell in row:
-            if cell.value >= 20:
-                cell.fill = f4
-            elif cell.value >= 10:
-                cell.fill = f3
-            elif cell.value >= 5:
-                cell.fill = f2
-            elif cell.value > 0:
-                cell.fill = f1
-
-    #   add total column
-    f = Font(name='Calibri', bold=True)
-    for row in range(2,ws.max_row+1):
-        rs = str(row)
-        sum = f"=SUM({ch_cols[0]}{rs}:{ch_cols[-1]}{rs})"
-        sum_col = chr(ord(ch_cols[-1])+1)
-        ws[sum_col + rs] = sum
-        # bold font
-        ws[sum_col + rs].font = f
-
-
-    rs1 = str(ws.max_row)
-    rs2 = str(ws.max_row+1)
-    f = Font(name='Calibri', bold=True)
-    for col in ch_cols:
-        sum = f"=SUM({col}2:{col}{rs1})"
-        ws[col+rs2] = sum
-        ws[col+rs2].font = f
-
-
-    wb.save("radar-stats.xlsx")
+        fills = {}
+        for j, n in enumerate(nums, 1):
+            color = next((c for th, c in radar_fills if n >= th), None)
+            if color:
+                fills[j] = color
+        #   add total column (bold)
+        rs = str(ws.rows + 2)
+        ws.append([apn] + nums + [f"=SUM({ch_cols[0]}{rs}:{ch_cols[-1]}{rs})"], fills=fills, bold=[sum_col])
+
+    #   add total row (bold)
+    rs1 = str(ws.rows + 1)
+    ws.append([None] + [f"=SUM({col}2:{col}{rs1})" for col in ch_cols], bold=range(1, sum_col))
+
+    book.save()
     print("Radar stats saved to radar-stats.xlsx")
 
     sys.exit(0)
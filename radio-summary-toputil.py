@@ -10,12 +10,9 @@ import sys
 import re
 import argparse
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
+from aos_index import dedup_rows
 from collections import defaultdict
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-import pandas as pd
 
 
 def atoi(s):
@@ -26,47 +23,6 @@ def atoi(s):
         return 0
 
 
-
-def uniq_aptbl(tbl):
-    # AP名が重複している場合、最初に出てきた行を残す
-    ret = []
-    k = set()
-    for r in tbl:
-        apn = r[0]
-        if apn in k:
-            continue
-        else:
-            k.add(apn)
-            ret.append(r)
-    return ret
-
-
-def uniq_apact_tbl(tbl):
-    # AP名が重複している場合、Radio 0/1/2 列に空欄が少ない方のエントリを選ぶ
-    idx_r0 = ap_active_tbl[0].index("Radio 0 Band Ch/EIRP/MaxEIRP/Clients")
-    idx_r1 = ap_active_tbl[0].index("Radio 1 Band Ch/EIRP/MaxEIRP/Clients")
-    try:
-        idx_r2 = ap_active_tbl[0].index("Radio 2 Band Ch/EIRP/MaxEIRP/Clients")
-    except ValueError:
-        idx_r2 = idx_r1
-    ret = []
-    k = set()
-    for r in tbl:
-        apn = r[0]
-        if apn in k:
-            for i, rr in enumerate(ret):
-                if rr[0] == apn:
-                    # どちらのエントリに空欄が少ないか比較
-                    cnt1 = sum(1 for x in r[idx_r0:idx_r2+1] if x != '')
-                    cnt2 = sum(1 for x in rr[idx_r0:idx_r2+1] if x != '')
-                    if cnt1 > cnt2:
-                        ret[i] = r
-                    break
-        else:
-            k.add(apn)
-            ret.append(r)
-    return ret
-
 #
 #   main
 #
@@ -81,7 +37,9 @@ if __name__ == '__main__':
     parser.add_argument('--sort', help='Sort by AP Name', action='store_true')
     parser.add_argument('--assoc', help='Sort by number of associated clients', action='store_true')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -93,28 +51,20 @@ if __name__ == '__main__':
     #   parse AP tables
     #
     print("Parsing files ... ", end="")
-    for enc in ('utf-8', 'shift-jis', 'mac-roman'):
-        try:
-            aos = AOSParser(args.infile, ["show ap radio-summary"], merge=True, encoding=enc)
-        except UnicodeDecodeError as e:
-            continue
-        break   # encode success
-    else:
-        print("unknown encoding, abort.")
-        sys.exit(-1)
+    aos = AOSParser(args.infile, ["show ap radio-summary"], merge=True)
 
     radio_summary = aos.get_table("show ap radio-summary")
     if radio_summary is None:
         print("show ap radio-summary output not found.")
         sys.exit(-1)
 
-    aos = AOSParser(args.infile, ["show ap active"], merge=True, encoding=enc)
+    aos = AOSParser(args.infile, ["show ap active"], merge=True)
     ap_active_tbl = aos.get_table("show ap active")
     if ap_active_tbl is None:
         print("show ap active output not found.")
         sys.exit(-1)
 
-    # ap_active_tbl = uniq_aptbl(ap_active_tbl)
+    # aos.dedup(AP_ACTIVE_TABLE, 'Name', keep='fewest_blanks')
 
     print("done.")
 
@@ -201,7 +151,7 @@ if __name__ == '__main__':
         # sort by Utilization
         tbl.sort(key=lambda x: x[8], reverse=True)
 
-        tbl = uniq_aptbl(tbl)
+        tbl = dedup_rows(tbl)     # AP名が重複している場合、最初に出てきた行を残す
 
     print("Name                        Group                           Type  Mode          EIRP    Clients  NF    Util")
     print("----                        -----                           ----  ----          ----    -------  ---   ----")
@@ -223,53 +173,19 @@ if __name__ == '__main__':
     #
     #   Excel 書き出し
     #
-    xlsfile = "toputil.xlsx"
-
-    df_toputil = pd.DataFrame(tbl, columns=["AP Name", "Group", "Type", "Mode", "EIRP (dBm)", "Clients", "Noise (dBm)", "Intf (%)", "Util (%)"])
+    from aos_xlsx import write_xlsx
 
-    wb = Workbook()
-    ws = wb.active
-    for r in dataframe_to_rows(df_toputil, index=False, header=True):
-        ws.append(r)
+    xlsfile = "toputil.xlsx"
 
-    # set column width
+    header = ["AP Name", "Group", "Type", "Mode", "EIRP (dBm)", "Clients", "Noise (dBm)", "Intf (%)", "Util (%)"]
     widths = [30, 40, 10, 20, 10, 10, 10, 10, 10]
-    for i, w in enumerate(widths):
-        ws.column_dimensions[chr(65+i)].width = w
-
-    # set header font and color
-    f = Font(name='Calibri', bold=True, size=11, color="FFFFFF")
-    p = PatternFill(fgColor="70AD47", fill_type="solid")
-    for cell in ws['A1':'I1'][0]:
-        cell.font = f
-        cell.fill = p
-
-    # set font, bgcolor
-    f = Font(name='Consolas')
-    p = PatternFill(fgColor="e2efda", fill_type="solid")
-    rn = 1
-    for row in ws.iter_rows(min_row=2):
-        for cell in row:
-            cell.font = f
-            if rn&1:
-                cell.fill = p
-        rn += 1
-
-    # centering for AP type
-    for cell in ws['C'][1:]:
-        cell.alignment = Alignment(horizontal='center')
-
-
-    # set autofilter and freeze panes
-    ws.auto_filter.ref = "A:I"
-    ws.freeze_panes = "A2"
-
 
     #
     #   output to file
     #
     print(f"Writing to {xlsfile} ... ", end="")
-    wb.save(xlsfile)
+    # ヘッダ: 緑, データ: ストライプ, AP type は中央揃え. オートフィルタ, ヘッダ行の固定
+    write_xlsx(xlsfile, header, tbl, style='green', widths=widths, col_align={'C': 'center'})
     print("done.")
 
     sys.exit(0)
@@ -6,7 +6,8 @@
 import sys
 import argparse
 import mylogger as log
-from aos_parser import AOSParser
+from aos_parser import AOSParser, set_profile
+from aos_topk import top_items
 
 TX_PKTS_THRESHOLD = 4000      # Tx 4,000パケット未満の端末は除外
 
@@ -17,8 +18,11 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description="calculate Tx retry rate for show ap debug client-table outputs")
     parser.add_argument('files', type=str, nargs='+')
+    parser.add_argument('--top', help='Show top N clients by retry rate (default: all)', type=int, default=None)
     parser.add_argument('--debug', help='debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -74,15 +78,11 @@ if __name__ == '__main__':
     #
     #   sort
     #
-        clients = list(rows.keys())
-        clients.sort(key=lambda x: retry_rate[x], reverse=True)
-
         print("MAC                 Tx Pkts   Tx Retries  Tx Rate  SNR  Retry(%)")
         print("---                 -------   ----------  -------  ---  --------")
-        for mac in clients:
+        for mac, retr_rate in top_items(retry_rate, args.top):
             tx_pkts = rows[mac][idx_tx_pkts]
             tx_retr = rows[mac][idx_tx_retr]
-            retr_rate = retry_rate[mac]
             snr = rows[mac][idx_snr]
             txrate = rows[mac][idx_txrate]
             print(f"{mac:20}{tx_pkts:10}{tx_retr:10}  {txrate:6}   {snr:5}{retr_rate:4.2f}")
@@ -9,35 +9,24 @@ import sys
 import re
 import argparse
 import mylogger as log
-from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE
+from aos_parser import AOSParser, AP_DATABASE_LONG_TABLE, AP_ACTIVE_TABLE, set_profile
 from collections import defaultdict
+from aos_oui import lookup_many
 
 APpat = r'SG-WA-F02|SG-WC-F02'
 
-def mac2vendor(mac):
-    mac3 = mac[0:2]+mac[3:5]+mac[6:8]
-    mac3 = mac3.upper()
-    return oui.get(mac3, 'unkown')
-
-
 #
 #   main
 #
 if __name__ == '__main__':
 
-    # read OUI-Vendor mapping DB
-    with open("ouidb.txt") as f:
-        oui = {}
-        for l in f:
-            m = re.match(r"([0-9A-F]{6})\s+\(base 16\)\s+(.*)", l)
-            if m:
-                oui[m.group(1)] = m.group(2)
-
     parser = argparse.ArgumentParser(
         description="Identiry silent STA")
     parser.add_argument('infile', help="Input file(s)", type=str, nargs='+')
     parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
     args = parser.parse_args()
+    set_profile(args.profile)
 
     if args.debug:
         log.setloglevel(log.LOG_DEBUG)
@@ -72,6 +61,8 @@ if __name__ == '__main__':
     #   parse assoc table and find silent device
     #
     ven = defaultdict(lambda: 0)
+    macs = [r[2] for r in assoc_tbl[1:]]
+    mac2vendor = dict(zip(macs, lookup_many(macs, 'unkown')))
 
     print("MAC Address (Vendor)                                  AP Name              ESSID                VLAN  Duration     PHY Capabilities")
     print("--------------------                                  -------              -----                ----  --------     ----------------")
@@ -80,12 +71,12 @@ if __name__ == '__main__':
         if 'APpat' in globals():
             if not re.search(APpat, apn): continue
 
-        ven[mac2vendor(mac)] += 1
+        ven[mac2vendor[mac]] += 1
 
         if mac in l3mac: continue
 
         # print the info of silent STA
-        v = f"({mac2vendor(mac)})"
+        v = f"({mac2vendor[mac]})"
         print(f"{mac:18}{v:35} {apn:20} {essid:20} {vlan:5} {dur:12} {phy_cap}")
 
     print("\n=== Device Vendors ===")
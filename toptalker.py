@@ -1,11 +1,18 @@
 #!/usr/bin/python3 -u
+#
+#   toptalker.py
+#
+#   show datapath session dpi を一定間隔で複数回取得し、差分から転送量の多いクライアント・アプリを表示
+#   - コントローラに SSH で接続して取得 (ライブ), または繰り返しの出力を含むファイル (tech-support など) を指定
+#   - ファイルの場合は区間の長さを TAge から推定する
+#
 
 import sys
 import time
-import paramiko
-from paramiko_expect import SSHClientInteraction
-from aos_parser import AOSParser, DATAPATH_SESSION_DPI
+import argparse
 import mylogger as log
+from aos_parser import AOSParser, DATAPATH_SESSION_DPI, set_profile
+from aos_delta import SessionDelta
 
 import re
 import getpass
@@ -23,21 +30,13 @@ def myprompt(msg, dflt = ''):
     return s
 
 
-
-
-if __name__ == '__main__':
-
-
-    controller_ip = '192.168.1.1'
-    username = 'admin'
-    ena_pass = 'enable'
-    prompt = r'\(.* #'
-    log.setloglevel(log.LOG_INFO)
-    #log.setloglevel(log.LOG_DEBUG)
-    #controller_ip = myprompt("Controller IP", controller_ip)
-    #username = myprompt("Username", username)
-    #password = getpass.getpass("Password: ")
-    password = 'admini'
+def collect_snapshots(controller_ip, username, password, count, interval, prompt=r'\(.* #'):
+    '''
+    コントローラに SSH で接続し、show datapath session dpi を interval 秒間隔で count 回取得する
+    :return: [(取得時刻, 出力), ...]
+    '''
+    import paramiko
+    from paramiko_expect import SSHClientInteraction
 
     # Create a new SSH client object
     client = paramiko.SSHClient()
@@ -51,6 +50,7 @@ if __name__ == '__main__':
 
     # Create a client interaction class which will interact with the host
     log.info(f"connecting to {controller_ip}")
+    snaps = []
     with SSHClientInteraction(client, timeout=10, display=False) as conn:
         conn.expect(prompt)
         conn.send('no paging')
@@ -59,125 +59,94 @@ if __name__ == '__main__':
         #
         #   collect datapath session table
         #
-        log.info("collecting datapath table #1")
-        conn.send('show datapath session dpi')
-        conn.expect(prompt)
-        r1 = conn.current_output_clean
-        time.sleep(10)
-
-        log.info("collecting datapath table #2")
-        conn.send('show datapath session dpi')
-        conn.expect(prompt)
-        r2 = conn.current_output_clean
+        for i in range(count):
+            if i > 0:
+                time.sleep(interval)
+            log.info(f"collecting datapath table #{i+1}")
+            conn.send('show datapath session dpi')
+            t = time.time()
+            conn.expect(prompt)
+            snaps.append((t, conn.current_output_clean))
 
         #
         #   disconnect
         #
         conn.send('exit')
 
+    return snaps
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="Show top talker clients and apps from the delta of 'show datapath session dpi' snapshots")
+    parser.add_argument('files', help="Input file(s) containing repeated 'show datapath session dpi' outputs. "
+                                      "Collect from the controller if omitted", type=str, nargs='*')
+    parser.add_argument('--controller', help='Controller IP', type=str, default='192.168.1.1')
+    parser.add_argument('--user', help='Username', type=str, default='admin')
+    parser.add_argument('--count', help='Number of snapshots to collect', type=int, default=2)
+    parser.add_argument('--interval', help='Interval between snapshots (sec)', type=int, default=10)
+    parser.add_argument('--subnet', help='Client subnet(s) in CIDR notation', type=str, nargs='+', default=['192.168.1.0/24'])
+    parser.add_argument('--top', help='Number of clients/apps to show', type=int, default=10)
+    parser.add_argument('--timeline', help='Show per-interval rate of top clients', action='store_true')
+    parser.add_argument('--debug', help='Enable debug log', action='store_true')
+    parser.add_argument('--profile', help='Print parser statistics', action='store_true')
+    args = parser.parse_args()
+    set_profile(args.profile)
+
+    if args.debug:
+        log.setloglevel(log.LOG_DEBUG)
+    else:
+        log.setloglevel(log.LOG_INFO)
+
+    controller_ip = args.controller
+
     #
     #   parse datapath entries
     #
-    data = "show datapath session dpi\n" + r1
-    aos = AOSParser(data, DATAPATH_SESSION_DPI)
-    log.info(f"Session#1 - got {len(aos.get_table(DATAPATH_SESSION_DPI))-1} entries.")
-    tbl = aos.get_table(DATAPATH_SESSION_DPI, "Source IP or MAC", "Destination IP", "Prot", "SPort", "DPort", "Bytes", "AppID")
-    ip_pat = "192.168.1."
-    ses_bytes = {}
-    ses_sip = {}
-    ses_dip = {}
-    ses_app = {}
-
-    for r in tbl:
-        sip, dip, prot, sport, dport, byte, app = r
-        byte = int(byte)
-        if not sip.startswith(ip_pat) and not dip.startswith(ip_pat):
-            continue
-        ses_key = f"{sip:16}:{dip:16}:{prot:5}:{sport:5}:{dport:5}"
-        ses_bytes[ses_key] = byte
-        ses_sip[ses_key] = sip
-        ses_dip[ses_key] = dip
-        ses_app[ses_key] = app
-
-    for key in sorted(ses_bytes.keys()):
-        log.debug(f"{key} : {ses_bytes[key]} bytes, {ses_app[key]}")
-
-
-    data = "show datapath session dpi\n" + r2
-    aos = AOSParser(data, DATAPATH_SESSION_DPI)
-    log.info(f"Session#2 - got {len(aos.get_table(DATAPATH_SESSION_DPI))-1} entries.")
-    tbl = aos.get_table(DATAPATH_SESSION_DPI, "Source IP or MAC", "Destination IP", "Prot", "SPort", "DPort", "Bytes", "AppID")
-    dbytes = {}
-    log_ips = {"192.168.1.50"}
-
-    for r in tbl:
-        sip, dip, prot, sport, dport, byte, app = r
-        byte = int(byte)
-        if not sip.startswith(ip_pat) and not dip.startswith(ip_pat):
-            continue
-        ses_key = f"{sip:16}:{dip:16}:{prot:5}:{sport:5}:{dport:5}"
-
-        if ses_key in ses_bytes:
-            delta = byte - ses_bytes[ses_key]
-            if delta < 0:
-                log.warn(f"invalid bytes: {ses_key}: {ses_bytes[ses_key]} -> {byte}")
-                delta = byte        # take the latest bytes value
-
-
-            if sip in log_ips or dip in log_ips:
-                if delta != 0:
-                    log.debug(f"{ses_key} : {byte} bytes, +{byte-ses_bytes[ses_key]}")
-            dbytes[ses_key] = delta
-        else:
-            dbytes[ses_key] = byte
-            ses_sip[ses_key] = sip
-            ses_dip[ses_key] = dip
-            ses_app[ses_key] = app
-            if sip in log_ips or dip in log_ips:
-                log.debug(f"{ses_key} : {byte} bytes, (NEW Session)")
+    sd = SessionDelta()
+    if args.files:
+        aos = AOSParser(args.files, DATAPATH_SESSION_DPI, typed=True, columnar=True)
+        for tbl in aos.get_tables(DATAPATH_SESSION_DPI) or []:
+            sd.add(tbl)
+            log.info(f"Session#{len(sd)} - got {len(tbl)-1} entries.")
+    else:
+        #controller_ip = myprompt("Controller IP", controller_ip)
+        #username = myprompt("Username", username)
+        #password = getpass.getpass("Password: ")
+        password = 'admini'
+        for t, out in collect_snapshots(controller_ip, args.user, password, args.count, args.interval):
+            data = "show datapath session dpi\n" + out
+            aos = AOSParser(data, DATAPATH_SESSION_DPI, typed=True, columnar=True)
+            tbl = aos.get_table(DATAPATH_SESSION_DPI)
+            sd.add(tbl, t)
+            log.info(f"Session#{len(sd)} - got {len(tbl)-1} entries.")
+
+    if len(sd) < 2:
+        log.err("At least 2 snapshots of 'show datapath session dpi' are required.")
+        sys.exit(-1)
 
     #
     #   集計
     #
-    ip_bytes = {}
-    ip_numses = {}
-    app_bytes = {}
-    for ses, byte in dbytes.items():
-
-        if byte == 0:
-            continue
-
-        sip = ses_sip[ses]
-        dip = ses_dip[ses]
-        if sip == controller_ip or dip == controller_ip:
-            continue        # skip controller session
-
-        if sip.startswith(ip_pat):
-            try:
-                ip_bytes[sip] += byte
-                ip_numses[sip] += 1
-            except KeyError:
-                ip_bytes[sip] = byte
-                ip_numses[sip] = 1
-        if dip.startswith(ip_pat):
-            try:
-                ip_bytes[dip] += byte
-                ip_numses[dip] += 1
-            except KeyError:
-                ip_bytes[dip] = byte
-                ip_numses[dip] = 1
-
-        app = ses_app[ses]
-        try:
-            app_bytes[app] += byte
-        except KeyError:
-            app_bytes[app] = byte
-
-
-    print("Top 10 talker clients")
-    for k in sorted(ip_bytes.keys(), key=lambda x: ip_bytes[x], reverse=True)[:10]:
-        print(f"{k:18} {ip_bytes[k]} bytes / {ip_numses[k]} active sessions")
-
-    print("Top 10 apps")
-    for k in sorted(app_bytes.keys(), key=lambda x: app_bytes[x], reverse=True)[:10]:
-        print(f"{k:10} {app_bytes[k]} bytes")
+    is_client = sd.cidr_table(args.subnet)
+    m = sd.ip_mask(is_client)                   # sessions of clients
+    m &= ~sd.ip_mask({controller_ip})           # skip controller session
+    clients = sd.by_client(is_client, m)
+    apps = sd.by_app(m)
+    dur = sd.dt.sum()
+
+    print(f"Top {args.top} talker clients ({len(sd)} snapshots, {dur:.0f} sec)")
+    top_clients = clients.top(args.top)
+    for ip, byte, pkts, nses, bps in top_clients:
+        print(f"{ip:18} {byte} bytes / {nses} active sessions  {bps/1000:.2f} Kbps")
+
+    print(f"Top {args.top} apps")
+    for app, byte, pkts, nses, bps in apps.top(args.top):
+        print(f"{app:10} {byte} bytes  {bps/1000:.2f} Kbps")
+
+    if args.timeline:
+        print("\nRate per interval (Kbps)")
+        print(f"{'':18}" + "".join(f"{f'#{i+1}-#{i+2}':>12}" for i in range(len(sd.dt))))
+        for ip, *_ in top_clients:
+            print(f"{ip:18}" + "".join(f"{bps/1000:>12.2f}" for bps in clients.series(ip)))